@@ -0,0 +1,44 @@
+-- Migration: Notification outbox for booking events
+
+BEGIN;
+
+-- 1. Outbox table
+-- Written in the same transaction as the booking change and consumed by the
+-- WhatsApp notification service, which starts or signals its workflows.
+CREATE TABLE IF NOT EXISTS notification_outbox (
+  id BIGSERIAL PRIMARY KEY,
+  booking_id UUID NOT NULL,
+  event_type VARCHAR(30) NOT NULL, -- booking_created, booking_cancelled, booking_rescheduled
+  payload JSONB NOT NULL DEFAULT '{}'::jsonb,
+  attempts INTEGER NOT NULL DEFAULT 0,
+  last_error TEXT,
+  available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  processed_at TIMESTAMP WITH TIME ZONE,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- 2. Pending events only, so the index stays small as events are processed
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending
+  ON notification_outbox(available_at, id)
+  WHERE processed_at IS NULL;
+
+-- 3. Earlier pending events per booking; the consumer holds an event back
+-- until the ones before it for the same booking are processed
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending_booking
+  ON notification_outbox(booking_id, id)
+  WHERE processed_at IS NULL;
+
+-- 4. Wake the consumer on insert (delivered when the transaction commits)
+CREATE OR REPLACE FUNCTION notify_notification_outbox() RETURNS trigger AS $$
+BEGIN
+  PERFORM pg_notify('notification_outbox', '');
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notification_outbox_notify ON notification_outbox;
+CREATE TRIGGER notification_outbox_notify
+  AFTER INSERT ON notification_outbox
+  FOR EACH STATEMENT EXECUTE FUNCTION notify_notification_outbox();
+
+COMMIT;
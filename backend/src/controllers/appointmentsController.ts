@@ -1,7 +1,6 @@
 import { Response, NextFunction } from "express";
 import { UserRequest } from "../middleware/userMiddleware.js";
 import { appointmentService } from "../services/appointment.service.js";
-import { notificationClient } from "../services/temporalNotificationService.js";
 import catchAsync from "../utils/catchAsync.js";
 import AppError from "../utils/appError.js";
 import { logger } from "../utils/logger.js";
@@ -95,11 +94,9 @@ export const createAppointment = catchAsync(
       createdBy: req.user?.id,
     });
 
+    // Notifications go through the outbox written with the booking
     const appointment = await appointmentService.create(data);
 
-    const notification =
-      await notificationClient.startBookingWorkflow(appointment);
-
     logger.info(
       `Appointment created by user ${req.user?.id}: ${appointment.id}`,
     );
@@ -1,4 +1,5 @@
-import { pool } from "../config/database.js";
+import { PoolClient } from "pg";
+import { getClient, pool } from "../config/database.js";
 import AppError from "../utils/appError.js";
 import { logger } from "../utils/logger.js";
 
@@ -34,6 +35,49 @@ interface UpdateAppointmentData {
   status?: string;
 }
 
+type NotificationEvent =
+  | "booking_created"
+  | "booking_cancelled"
+  | "booking_rescheduled";
+
+/**
+ * Queue a booking event for the notification service. Run it on the
+ * transaction's client so the event commits (or rolls back) with the
+ * booking change; the service picks it up from notification_outbox.
+ */
+async function enqueueNotification(
+  client: PoolClient,
+  bookingId: string,
+  eventType: NotificationEvent,
+  payload: Record<string, unknown> = {},
+) {
+  await client.query(
+    `INSERT INTO notification_outbox (booking_id, event_type, payload)
+     VALUES ($1, $2, $3)`,
+    [bookingId, eventType, JSON.stringify(payload)],
+  );
+}
+
+/**
+ * Run fn in a transaction on a pooled client
+ */
+async function inTransaction<T>(
+  fn: (client: PoolClient) => Promise<T>,
+): Promise<T> {
+  const client = await getClient();
+  try {
+    await client.query("BEGIN");
+    const result = await fn(client);
+    await client.query("COMMIT");
+    return result;
+  } catch (error) {
+    await client.query("ROLLBACK");
+    throw error;
+  } finally {
+    client.release();
+  }
+}
+
 export class AppointmentService {
   private async getServiceDuration(treatment_id: string): Promise<number> {
     const result = await pool.query(
@@ -304,9 +348,10 @@ export class AppointmentService {
       }
     }
 
-    // 5. Insert booking
-    const result = await pool.query(
-      `
+    // 5. Insert booking and its notification event together
+    const result = await inTransaction(async (client) => {
+      const inserted = await client.query(
+        `
     INSERT INTO bookings (
       client_id,
       staff_id,
@@ -321,19 +366,23 @@ export class AppointmentService {
     ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
     RETURNING *
     `,
-      [
-        data.client_id,
-        data.staff_id || null,
-        data.treatment_id,
-        booking_date,
-        start_time,
-        end_time,
-        duration_minutes,
-        0,
-        "confirmed",
-        data.notes || null,
-      ],
-    );
+        [
+          data.client_id,
+          data.staff_id || null,
+          data.treatment_id,
+          booking_date,
+          start_time,
+          end_time,
+          duration_minutes,
+          0,
+          "confirmed",
+          data.notes || null,
+        ],
+      );
+
+      await enqueueNotification(client, inserted.rows[0].id, "booking_created");
+      return inserted;
+    });
 
     logger.info(`Appointment created: ${result.rows[0].id}`);
     return result.rows[0];
@@ -398,15 +447,26 @@ export class AppointmentService {
 
     values.push(id);
 
-    const result = await pool.query(
-      `
+    const result = await inTransaction(async (client) => {
+      const updated = await client.query(
+        `
     UPDATE bookings
     SET ${fields.join(", ")}, updated_at = CURRENT_TIMESTAMP
     WHERE id = $${paramIndex}
     RETURNING *
     `,
-      values,
-    );
+        values,
+      );
+
+      // A new date or time means new reminders
+      if (
+        updated.rows.length > 0 &&
+        (data.booking_date !== undefined || data.start_time !== undefined)
+      ) {
+        await enqueueNotification(client, id, "booking_rescheduled");
+      }
+      return updated;
+    });
 
     if (result.rows.length === 0) {
       throw AppError.notFound("Appointment not found");
@@ -421,8 +481,9 @@ export class AppointmentService {
    * FIXED: Use 'bookings' table
    */
   async cancel(id: string, reason?: string, cancelled_by?: string) {
-    const result = await pool.query(
-      `
+    const result = await inTransaction(async (client) => {
+      const cancelled = await client.query(
+        `
       UPDATE bookings
       SET status = 'cancelled',
           cancellation_reason = $1,
@@ -431,8 +492,16 @@ export class AppointmentService {
       WHERE id = $2
       RETURNING *
     `,
-      [reason || null, id],
-    );
+        [reason || null, id],
+      );
+
+      if (cancelled.rows.length > 0) {
+        await enqueueNotification(client, id, "booking_cancelled", {
+          reason: reason || null,
+        });
+      }
+      return cancelled;
+    });
 
     if (result.rows.length === 0) {
       throw AppError.notFound("Appointment not found");
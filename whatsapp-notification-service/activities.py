@@ -4,17 +4,21 @@ Activities handle all external interactions (database, WhatsApp API)
 """
 
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from uuid import UUID
 
 import structlog
 from config import get_settings
-from database import Booking, Client, NotificationLog, get_db_session
+import partitions
+import queries
+from database import fetch_readonly, get_db_connection
+from opt_outs import OptOutCache
 from services.message_templates import MessageTemplates
+from services.template_registry import RenderedBatch
 from services.whatsapp_provider import WhatsAppProvider
-from sqlalchemy import and_, or_, select
-from sqlalchemy.ext.asyncio import AsyncSession
 from temporalio import activity
+from utils import metrics
+from utils.phone_formatter import format_phone_number, normalize_phone_numbers
 
 logger = structlog.get_logger()
 
@@ -29,508 +33,707 @@ class NotificationActivities:
     ):
         self.whatsapp = whatsapp_provider
         self.templates = message_templates
+        settings = get_settings()
+        self.country_code = settings.DEFAULT_COUNTRY_CODE
+        self.log_template_ids = settings.NOTIFICATION_LOG_CONTENT == "template_id"
+        self.opt_outs = OptOutCache(settings.MARKETING_OPT_OUT_REFRESH_SECONDS)
+        self.reminder_offsets = settings.reminder_offsets()
+        self.marketing_inactive_days = settings.MARKETING_INACTIVE_DAYS
 
     @activity.defn(name="send_confirmation_message")
     async def send_confirmation_message(self, input: dict) -> dict:
         """Send booking confirmation message"""
 
-        activity.logger.info(f"Sending confirmation for booking {input['booking_id']}")
+        logger.debug(
+            "notification_sending",
+            message_type="confirmation",
+            booking_id=input["booking_id"],
+        )
 
-        async with get_db_session() as session:
-            booking_data = await self._get_booking_details(session, input["booking_id"])
+        booking_data = await self._get_booking_details(input["booking_id"])
 
-            if not booking_data:
-                activity.logger.error(
-                    f"Booking {input['booking_id']} not found in database"
-                )
-                raise ValueError(f"Booking {input['booking_id']} not found")
+        if not booking_data:
+            activity.logger.error(
+                f"Booking {input['booking_id']} not found in database"
+            )
+            raise ValueError(f"Booking {input['booking_id']} not found")
 
-            if not await self._can_send_to_client(session, booking_data["client_id"]):
-                activity.logger.warning(
-                    f"Client {booking_data['client_id']} cannot receive messages (blocked/inactive)"
-                )
-                return {"success": False, "reason": "client_preferences"}
-
-            message_text, template_params, template_name = (
-                self.templates.confirmation_message(
-                    client_name=booking_data["client_name"],
-                    appointment_date=booking_data["appointment_date"],
-                    appointment_time=booking_data["appointment_time"],
-                    treatment_name=booking_data["treatment_name"],
-                    staff_name=booking_data["staff_name"],
-                    location=booking_data.get("location", "Our Salon"),
-                )
+        if not self._can_send_to_client(booking_data):
+            activity.logger.warning(
+                f"Client {booking_data['client_id']} cannot receive messages (blocked/inactive)"
             )
+            return {"success": False, "reason": "client_preferences"}
 
-            phone = self._format_phone_number(booking_data["client_phone"])
+        rendered = self.templates.confirmation_message(
+            client_name=booking_data["client_name"],
+            appointment_date=booking_data["appointment_date"],
+            appointment_time=booking_data["appointment_time"],
+            treatment_name=booking_data["treatment_name"],
+            staff_name=booking_data["staff_name"],
+            location=booking_data.get("location", "Our Salon"),
+        )
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
-            )
+        phone = self._format_phone_number(booking_data["client_phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ Confirmation sent successfully for booking {input['booking_id']} to {phone} message_id={result.get('message_id')}"
-                )
-            else:
-                activity.logger.error(
-                    f"❌ Failed to send confirmation for booking {input['booking_id']} to {phone} error={result.get('error')}"
-                )
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
 
-            await self._log_notification(
-                session=session,
-                booking_id=input["booking_id"],
-                client_id=booking_data["client_id"],
-                phone_number=phone,
-                message_type="confirmation",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
-            )
+        self._log_send_result(
+            "confirmation", result, booking_id=input["booking_id"], phone=phone
+        )
 
-            if result.get("success"):
-                await self._update_booking_confirmation(session, input["booking_id"])
+        await self._log_notification(
+            booking_id=input["booking_id"],
+            client_id=booking_data["client_id"],
+            phone_number=phone,
+            message_type="confirmation",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+            mark_booking="confirmation_sent_at",
+        )
 
-            return result
+        return result
 
     @activity.defn(name="send_24h_reminder_message")
     async def send_24h_reminder_message(self, input: dict) -> dict:
         """Send 24-hour reminder message"""
 
-        activity.logger.info(f"Sending 24h reminder for booking {input['booking_id']}")
+        logger.debug(
+            "notification_sending",
+            message_type="reminder_24h",
+            booking_id=input["booking_id"],
+        )
 
-        async with get_db_session() as session:
-            booking_data = await self._get_booking_details(session, input["booking_id"])
+        booking_data = await self._get_booking_details(input["booking_id"])
 
-            if not booking_data:
-                activity.logger.error(f"Booking {input['booking_id']} not found")
-                raise ValueError(f"Booking {input['booking_id']} not found")
+        if not booking_data:
+            activity.logger.error(f"Booking {input['booking_id']} not found")
+            raise ValueError(f"Booking {input['booking_id']} not found")
 
-            if booking_data["status"] not in ["confirmed", "pending"]:
-                activity.logger.warning(f"Booking {input['booking_id']} is not active")
-                return {"success": False, "reason": "booking_not_active"}
+        if booking_data["status"] not in ["confirmed", "pending"]:
+            activity.logger.warning(f"Booking {input['booking_id']} is not active")
+            return {"success": False, "reason": "booking_not_active"}
 
-            if not await self._can_send_to_client(session, booking_data["client_id"]):
-                return {"success": False, "reason": "client_preferences"}
+        if not self._can_send_to_client(booking_data):
+            return {"success": False, "reason": "client_preferences"}
 
-            message_text, template_params, template_name = (
-                self.templates.reminder_24h_message(
-                    client_name=booking_data["client_name"],
-                    appointment_date=booking_data["appointment_date"],
-                    appointment_time=booking_data["appointment_time"],
-                    treatment_name=booking_data["treatment_name"],
-                    staff_name=booking_data["staff_name"],
-                )
-            )
-
-            phone = self._format_phone_number(booking_data["client_phone"])
+        rendered = self.templates.reminder_24h_message(
+            client_name=booking_data["client_name"],
+            appointment_date=booking_data["appointment_date"],
+            appointment_time=booking_data["appointment_time"],
+            treatment_name=booking_data["treatment_name"],
+            staff_name=booking_data["staff_name"],
+        )
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
-            )
+        phone = self._format_phone_number(booking_data["client_phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ 24h reminder sent successfully for booking {input['booking_id']} message_id={result.get('message_id')}"
-                )
-            else:
-                activity.logger.error(
-                    f"❌ Failed to send 24h reminder for booking {input['booking_id']} error={result.get('error')}"
-                )
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
 
-            await self._log_notification(
-                session=session,
-                booking_id=input["booking_id"],
-                client_id=booking_data["client_id"],
-                phone_number=phone,
-                message_type="reminder_24h",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
-            )
+        self._log_send_result(
+            "reminder_24h", result, booking_id=input["booking_id"], phone=phone
+        )
 
-            if result.get("success"):
-                await self._update_booking_reminder(session, input["booking_id"])
+        await self._log_notification(
+            booking_id=input["booking_id"],
+            client_id=booking_data["client_id"],
+            phone_number=phone,
+            message_type="reminder_24h",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+            mark_booking="reminder_sent_at",
+        )
 
-            return result
+        return result
 
     @activity.defn(name="send_1h_reminder_message")
     async def send_1h_reminder_message(self, input: dict) -> dict:
         """Send 1-hour reminder message"""
 
-        activity.logger.info(f"Sending 1h reminder for booking {input['booking_id']}")
+        logger.debug(
+            "notification_sending",
+            message_type="reminder_1h",
+            booking_id=input["booking_id"],
+        )
 
-        async with get_db_session() as session:
-            booking_data = await self._get_booking_details(session, input["booking_id"])
+        booking_data = await self._get_booking_details(input["booking_id"])
 
-            if not booking_data:
-                activity.logger.error(f"Booking {input['booking_id']} not found")
-                raise ValueError(f"Booking {input['booking_id']} not found")
+        if not booking_data:
+            activity.logger.error(f"Booking {input['booking_id']} not found")
+            raise ValueError(f"Booking {input['booking_id']} not found")
 
-            if booking_data["status"] not in ["confirmed", "pending"]:
-                activity.logger.warning(f"Booking {input['booking_id']} is not active")
-                return {"success": False, "reason": "booking_not_active"}
+        if booking_data["status"] not in ["confirmed", "pending"]:
+            activity.logger.warning(f"Booking {input['booking_id']} is not active")
+            return {"success": False, "reason": "booking_not_active"}
 
-            if not await self._can_send_to_client(session, booking_data["client_id"]):
-                return {"success": False, "reason": "client_preferences"}
+        if not self._can_send_to_client(booking_data):
+            return {"success": False, "reason": "client_preferences"}
 
-            message_text, template_params, template_name = (
-                self.templates.reminder_1h_message(
-                    client_name=booking_data["client_name"],
-                    appointment_time=booking_data["appointment_time"],
-                    treatment_name=booking_data["treatment_name"],
-                )
-            )
+        rendered = self.templates.reminder_1h_message(
+            client_name=booking_data["client_name"],
+            appointment_time=booking_data["appointment_time"],
+            treatment_name=booking_data["treatment_name"],
+        )
 
-            phone = self._format_phone_number(booking_data["client_phone"])
+        phone = self._format_phone_number(booking_data["client_phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
-            )
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ 1h reminder sent successfully for booking {input['booking_id']} message_id={result.get('message_id')}"
-                )
-            else:
-                activity.logger.error(
-                    f"❌ Failed to send 1h reminder for booking {input['booking_id']} error={result.get('error')}"
-                )
+        self._log_send_result(
+            "reminder_1h", result, booking_id=input["booking_id"], phone=phone
+        )
 
-            await self._log_notification(
-                session=session,
-                booking_id=input["booking_id"],
-                client_id=booking_data["client_id"],
-                phone_number=phone,
-                message_type="reminder_1h",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
-            )
+        await self._log_notification(
+            booking_id=input["booking_id"],
+            client_id=booking_data["client_id"],
+            phone_number=phone,
+            message_type="reminder_1h",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+        )
 
-            return result
+        return result
 
     @activity.defn(name="send_aftercare_message")
     async def send_aftercare_message(self, input: dict) -> dict:
         """Send aftercare message 24 hours after appointment"""
 
-        activity.logger.info(f"Sending aftercare for booking {input['booking_id']}")
+        logger.debug(
+            "notification_sending",
+            message_type="aftercare",
+            booking_id=input["booking_id"],
+        )
 
-        async with get_db_session() as session:
-            booking_data = await self._get_booking_details(session, input["booking_id"])
+        booking_data = await self._get_booking_details(input["booking_id"])
 
-            if not booking_data:
-                activity.logger.error(f"Booking {input['booking_id']} not found")
-                raise ValueError(f"Booking {input['booking_id']} not found")
+        if not booking_data:
+            activity.logger.error(f"Booking {input['booking_id']} not found")
+            raise ValueError(f"Booking {input['booking_id']} not found")
 
-            if booking_data["status"] != "completed":
-                activity.logger.warning(
-                    f"Booking {input['booking_id']} not completed, skipping aftercare"
-                )
-                return {"success": False, "reason": "appointment_not_completed"}
+        if booking_data["status"] != "completed":
+            activity.logger.warning(
+                f"Booking {input['booking_id']} not completed, skipping aftercare"
+            )
+            return {"success": False, "reason": "appointment_not_completed"}
 
-            if not await self._can_send_to_client(session, booking_data["client_id"]):
-                return {"success": False, "reason": "client_preferences"}
+        if not self._can_send_to_client(booking_data):
+            return {"success": False, "reason": "client_preferences"}
 
-            message_text, template_params, template_name = (
-                self.templates.aftercare_message(
-                    client_name=booking_data["client_name"],
-                    treatment_name=booking_data["treatment_name"],
-                )
-            )
+        rendered = self.templates.aftercare_message(
+            client_name=booking_data["client_name"],
+            treatment_name=booking_data["treatment_name"],
+        )
 
-            phone = self._format_phone_number(booking_data["client_phone"])
+        phone = self._format_phone_number(booking_data["client_phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
-            )
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ Aftercare sent successfully for booking {input['booking_id']} message_id={result.get('message_id')}"
-                )
-            else:
-                activity.logger.error(
-                    f"❌ Failed to send aftercare for booking {input['booking_id']} error={result.get('error')}"
-                )
+        self._log_send_result(
+            "aftercare", result, booking_id=input["booking_id"], phone=phone
+        )
 
-            await self._log_notification(
-                session=session,
-                booking_id=input["booking_id"],
-                client_id=booking_data["client_id"],
-                phone_number=phone,
-                message_type="aftercare",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
-            )
+        await self._log_notification(
+            booking_id=input["booking_id"],
+            client_id=booking_data["client_id"],
+            phone_number=phone,
+            message_type="aftercare",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+        )
 
-            return result
+        return result
 
     @activity.defn(name="send_cancellation_message")
     async def send_cancellation_message(self, input: dict) -> dict:
         """Send cancellation notification"""
 
-        activity.logger.info(f"Sending cancellation for booking {input['booking_id']}")
+        logger.debug(
+            "notification_sending",
+            message_type="cancellation",
+            booking_id=input["booking_id"],
+        )
 
-        async with get_db_session() as session:
-            booking_data = await self._get_booking_details(session, input["booking_id"])
+        booking_data = await self._get_booking_details(input["booking_id"])
 
-            if not booking_data:
-                activity.logger.error(f"Booking {input['booking_id']} not found")
-                raise ValueError(f"Booking {input['booking_id']} not found")
+        if not booking_data:
+            activity.logger.error(f"Booking {input['booking_id']} not found")
+            raise ValueError(f"Booking {input['booking_id']} not found")
 
-            if not await self._can_send_to_client(session, booking_data["client_id"]):
-                return {"success": False, "reason": "client_preferences"}
+        if not self._can_send_to_client(booking_data):
+            return {"success": False, "reason": "client_preferences"}
 
-            message_text, template_params, template_name = (
-                self.templates.cancellation_message(
-                    client_name=booking_data["client_name"],
-                    appointment_date=booking_data["appointment_date"],
-                    appointment_time=booking_data["appointment_time"],
-                    cancellation_reason=input.get("cancellation_reason"),
-                )
-            )
+        rendered = self.templates.cancellation_message(
+            client_name=booking_data["client_name"],
+            appointment_date=booking_data["appointment_date"],
+            appointment_time=booking_data["appointment_time"],
+            cancellation_reason=input.get("cancellation_reason"),
+        )
 
-            phone = self._format_phone_number(booking_data["client_phone"])
+        phone = self._format_phone_number(booking_data["client_phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
-            )
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ Cancellation sent successfully for booking {input['booking_id']} message_id={result.get('message_id')}"
-                )
-            else:
-                activity.logger.error(
-                    f"❌ Failed to send cancellation for booking {input['booking_id']} error={result.get('error')}"
-                )
+        self._log_send_result(
+            "cancellation", result, booking_id=input["booking_id"], phone=phone
+        )
 
-            await self._log_notification(
-                session=session,
-                booking_id=input["booking_id"],
-                client_id=booking_data["client_id"],
-                phone_number=phone,
-                message_type="cancellation",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
-            )
+        await self._log_notification(
+            booking_id=input["booking_id"],
+            client_id=booking_data["client_id"],
+            phone_number=phone,
+            message_type="cancellation",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+        )
 
-            return result
+        return result
 
     @activity.defn(name="send_reschedule_message")
     async def send_reschedule_message(self, input: dict) -> dict:
         """Send reschedule notification"""
 
-        activity.logger.info(f"Sending reschedule for booking {input['booking_id']}")
+        logger.debug(
+            "notification_sending",
+            message_type="reschedule",
+            booking_id=input["booking_id"],
+        )
 
-        async with get_db_session() as session:
-            booking_data = await self._get_booking_details(session, input["booking_id"])
+        booking_data = await self._get_booking_details(input["booking_id"])
 
-            if not booking_data:
-                activity.logger.error(f"Booking {input['booking_id']} not found")
-                raise ValueError(f"Booking {input['booking_id']} not found")
+        if not booking_data:
+            activity.logger.error(f"Booking {input['booking_id']} not found")
+            raise ValueError(f"Booking {input['booking_id']} not found")
 
-            if not await self._can_send_to_client(session, booking_data["client_id"]):
-                return {"success": False, "reason": "client_preferences"}
+        if not self._can_send_to_client(booking_data):
+            return {"success": False, "reason": "client_preferences"}
 
-            message_text, template_params, template_name = (
-                self.templates.reschedule_message(
-                    client_name=booking_data["client_name"],
-                    new_appointment_date=booking_data["appointment_date"],
-                    new_appointment_time=booking_data["appointment_time"],
-                    treatment_name=booking_data["treatment_name"],
-                )
-            )
+        rendered = self.templates.reschedule_message(
+            client_name=booking_data["client_name"],
+            new_appointment_date=booking_data["appointment_date"],
+            new_appointment_time=booking_data["appointment_time"],
+            treatment_name=booking_data["treatment_name"],
+        )
 
-            phone = self._format_phone_number(booking_data["client_phone"])
+        phone = self._format_phone_number(booking_data["client_phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
-            )
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ Reschedule notification sent successfully for booking {input['booking_id']} message_id={result.get('message_id')}"
-                )
-            else:
-                activity.logger.error(
-                    f"❌ Failed to send reschedule notification for booking {input['booking_id']} error={result.get('error')}"
-                )
+        self._log_send_result(
+            "reschedule", result, booking_id=input["booking_id"], phone=phone
+        )
 
-            await self._log_notification(
-                session=session,
-                booking_id=input["booking_id"],
-                client_id=booking_data["client_id"],
-                phone_number=phone,
-                message_type="reschedule",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
-            )
+        await self._log_notification(
+            booking_id=input["booking_id"],
+            client_id=booking_data["client_id"],
+            phone_number=phone,
+            message_type="reschedule",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+        )
 
-            return result
+        return result
 
     @activity.defn(name="get_appointment_end_time")
     async def get_appointment_end_time(self, booking_id: str) -> datetime:
-        """Get appointment end time from database"""
+        """
+        Get appointment end time from database
+
+        Only used by booking workflows started before the duration was read
+        at workflow start.
+        """
+
+        row = await fetch_readonly(queries.fetch_appointment_timing, UUID(booking_id))
 
-        async with get_db_session() as session:
-            result = await session.execute(
-                select(
-                    Booking.booking_date, Booking.start_time, Booking.duration_minutes
-                ).where(Booking.id == UUID(booking_id))
+        if not row:
+            activity.logger.error(
+                f"Booking {booking_id} not found for end time calculation"
             )
-            row = result.first()
+            raise ValueError(f"Booking {booking_id} not found")
 
-            if not row:
-                activity.logger.error(
-                    f"Booking {booking_id} not found for end time calculation"
-                )
-                raise ValueError(f"Booking {booking_id} not found")
+        booking_date, start_time, duration = row
 
-            booking_date, start_time, duration = row
+        appointment_start = datetime.combine(booking_date, start_time)
+        appointment_end = appointment_start + timedelta(minutes=duration or 60)
 
-            appointment_start = datetime.combine(booking_date, start_time)
-            appointment_end = appointment_start + timedelta(minutes=duration or 60)
+        logger.debug(
+            "appointment_end_time_calculated",
+            booking_id=booking_id,
+            end_time=appointment_end,
+        )
 
-            activity.logger.info(
-                f"Appointment end time calculated for booking {booking_id} end_time={appointment_end.isoformat()}"
-            )
+        return appointment_end
+
+    @activity.defn(name="get_appointment_duration")
+    async def get_appointment_duration(self, booking_id: str) -> int:
+        """
+        Get appointment duration in minutes from database
+
+        A single-row read, run by the booking workflow as a local activity.
+        """
 
-            return appointment_end
+        row = await fetch_readonly(queries.fetch_appointment_timing, UUID(booking_id))
+
+        if not row:
+            activity.logger.error(f"Booking {booking_id} not found for duration")
+            raise ValueError(f"Booking {booking_id} not found")
+
+        return row.duration_minutes or 60
 
     @activity.defn(name="get_eligible_marketing_clients")
-    async def get_eligible_marketing_clients(
-        self, campaign_id: int
-    ) -> List[Dict[str, Any]]:
-        """Get clients eligible for marketing campaign"""
+    async def get_eligible_marketing_clients(self, campaign_id: int) -> List[list]:
+        """
+        Get clients eligible for marketing campaign
+
+        Each client is a compact [id, name, phone] row; the list is recorded
+        in workflow history and passed on page by page. Opted-out numbers
+        are dropped, and a number shared by several clients is kept once.
+        """
 
         activity.logger.info(f"Fetching eligible clients for campaign {campaign_id}")
 
-        async with get_db_session() as session:
-            sixty_days_ago = datetime.utcnow() - timedelta(days=60)
-
-            result = await session.execute(
-                select(
-                    Client.id,
-                    Client.first_name,
-                    Client.last_name,
-                    Client.whatsapp,
-                    Client.phone,
-                ).where(
-                    and_(
-                        Client.marketing_consent == True,
-                        Client.is_active == True,
-                        Client.status != "blocked",
-                        or_(
-                            Client.last_visit_date < sixty_days_ago,
-                            Client.last_visit_date.is_(None),
-                        ),
-                        or_(
-                            Client.whatsapp.isnot(None),
-                            Client.phone.isnot(None),
-                        ),
-                    )
-                )
-            )
+        opted_out = await self.opt_outs.get(max_age_seconds=0)
 
-            clients = []
-            for row in result:
-                phone = row.whatsapp or row.phone
-                if phone:
-                    clients.append(
-                        {
-                            "id": str(row.id),
-                            "name": f"{row.first_name} {row.last_name}",
-                            "phone": phone,
-                        }
-                    )
+        visited_before = datetime.utcnow() - timedelta(
+            days=self.marketing_inactive_days
+        )
+        async with get_db_connection(readonly=True) as conn:
+            rows = await queries.fetch_eligible_marketing_clients(conn, visited_before)
 
-            activity.logger.info(
-                f"Found {len(clients)} eligible clients for campaign {campaign_id}"
+        numbers = normalize_phone_numbers(
+            (row.whatsapp or row.phone for row in rows), self.country_code
+        )
+
+        clients = []
+        seen = set()
+        suppressed = {"invalid_phone": 0, "opted_out": 0, "duplicate": 0}
+        for row, number in zip(rows, numbers):
+            if not number.valid:
+                suppressed["invalid_phone"] += 1
+                continue
+            if number.e164 in opted_out:
+                suppressed["opted_out"] += 1
+                continue
+            if number.e164 in seen:
+                suppressed["duplicate"] += 1
+                continue
+            seen.add(number.e164)
+            clients.append(
+                [str(row.id), f"{row.first_name} {row.last_name}", number.e164]
+            )
+
+        for reason, count in suppressed.items():
+            if count:
+                metrics.MARKETING_RECIPIENTS_SUPPRESSED.labels(reason=reason).inc(count)
+
+        if suppressed["invalid_phone"]:
+            activity.logger.warning(
+                f"Skipped {suppressed['invalid_phone']} clients with invalid phone numbers for campaign {campaign_id}"
             )
 
-            return clients
+        activity.logger.info(
+            f"Found {len(clients)} eligible clients for campaign {campaign_id} "
+            f"(opted out: {suppressed['opted_out']}, duplicate numbers: {suppressed['duplicate']})"
+        )
+
+        return clients
 
     @activity.defn(name="send_marketing_message")
     async def send_marketing_message(self, input: dict) -> dict:
         """Send marketing message to a client"""
 
+        logger.debug(
+            "notification_sending",
+            message_type="marketing",
+            client_id=input["client_id"],
+        )
+
+        rendered = self.templates.marketing_message(
+            client_name=input["name"],
+            custom_message=input["message_template"],
+        )
+
+        phone = self._format_phone_number(input["phone"])
+        if phone is None:
+            return {"success": False, "reason": "invalid_phone"}
+
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=rendered.text,
+            template_name=rendered.template_name,
+            parameters=rendered.parameters,
+        )
+
+        self._log_send_result(
+            "marketing", result, client_id=input["client_id"], phone=phone
+        )
+
+        await self._log_notification(
+            booking_id=None,
+            client_id=UUID(input["client_id"]),
+            phone_number=phone,
+            message_type="marketing",
+            message_content=self._log_content(rendered.text, rendered.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+        )
+
+        return result
+
+    @activity.defn(name="send_marketing_batch")
+    async def send_marketing_batch(self, input: dict) -> dict:
+        """
+        Send a marketing message to a page of clients
+
+        The page is rendered in one pass; progress is heartbeated so a retried
+        attempt resumes after the last client already sent to. Numbers that
+        opted out since the audience was built are skipped.
+        """
+
+        clients = [self._marketing_recipient(client) for client in input["clients"]]
+        details = activity.info().heartbeat_details
+        start = details[0]["next_index"] if details else 0
+        sent = details[0]["sent"] if details else 0
+        failed = details[0]["failed"] if details else 0
+        skipped = details[0].get("skipped", 0) if details else 0
+        opted_out = await self.opt_outs.get()
+
         activity.logger.info(
-            f"Sending marketing message to client {input['client_id']}"
+            f"Sending marketing batch for campaign {input['campaign_id']} clients={len(clients)} resume_from={start}"
         )
 
-        async with get_db_session() as session:
-            message_text, template_params, template_name = (
-                self.templates.marketing_message(
-                    client_name=input["name"],
-                    custom_message=input["message_template"],
-                )
-            )
+        batch = self.templates.marketing_batch(
+            client_names=[name for _, name, _ in clients[start:]],
+            custom_message=input["message_template"],
+        )
+
+        for offset, (client_id, _, number) in enumerate(clients[start:]):
+            phone = self._format_phone_number(number)
+
+            if phone is None:
+                skipped += 1
+                metrics.MARKETING_RECIPIENTS_SUPPRESSED.labels(
+                    reason="invalid_phone"
+                ).inc()
+            elif phone in opted_out:
+                skipped += 1
+                metrics.MARKETING_RECIPIENTS_SUPPRESSED.labels(reason="opted_out").inc()
+            else:
+                result = await self._send_marketing(client_id, phone, batch, offset)
+                if result.get("success"):
+                    sent += 1
+                else:
+                    failed += 1
+
+            activity.heartbeat(
+                {
+                    "next_index": start + offset + 1,
+                    "sent": sent,
+                    "failed": failed,
+                    "skipped": skipped,
+                }
+            )
+
+        return {"sent": sent, "failed": failed, "skipped": skipped}
+
+    async def _send_marketing(
+        self, client_id: str, phone: str, batch: RenderedBatch, offset: int
+    ) -> dict:
+        """Send and log one pre-rendered message of a marketing batch"""
+
+        text = batch.texts[offset]
+        result = await self.whatsapp.send_message(
+            to=phone,
+            message=text,
+            template_name=batch.template_name,
+            parameter_blocks=batch.parameter_blocks[offset],
+        )
+        self._log_send_result("marketing", result, client_id=client_id, phone=phone)
+
+        await self._log_notification(
+            booking_id=None,
+            client_id=UUID(client_id),
+            phone_number=phone,
+            message_type="marketing",
+            message_content=self._log_content(text, batch.template_id),
+            status="sent" if result.get("success") else "failed",
+            provider_message_id=result.get("message_id"),
+            error_message=result.get("error"),
+        )
+
+        return result
 
-            phone = self._format_phone_number(input["phone"])
+    @staticmethod
+    def _marketing_recipient(client) -> tuple:
+        """(id, name, phone) from a client row, or a dict from older histories"""
+
+        if isinstance(client, dict):
+            return client["id"], client["name"], client["phone"]
+        return tuple(client)
+
+    @activity.defn(name="find_due_reminders")
+    async def find_due_reminders(self, input: dict) -> List[Dict[str, str]]:
+        """
+        Reminders and aftercare due in [window_start, window_end) not yet sent
 
-            result = await self.whatsapp.send_message(
-                to=phone,
-                message=message_text,
-                template_name=template_name,
-                parameters=template_params,
+        Read on the primary: a lagging replica could miss the claims and log
+        rows of the previous, overlapping run.
+        """
+
+        async with get_db_connection() as conn:
+            rows = await queries.fetch_due_reminders(
+                conn,
+                datetime.fromisoformat(input["window_start"]),
+                datetime.fromisoformat(input["window_end"]),
+                *self.reminder_offsets,
             )
 
-            if result.get("success"):
-                activity.logger.info(
-                    f"✅ Marketing message sent successfully to client {input['client_id']} message_id={result.get('message_id')}"
-                )
+        return [{"booking_id": str(row.id), "kind": row.kind} for row in rows]
+
+    @activity.defn(name="send_reminder_batch")
+    async def send_reminder_batch(self, input: dict) -> dict:
+        """
+        Send a page of due reminders / aftercare messages
+
+        Each item goes through the same path as the per-booking workflow's
+        activity for its kind. Progress is heartbeated so a retried attempt
+        resumes after the last item handled. Items are claimed before they
+        are sent (see _dispatch_reminder), so neither an overlapping run nor
+        a retry after an unrecorded heartbeat sends one twice.
+        """
+
+        senders = {
+            "reminder_24h": self.send_24h_reminder_message,
+            "reminder_1h": self.send_1h_reminder_message,
+            "aftercare": self.send_aftercare_message,
+        }
+
+        items = input["items"]
+        details = activity.info().heartbeat_details
+        start = details[0]["next_index"] if details else 0
+        sent = details[0]["sent"] if details else 0
+        skipped = details[0]["skipped"] if details else 0
+        failed = details[0]["failed"] if details else 0
+
+        for index in range(start, len(items)):
+            item = items[index]
+            outcome = await self._dispatch_reminder(senders[item["kind"]], item)
+
+            if outcome == "sent":
+                sent += 1
+            elif outcome == "skipped":
+                skipped += 1
             else:
-                activity.logger.error(
-                    f"❌ Failed to send marketing message to client {input['client_id']} error={result.get('error')}"
-                )
+                failed += 1
 
-            await self._log_notification(
-                session=session,
-                booking_id=None,
-                client_id=UUID(input["client_id"]),
-                phone_number=phone,
-                message_type="marketing",
-                message_content=message_text,
-                status="sent" if result.get("success") else "failed",
-                provider_message_id=result.get("message_id"),
-                error_message=result.get("error"),
+            activity.heartbeat(
+                {
+                    "next_index": index + 1,
+                    "sent": sent,
+                    "skipped": skipped,
+                    "failed": failed,
+                }
             )
 
-            return result
+        return {"sent": sent, "skipped": skipped, "failed": failed}
 
-    async def _get_booking_details(
-        self, session: AsyncSession, booking_id: str
-    ) -> Optional[dict]:
-        """Fetch booking details with client and treatment info"""
+    async def _dispatch_reminder(
+        self, send: Callable[[dict], Awaitable[dict]], item: dict
+    ) -> str:
+        """
+        Claim one due item, send it, and release the claim unless it was sent
+
+        The claim is a reminder_dispatches row committed on the primary
+        before the send, so the dedupe does not depend on the best-effort
+        notification_logs write. An item already claimed is skipped. A
+        worker lost mid-send leaves its claim, so that item is not sent
+        rather than sent twice.
+        """
+
+        booking_id = UUID(item["booking_id"])
+        async with get_db_connection() as conn:
+            claimed = await queries.claim_reminder_dispatch(
+                conn, booking_id, item["kind"], datetime.utcnow()
+            )
+        if not claimed:
+            return "skipped"
+
+        try:
+            result = await send({"booking_id": item["booking_id"]})
+        except Exception as e:
+            activity.logger.error(
+                f"Failed to send {item['kind']} for booking {item['booking_id']}: {e}"
+            )
+            result = {"success": False, "error": str(e)}
+
+        if result.get("success"):
+            return "sent"
+
+        # Let a later run pick the item up again
+        try:
+            async with get_db_connection() as conn:
+                await queries.release_reminder_dispatch(conn, booking_id, item["kind"])
+        except Exception as e:
+            activity.logger.error(
+                f"Failed to release {item['kind']} claim for booking {item['booking_id']}: {e}"
+            )
+
+        return "skipped" if result.get("reason") else "failed"
+
+    async def _get_booking_details(self, booking_id: str) -> Optional[dict]:
+        """Fetch booking details with client contact and eligibility info"""
 
         try:
             booking_uuid = (
@@ -540,95 +743,81 @@ class NotificationActivities:
             activity.logger.error(f"Invalid booking_id format: {booking_id}")
             return None
 
-        result = await session.execute(
-            select(
-                Booking,
-                Client.first_name,
-                Client.last_name,
-                Client.whatsapp,
-                Client.phone,
-            )
-            .join(Client, Booking.client_id == Client.id)
-            .where(Booking.id == booking_uuid)
-        )
+        row = await fetch_readonly(queries.fetch_booking_details, booking_uuid)
 
-        row = result.first()
         if not row:
             activity.logger.warning(f"Booking {booking_id} not found in database")
             return None
 
-        booking, first_name, last_name, whatsapp, phone = row
-
         return {
-            "booking_id": str(booking.id),
-            "client_id": booking.client_id,
-            "client_name": f"{first_name} {last_name}",
-            "client_phone": whatsapp or phone,
-            "appointment_date": booking.booking_date.strftime("%Y-%m-%d"),
-            "appointment_time": booking.start_time.strftime("%H:%M"),
+            "booking_id": str(row.id),
+            "client_id": row.client_id,
+            "client_name": f"{row.first_name} {row.last_name}",
+            "client_phone": row.whatsapp or row.phone,
+            "client_is_active": row.client_is_active,
+            "client_status": row.client_status,
+            "appointment_date": row.booking_date.strftime("%Y-%m-%d"),
+            "appointment_time": row.start_time.strftime("%H:%M"),
+            "duration_minutes": row.duration_minutes,
             "treatment_name": "Treatment",
             "staff_name": "Staff",
-            "status": booking.status,
+            "status": row.status,
         }
 
-    async def _can_send_to_client(self, session: AsyncSession, client_id: UUID) -> bool:
-        """Check if client can receive messages"""
-
-        result = await session.execute(
-            select(Client.is_active, Client.status, Client.whatsapp_verified).where(
-                Client.id == client_id
-            )
-        )
-
-        row = result.first()
-        if not row:
-            activity.logger.warning(f"Client {client_id} not found")
-            return False
+    def _can_send_to_client(self, booking_data: dict) -> bool:
+        """Check if the booking's client can receive messages"""
 
-        is_active, status, whatsapp_verified = row
+        is_active = booking_data["client_is_active"]
+        status = booking_data["client_status"]
 
         can_send = is_active and status != "blocked"
 
         if not can_send:
             activity.logger.info(
-                f"Client {client_id} cannot receive messages is_active={is_active} status={status}"
+                f"Client {booking_data['client_id']} cannot receive messages is_active={is_active} status={status}"
             )
 
         return can_send
 
-    def _format_phone_number(self, phone: str) -> str:
+    def _format_phone_number(self, phone: str) -> Optional[str]:
         """
-        Format phone number to E.164 format
+        Format phone number to E.164 format; None (logged) when it is not a
+        valid number, so the caller skips the send
         """
 
-        if not phone:
-            raise ValueError("Phone number is required")
-
-        cleaned = phone.strip()
-
-        if cleaned.startswith("+"):
-            activity.logger.debug(f"Phone already has country code: {cleaned}")
-            return cleaned
+        try:
+            return format_phone_number(phone, self.country_code)
+        except ValueError as e:
+            activity.logger.warning(f"Skipping invalid phone number: {e}")
+            return None
 
-        phone_digits = "".join(filter(str.isdigit, cleaned))
+    def _log_content(self, text: str, template_id: str) -> str:
+        """Content stored in notification_logs for a rendered message"""
 
-        if len(phone_digits) > 10 and not phone_digits.startswith("0"):
-            formatted = "+" + phone_digits
-            activity.logger.debug(f"Phone appears to have country code: {formatted}")
-            return formatted
+        if self.log_template_ids:
+            return template_id
+        return text
 
-        if phone_digits.startswith("0"):
-            formatted = "+263" + phone_digits[1:]
-            activity.logger.debug(f"Local number converted: {formatted}")
-            return formatted
+    def _log_send_result(self, message_type: str, result: dict, **context: Any) -> None:
+        """Log the provider outcome of one send as a structured event"""
 
-        formatted = "+263" + phone_digits
-        activity.logger.debug(f"Added default country code: {formatted}")
-        return formatted
+        if result.get("success"):
+            logger.info(
+                "notification_sent",
+                message_type=message_type,
+                message_id=result.get("message_id"),
+                **context,
+            )
+        else:
+            logger.error(
+                "notification_failed",
+                message_type=message_type,
+                error=result.get("error"),
+                **context,
+            )
 
     async def _log_notification(
         self,
-        session: AsyncSession,
         booking_id: Optional[str],
         client_id: UUID,
         phone_number: str,
@@ -637,80 +826,143 @@ class NotificationActivities:
         status: str,
         provider_message_id: Optional[str] = None,
         error_message: Optional[str] = None,
+        mark_booking: Optional[str] = None,
     ) -> None:
-        """Log notification to database"""
+        """
+        Log notification to database
+
+        When mark_booking names a bookings timestamp column
+        (confirmation_sent_at / reminder_sent_at) and the message was sent,
+        it is stamped in the same transaction. The hourly stats rollup is
+        updated in a savepoint of that transaction, so a rollup failure
+        never loses the log row or the booking marker.
+        """
+
+        now = datetime.utcnow()
 
         try:
-            log_entry = NotificationLog(
-                booking_id=UUID(booking_id) if booking_id else None,
-                client_id=client_id,
-                phone_number=phone_number,
-                message_type=message_type,
-                message_content=message_content,
-                sent_at=datetime.utcnow() if status == "sent" else None,
-                status=status,
-                provider_message_id=provider_message_id,
-                error_message=error_message,
-                retry_count=0,
-            )
+            async with get_db_connection() as conn:
+                await queries.insert_notification_log(
+                    conn,
+                    booking_id=UUID(booking_id) if booking_id else None,
+                    client_id=client_id,
+                    phone_number=phone_number,
+                    message_type=message_type,
+                    message_content=message_content,
+                    sent_at=now if status == "sent" else None,
+                    status=status,
+                    provider_message_id=provider_message_id,
+                    error_message=error_message,
+                    retry_count=0,
+                    created_at=now,
+                )
+
+                if mark_booking and booking_id and status == "sent":
+                    await queries.mark_booking_sent(
+                        conn, UUID(booking_id), mark_booking, now
+                    )
 
-            session.add(log_entry)
-            await session.commit()
+                try:
+                    async with conn.begin_nested():
+                        await queries.increment_stats(conn, now, message_type, status)
+                except Exception as e:
+                    logger.warning(
+                        "notification_stats_increment_failed",
+                        message_type=message_type,
+                        status=status,
+                        error=str(e),
+                    )
 
-            activity.logger.debug(
-                f"Notification logged to database booking_id={booking_id} message_type={message_type} status={status}"
+            logger.debug(
+                "notification_logged",
+                booking_id=booking_id,
+                message_type=message_type,
+                status=status,
             )
 
         except Exception as e:
             activity.logger.error(
                 f"Failed to log notification to database booking_id={booking_id} error={str(e)}"
             )
-            await session.rollback()
 
-    async def _update_booking_confirmation(
-        self, session: AsyncSession, booking_id: str
-    ) -> None:
-        """Update booking confirmation timestamp"""
 
-        try:
-            booking_uuid = UUID(booking_id)
-            result = await session.execute(
-                select(Booking).where(Booking.id == booking_uuid)
-            )
-            booking = result.scalar_one_or_none()
+class MaintenanceActivities:
+    """Activities for notification_logs housekeeping"""
 
-            if booking:
-                booking.confirmation_sent_at = datetime.utcnow()
-                await session.commit()
-                activity.logger.debug(
-                    f"Updated confirmation timestamp for booking {booking_id}"
+    def __init__(
+        self, archive_dir: Optional[str], retention_months: int, months_ahead: int
+    ):
+        self.archive_dir = archive_dir
+        self.retention_months = retention_months
+        self.months_ahead = months_ahead
+
+    @activity.defn(name="ensure_notification_log_partitions")
+    async def ensure_notification_log_partitions(self) -> List[str]:
+        """Create the upcoming monthly notification_logs partitions"""
+
+        async with get_db_connection() as conn:
+            if not await partitions.is_partitioned(conn):
+                logger.warning(
+                    "notification_logs_not_partitioned",
+                    hint="run scripts/partition_notification_logs.py",
                 )
-        except Exception as e:
-            activity.logger.error(
-                f"Failed to update booking confirmation timestamp booking_id={booking_id} error={str(e)}"
+                return []
+
+            created = await partitions.ensure_partitions(
+                conn, datetime.utcnow(), self.months_ahead
             )
-            await session.rollback()
 
-    async def _update_booking_reminder(
-        self, session: AsyncSession, booking_id: str
-    ) -> None:
-        """Update booking reminder timestamp"""
+        if created:
+            logger.info("notification_log_partitions_created", partitions=created)
 
-        try:
-            booking_uuid = UUID(booking_id)
-            result = await session.execute(
-                select(Booking).where(Booking.id == booking_uuid)
+        return created
+
+    @activity.defn(name="archive_notification_log_partitions")
+    async def archive_notification_log_partitions(self) -> List[Dict[str, Any]]:
+        """
+        Detach partitions past retention, export them to gzip NDJSON, then drop
+
+        Partitions detached by an earlier, interrupted run are picked up
+        again here. Skipped while no archive directory is configured, so
+        history is never dropped without a durable copy.
+        """
+
+        if not self.archive_dir:
+            logger.warning(
+                "notification_log_archive_skipped",
+                reason="NOTIFICATION_LOG_ARCHIVE_DIR is not set",
+            )
+            return []
+
+        async with get_db_connection() as conn:
+            if not await partitions.is_partitioned(conn):
+                return []
+            await partitions.detach_expired_partitions(
+                conn, datetime.utcnow(), self.retention_months
             )
-            booking = result.scalar_one_or_none()
 
-            if booking:
-                booking.reminder_sent_at = datetime.utcnow()
-                await session.commit()
-                activity.logger.debug(
-                    f"Updated reminder timestamp for booking {booking_id}"
+        async with get_db_connection() as conn:
+            pending = await partitions.list_detached_partitions(conn)
+
+        archived = []
+        for name in pending:
+            async with get_db_connection() as conn:
+                path, rows = await partitions.export_partition(
+                    conn,
+                    name,
+                    self.archive_dir,
+                    progress=lambda count: activity.heartbeat(name, count),
                 )
-        except Exception as e:
-            activity.logger.error(
-                f"Failed to update booking reminder timestamp booking_id={booking_id} error={str(e)}"
+
+            async with get_db_connection() as conn:
+                await partitions.drop_partition(conn, name)
+
+            logger.info(
+                "notification_log_partition_archived",
+                partition=name,
+                rows=rows,
+                path=str(path),
             )
-            await session.rollback()
+            archived.append({"partition": name, "rows": rows, "path": str(path)})
+
+        return archived
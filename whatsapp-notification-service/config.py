@@ -2,7 +2,9 @@
 Configuration management using Pydantic settings
 """
 
+from datetime import timedelta
 from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -13,20 +15,83 @@ class Settings(BaseSettings):
     # Temporal Configuration
     TEMPORAL_HOST: str = "temporal:7233"
     TEMPORAL_NAMESPACE: str = "default"
+    # Task queues by priority. TEMPORAL_TASK_QUEUE is the transactional one
+    # (confirmations, cancellations, reschedules); it keeps its old name so
+    # executions started before the split still finish on it (see
+    # WORKER_TRANSACTIONAL_LEGACY_TYPES).
     TEMPORAL_TASK_QUEUE: str = "notifications-queue"
+    TEMPORAL_REMINDERS_TASK_QUEUE: str = "notifications-reminders"
+    TEMPORAL_MARKETING_TASK_QUEUE: str = "notifications-marketing"
+    # Payloads are msgpack-encoded; those larger than this many bytes are
+    # also zlib-compressed. Must match between the API and the workers.
+    TEMPORAL_PAYLOAD_COMPRESSION_THRESHOLD_BYTES: int = 512
 
     # Database Configuration
     TEMPORAL_DATABASE_URL: str
+    # Optional read replica for read-only queries. Reads fall back to the
+    # primary while replica lag exceeds DB_REPLICA_MAX_LAG_SECONDS.
+    TEMPORAL_DATABASE_REPLICA_URL: Optional[str] = None
+    DB_REPLICA_MAX_LAG_SECONDS: float = 5.0
+    DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5.0
 
     # WhatsApp Provider (ChakraHQ)
     CHAKRA_API_KEY: str
     CHAKRA_API_URL: str
 
+    # Bulk workflow status endpoint
+    BULK_STATUS_MAX_ITEMS: int = 500
+    BULK_STATUS_CONCURRENCY: int = 20
+
+    # Workflow status cache. Closed workflows are immutable and kept long;
+    # running workflow status is only reused for a few seconds. SHARED also
+    # stores closed workflows in Postgres for all API replicas.
+    STATUS_CACHE_MAX_ENTRIES: int = 10000
+    STATUS_CACHE_CLOSED_TTL_SECONDS: float = 86400.0
+    STATUS_CACHE_RUNNING_TTL_SECONDS: float = 5.0
+    STATUS_CACHE_SHARED: bool = False
+
+    # Delivery receipt webhook. Events are buffered in memory and applied in
+    # batches. An empty token leaves the endpoint unauthenticated.
+    CHAKRA_WEBHOOK_TOKEN: str = ""
+    RECEIPT_FLUSH_INTERVAL_SECONDS: float = 1.0
+    RECEIPT_BATCH_SIZE: int = 5000
+    RECEIPT_MAX_PENDING: int = 100000
+
+    # "sync": the booking start endpoint answers once Temporal accepted the
+    # start. "accept": it answers 202 with a deterministic workflow id and
+    # start_batcher.py makes the start in the background, flushing a batch
+    # when START_BATCH_SIZE are queued or every flush interval.
+    WORKFLOW_START_MODE: str = "sync"
+    START_BATCH_SIZE: int = 50
+    START_FLUSH_INTERVAL_SECONDS: float = 0.05
+    START_CONCURRENCY: int = 20
+    START_MAX_ATTEMPTS: int = 5
+    START_RETRY_BACKOFF_SECONDS: float = 1.0
+    START_MAX_PENDING: int = 10000
+    START_STATUS_TTL_SECONDS: float = 3600.0
+
+    # Booking outbox (outbox.py). Events are picked up on NOTIFY, or by
+    # polling at the interval when notifications are missed. Failed events
+    # are retried with exponential backoff, then left with their error.
+    OUTBOX_ENABLED: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_CONCURRENCY: int = 20
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 5.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETRY_BACKOFF_SECONDS: float = 5.0
+    OUTBOX_RETRY_BACKOFF_MAX_SECONDS: float = 300.0
+
     # Business Information
     BUSINESS_NAME: str = "STUDIO S BEAUTY BAR"
     BUSINESS_PHONE: str = ""
     BUSINESS_ADDRESS: str = ""
 
+    # Message Templates
+    TEMPLATES_DIR: str = "templates"
+    TEMPLATE_RELOAD_INTERVAL_SECONDS: float = 30.0
+    # "rendered" stores the full message text, "template_id" stores e.g. "confirmation@v1"
+    NOTIFICATION_LOG_CONTENT: str = "rendered"
+
     # Notification Settings
     MAX_RETRY_ATTEMPTS: int = 5
     RETRY_INITIAL_INTERVAL_SECONDS: int = 1
@@ -36,22 +101,114 @@ class Settings(BaseSettings):
     # Rate Limiting
     WHATSAPP_RATE_LIMIT_PER_MINUTE: int = 60
 
-    # Timing Configuration
+    # Timing Configuration. Reminder leads before the appointment starts and
+    # the aftercare delay after it ends, for booking workflows and the
+    # reminder dispatcher alike (see reminder_offsets()).
     REMINDER_24H_HOURS_BEFORE: int = 24
     REMINDER_1H_HOURS_BEFORE: int = 1
-    AFTERCARE_HOURS_AFTER: int = 3
+    AFTERCARE_HOURS_AFTER: int = 24
+    # Per-booking reminders are spread deterministically over a window this
+    # wide, centred on the nominal time, so slots at :00 and :30 do not all
+    # fire at once. Capped at the lead time; 0 disables.
+    REMINDER_24H_SPREAD_MINUTES: int = 120
+    REMINDER_1H_SPREAD_MINUTES: int = 20
+
+    # "per_booking": each booking workflow sleeps until its reminders.
+    # "dispatcher": booking workflows only confirm; a cron dispatcher sends
+    # reminders and aftercare for all bookings due in each interval.
+    REMINDER_SCHEDULING_MODE: str = "per_booking"
+    REMINDER_DISPATCH_INTERVAL_MINUTES: int = 5
+
+    # Phone numbers without a country code are assumed to be local
+    DEFAULT_COUNTRY_CODE: str = "263"
 
-    # Marketing Campaign Settings
+    # Marketing Campaign Settings. Campaigns go to clients whose last visit
+    # is more than MARKETING_INACTIVE_DAYS ago.
     MARKETING_INACTIVE_DAYS: int = 60
+    # How stale the opt-out list may be when a campaign page is sent. The
+    # audience itself is always built from a fresh load.
+    MARKETING_OPT_OUT_REFRESH_SECONDS: float = 60.0
+
+    # Database pool. Size and overflow are derived from the process's own
+    # concurrency unless set explicitly: activity slots for a worker
+    # (PROCESS_ROLE "worker"), outbox and start-batcher concurrency for the
+    # API ("api").
+    PROCESS_ROLE: str = "worker"
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_TIMEOUT_SECONDS: float = 30.0
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    # When > 0, idle connections are validated in the background instead of
+    # pinging on every checkout
+    DB_POOL_VALIDATION_INTERVAL_SECONDS: int = 0
+
+    # notification_logs partitioning and retention. Partitions older than
+    # the retention window are exported to the archive directory as
+    # gzip NDJSON and dropped. The directory must be persistent storage
+    # shared by all workers (a volume, not the container filesystem);
+    # while it is unset, nothing is archived or dropped. An empty cron
+    # disables the maintenance run.
+    NOTIFICATION_LOG_RETENTION_MONTHS: int = 6
+    NOTIFICATION_LOG_PARTITIONS_AHEAD: int = 2
+    NOTIFICATION_LOG_ARCHIVE_DIR: Optional[str] = None
+    NOTIFICATION_LOG_MAINTENANCE_CRON: str = "30 2 * * *"
 
-    DB_POOL_SIZE: int = 5
-    DB_MAX_OVERFLOW: int = 10
+    # Worker concurrency. WORKER_TASK_QUEUES picks the queues a worker
+    # process polls (transactional, reminders, marketing); each gets its
+    # own slots. The unprefixed limits apply to the transactional queue.
+    WORKER_TASK_QUEUES: str = "transactional,reminders,marketing"
+    # Also serve reminder and marketing types on the transactional queue,
+    # for executions started before the queue split. Enable only until
+    # those have drained; it is removed afterwards.
+    WORKER_TRANSACTIONAL_LEGACY_TYPES: bool = False
+    WORKER_MAX_CONCURRENT_ACTIVITIES: int = 10
+    WORKER_MAX_CONCURRENT_WORKFLOW_TASKS: int = 50
+    WORKER_REMINDERS_MAX_CONCURRENT_ACTIVITIES: int = 10
+    WORKER_REMINDERS_MAX_CONCURRENT_WORKFLOW_TASKS: int = 50
+    WORKER_MARKETING_MAX_CONCURRENT_ACTIVITIES: int = 5
+    WORKER_MARKETING_MAX_CONCURRENT_WORKFLOW_TASKS: int = 10
 
+    # launcher.py: worker processes per pod (0 = one per available CPU,
+    # honouring cgroup quotas). Exited or unresponsive children are
+    # restarted with exponential backoff.
+    WORKER_PROCESSES: int = 0
+    WORKER_HEARTBEAT_INTERVAL_SECONDS: float = 5.0
+    WORKER_HEARTBEAT_TIMEOUT_SECONDS: float = 60.0
+    WORKER_RESTART_BACKOFF_SECONDS: float = 1.0
+    WORKER_RESTART_BACKOFF_MAX_SECONDS: float = 60.0
+
+    # Prometheus metrics port for the worker (0 disables). Under launcher.py
+    # it serves /metrics aggregated over all processes and /health.
+    METRICS_PORT: int = 9464
+
+    # Backend used for sends: "chakrahq" or "simulator" (services/providers.py)
     WHATSAPP_PROVIDER: str = "chakrahq"
     WHATSAPP_API_KEY: str = ""
+    # Sender number pool, as a JSON list of
+    # {"name", "api_key", "api_url", "messages_per_second", "provider"};
+    # only name is required, the rest default to the settings here. Empty
+    # sends everything through CHAKRA_API_KEY / CHAKRA_API_URL unpooled.
+    # Budgets apply per worker process.
+    WHATSAPP_SENDERS: List[Dict[str, Any]] = []
+    WHATSAPP_SENDER_MESSAGES_PER_SECOND: float = 20.0
+    WHATSAPP_SENDER_MAX_QUEUE_SECONDS: float = 5.0
+    WHATSAPP_SENDER_FAILURE_THRESHOLD: int = 5
+    WHATSAPP_SENDER_UNHEALTHY_SECONDS: float = 60.0
+    WHATSAPP_SENDER_RATE_LIMIT_COOLDOWN_SECONDS: float = 30.0
     WHATSAPP_PHONE_NUMBER: str = ""
     CHAKRA_BASE_URL: str = "https://api.chakrahq.com/v1"
 
+    # WHATSAPP_PROVIDER=simulator: nothing is sent. Latency is lognormal
+    # with the given median and p99; error rates are fractions of sends;
+    # sends above the per-second cap get 429 (0 disables the cap).
+    SIMULATOR_LATENCY_MEDIAN_MS: float = 150.0
+    SIMULATOR_LATENCY_P99_MS: float = 800.0
+    SIMULATOR_RATE_LIMIT_ERROR_RATE: float = 0.0
+    SIMULATOR_SERVER_ERROR_RATE: float = 0.0
+    SIMULATOR_MAX_MESSAGES_PER_SECOND: float = 0.0
+    SIMULATOR_SEED: Optional[int] = None
+
     SUPPORT_EMAIL: str = ""
 
     MAX_RETRIES: int = 3
@@ -60,6 +217,11 @@ class Settings(BaseSettings):
 
     # Logging
     LOG_LEVEL: str = "INFO"
+    LOG_ASYNC: bool = True
+    LOG_QUEUE_SIZE: int = 10000
+    # Applied to high-volume success events only (see utils.logger.SAMPLED_EVENTS)
+    LOG_SUCCESS_SAMPLE_RATE: float = 1.0
+    LOG_EVENT_RATE_LIMIT_PER_SECOND: int = 0
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -67,6 +229,46 @@ class Settings(BaseSettings):
         case_sensitive=True,
     )
 
+    def reminder_offsets(self) -> Tuple[timedelta, timedelta, timedelta]:
+        """(24h reminder lead, 1h reminder lead, aftercare delay after the end)"""
+
+        return (
+            timedelta(hours=self.REMINDER_24H_HOURS_BEFORE),
+            timedelta(hours=self.REMINDER_1H_HOURS_BEFORE),
+            timedelta(hours=self.AFTERCARE_HOURS_AFTER),
+        )
+
+    def worker_task_queues(self) -> Dict[str, Tuple[str, int, int]]:
+        """
+        Queues this worker polls, by role:
+        (task queue, max concurrent activities, max concurrent workflow tasks)
+        """
+
+        available = {
+            "transactional": (
+                self.TEMPORAL_TASK_QUEUE,
+                self.WORKER_MAX_CONCURRENT_ACTIVITIES,
+                self.WORKER_MAX_CONCURRENT_WORKFLOW_TASKS,
+            ),
+            "reminders": (
+                self.TEMPORAL_REMINDERS_TASK_QUEUE,
+                self.WORKER_REMINDERS_MAX_CONCURRENT_ACTIVITIES,
+                self.WORKER_REMINDERS_MAX_CONCURRENT_WORKFLOW_TASKS,
+            ),
+            "marketing": (
+                self.TEMPORAL_MARKETING_TASK_QUEUE,
+                self.WORKER_MARKETING_MAX_CONCURRENT_ACTIVITIES,
+                self.WORKER_MARKETING_MAX_CONCURRENT_WORKFLOW_TASKS,
+            ),
+        }
+
+        roles = [r.strip() for r in self.WORKER_TASK_QUEUES.split(",") if r.strip()]
+        unknown = set(roles) - set(available)
+        if unknown:
+            raise ValueError(f"Unknown WORKER_TASK_QUEUES roles: {sorted(unknown)}")
+
+        return {role: available[role] for role in roles}
+
 
 @lru_cache
 def get_settings() -> Settings:
@@ -0,0 +1,108 @@
+"""
+Temporal data converter: msgpack payloads with zlib compression
+
+Values are encoded as msgpack instead of JSON, and payloads above a size
+threshold are compressed by a codec before they reach the server. JSON
+payloads are still decoded, so workflows started before the switch keep
+replaying. The API and every worker must use the same converter.
+"""
+
+import dataclasses
+import zlib
+from typing import Any, List, Optional, Sequence
+
+import msgpack
+from temporalio.api.common.v1 import Payload
+from temporalio.converter import (
+    AdvancedJSONEncoder,
+    BinaryNullPayloadConverter,
+    BinaryPlainPayloadConverter,
+    BinaryProtoPayloadConverter,
+    CompositePayloadConverter,
+    DataConverter,
+    EncodingPayloadConverter,
+    JSONPlainPayloadConverter,
+    JSONProtoPayloadConverter,
+    PayloadCodec,
+    value_to_type,
+)
+
+MSGPACK_ENCODING = b"binary/msgpack"
+ZLIB_ENCODING = b"binary/zlib"
+
+# Same extras as the JSON converter: dataclasses, datetimes, UUIDs, iterables
+_json_encoder = AdvancedJSONEncoder()
+
+
+class MsgPackPayloadConverter(EncodingPayloadConverter):
+    """Converter for 'binary/msgpack' payloads, typed back from hints like JSON"""
+
+    @property
+    def encoding(self) -> str:
+        return MSGPACK_ENCODING.decode()
+
+    def to_payload(self, value: Any) -> Optional[Payload]:
+        return Payload(
+            metadata={"encoding": MSGPACK_ENCODING},
+            data=msgpack.packb(value, default=_json_encoder.default),
+        )
+
+    def from_payload(self, payload: Payload, type_hint: Optional[type] = None) -> Any:
+        value = msgpack.unpackb(payload.data, strict_map_key=False)
+        if type_hint:
+            value = value_to_type(type_hint, value)
+        return value
+
+
+class CompactPayloadConverter(CompositePayloadConverter):
+    """Default Temporal converters with msgpack in place of JSON for encoding"""
+
+    def __init__(self) -> None:
+        super().__init__(
+            BinaryNullPayloadConverter(),
+            BinaryPlainPayloadConverter(),
+            JSONProtoPayloadConverter(),
+            BinaryProtoPayloadConverter(),
+            MsgPackPayloadConverter(),
+            # Never picked for encoding; decodes payloads already in history
+            JSONPlainPayloadConverter(),
+        )
+
+
+class ZlibPayloadCodec(PayloadCodec):
+    """Compresses whole payloads of at least min_bytes when it saves space"""
+
+    def __init__(self, min_bytes: int, level: int = 1):
+        self.min_bytes = min_bytes
+        self.level = level
+
+    async def encode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        encoded = []
+        for payload in payloads:
+            data = payload.SerializeToString()
+            if len(data) >= self.min_bytes:
+                compressed = zlib.compress(data, self.level)
+                if len(compressed) < len(data):
+                    payload = Payload(
+                        metadata={"encoding": ZLIB_ENCODING}, data=compressed
+                    )
+            encoded.append(payload)
+        return encoded
+
+    async def decode(self, payloads: Sequence[Payload]) -> List[Payload]:
+        decoded = []
+        for payload in payloads:
+            if payload.metadata.get("encoding") == ZLIB_ENCODING:
+                payload = Payload.FromString(zlib.decompress(payload.data))
+            decoded.append(payload)
+        return decoded
+
+
+def data_converter(compression_threshold_bytes: int) -> DataConverter:
+    """The converter to pass to every Client.connect in this service"""
+
+    return dataclasses.replace(
+        DataConverter.default,
+        payload_converter_class=CompactPayloadConverter,
+        payload_codec=ZlibPayloadCodec(compression_threshold_bytes),
+    )
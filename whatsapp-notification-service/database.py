@@ -2,13 +2,17 @@
 Database connection and SQLAlchemy models
 """
 
+import asyncio
+import time as _time
 from contextlib import asynccontextmanager
 from datetime import datetime, time
-from typing import Optional
+from typing import Any, Awaitable, Callable, Optional, Tuple
 
-from config import get_settings
+import structlog
+from config import Settings, get_settings
 from sqlalchemy import (
     UUID,
+    BigInteger,
     Boolean,
     DateTime,
     ForeignKey,
@@ -17,9 +21,17 @@ from sqlalchemy import (
     Numeric,
     String,
     Text,
+    event,
+    exc,
+    text,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from utils import metrics
+
+logger = structlog.get_logger()
 
 
 # Base class for models
@@ -27,14 +39,97 @@ class Base(DeclarativeBase):
     metadata = MetaData()
 
 
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async queue pool that records how long callers wait for a connection
+
+    Occupancy gauges are set explicitly rather than through set_function,
+    whose callbacks are never collected in Prometheus multiprocess mode.
+    Metrics carry the pool's name ("primary" or "replica") as a label.
+    """
+
+    name = "primary"
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.name = self.name
+        return pool
+
+    def _do_get(self):
+        started = _time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            metrics.DB_POOL_CHECKOUT_TIMEOUTS.labels(pool=self.name).inc()
+            raise
+        finally:
+            metrics.DB_POOL_CHECKOUT_WAIT.labels(pool=self.name).observe(
+                _time.perf_counter() - started
+            )
+
+    def _do_return_conn(self, record):
+        # The checkin event fires before the connection is back in the
+        # queue (or, for overflow, closed), so occupancy is recorded here
+        super()._do_return_conn(record)
+        self.record_occupancy()
+
+    def record_occupancy(self) -> None:
+        metrics.DB_POOL_CHECKED_OUT.labels(pool=self.name).set(self.checkedout())
+        metrics.DB_POOL_OVERFLOW.labels(pool=self.name).set(max(self.overflow(), 0))
+
+
+def _concurrency_slots(settings: Settings) -> int:
+    """Database work this process can run at once, by PROCESS_ROLE"""
+
+    if settings.PROCESS_ROLE == "api":
+        slots = settings.OUTBOX_CONCURRENCY if settings.OUTBOX_ENABLED else 0
+        if settings.WORKFLOW_START_MODE == "accept":
+            slots += settings.START_CONCURRENCY
+        return slots
+
+    return sum(
+        activities for _, activities, _ in settings.worker_task_queues().values()
+    )
+
+
+def resolve_pool_size(settings: Settings) -> Tuple[int, int]:
+    """
+    Pool size and overflow for this process.
+
+    Explicit DB_POOL_SIZE / DB_MAX_OVERFLOW win. Otherwise every slot of
+    the process's own concurrency (activity slots on the polled task
+    queues for a worker, outbox and start-batcher concurrency for the API)
+    gets a persistent connection, plus one for background work, and
+    overflow covers half the slots again for short bursts.
+    """
+
+    slots = _concurrency_slots(settings)
+    pool_size = settings.DB_POOL_SIZE
+    max_overflow = settings.DB_MAX_OVERFLOW
+
+    if pool_size is None:
+        pool_size = slots + 1
+    if max_overflow is None:
+        max_overflow = max(2, slots // 2)
+
+    return pool_size, max_overflow
+
+
 # Database engine (singleton)
 settings = get_settings()
+pool_size, max_overflow = resolve_pool_size(settings)
 engine = create_async_engine(
     settings.TEMPORAL_DATABASE_URL,
     echo=False,
-    pool_pre_ping=True,
-    pool_size=10,
-    max_overflow=20,
+    poolclass=InstrumentedAsyncQueuePool,
+    # Per-checkout pings are replaced by the background validator when enabled
+    pool_pre_ping=(
+        settings.DB_POOL_PRE_PING and settings.DB_POOL_VALIDATION_INTERVAL_SECONDS <= 0
+    ),
+    pool_size=pool_size,
+    max_overflow=max_overflow,
+    pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+    pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
 )
 
 async_session_maker = async_sessionmaker(
@@ -43,11 +138,215 @@ async_session_maker = async_sessionmaker(
     expire_on_commit=False,
 )
 
+# Optional read replica for read-only queries
+replica_engine = None
+replica_session_maker = None
+if settings.TEMPORAL_DATABASE_REPLICA_URL:
+    replica_engine = create_async_engine(
+        settings.TEMPORAL_DATABASE_REPLICA_URL,
+        echo=False,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+    )
+    replica_session_maker = async_sessionmaker(
+        replica_engine,
+        class_=AsyncSession,
+        expire_on_commit=False,
+    )
+
+
+def _instrument_pool(sync_engine, name: str) -> None:
+    """Export pool configuration, occupancy and connection churn"""
+
+    pool = sync_engine.pool
+    pool.name = name
+    metrics.DB_POOL_SIZE.labels(pool=name).set(pool.size())
+    metrics.DB_POOL_MAX_OVERFLOW.labels(pool=name).set(pool._max_overflow)
+    pool.record_occupancy()
+
+    # Listeners carry over when dispose() replaces the pool; occupancy is
+    # read from whichever pool the engine holds now
+    def record_occupancy(*_):
+        sync_engine.pool.record_occupancy()
+
+    def connected(*_):
+        metrics.DB_POOL_CONNECTIONS_OPENED.labels(pool=name).inc()
+        record_occupancy()
+
+    event.listen(pool, "checkout", record_occupancy)
+    event.listen(pool, "connect", connected)
+    event.listen(
+        pool,
+        "close",
+        lambda *_: metrics.DB_POOL_CONNECTIONS_CLOSED.labels(pool=name).inc(),
+    )
+    event.listen(
+        pool,
+        "invalidate",
+        lambda *_: metrics.DB_POOL_CONNECTIONS_INVALIDATED.labels(pool=name).inc(),
+    )
+
+
+_instrument_pool(engine.sync_engine, "primary")
+if replica_engine is not None:
+    _instrument_pool(replica_engine.sync_engine, "replica")
+
+
+async def validate_idle_connections() -> int:
+    """
+    Ping each idle pooled connection once.
+
+    The pool hands connections out in FIFO order, so checking one out and
+    back in as many times as there are idle connections visits each of
+    them. Broken connections are invalidated by SQLAlchemy on error and
+    replaced on next use. Returns the number of failed pings.
+    """
+
+    pool = engine.sync_engine.pool
+    failures = 0
+
+    for _ in range(pool.checkedin()):
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception as e:
+            failures += 1
+            logger.warning("Idle database connection failed validation", error=str(e))
+
+    return failures
+
+
+async def run_pool_validator(interval_seconds: float) -> None:
+    """Background task replacing per-checkout pre-ping"""
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await validate_idle_connections()
+
+
+def start_pool_validator() -> Optional[asyncio.Task]:
+    """Start the background validator if DB_POOL_VALIDATION_INTERVAL_SECONDS > 0"""
+
+    interval = settings.DB_POOL_VALIDATION_INTERVAL_SECONDS
+    if interval <= 0:
+        return None
+    return asyncio.create_task(run_pool_validator(interval))
+
+
+# Lag is 0 when the replica has replayed everything it received, so an idle
+# primary does not make the replica look stale. NULL means unknown.
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """)
+
+
+class ReplicaLagMonitor:
+    """
+    Cached replica lag check.
+
+    Lag is measured at most once per check interval; concurrent callers
+    share the result. The replica is usable while its lag is known and at
+    most max_lag_seconds. A failed check marks it unusable until the next
+    successful one.
+    """
+
+    def __init__(self, replica, max_lag_seconds: float, check_interval_seconds: float):
+        self.replica = replica
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.lag_seconds: Optional[float] = None
+        self._usable = False
+        self._checked_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return _time.monotonic() - self._checked_at < self.check_interval_seconds
+
+    async def is_usable(self) -> bool:
+        if self._fresh():
+            return self._usable
+
+        async with self._lock:
+            if not self._fresh():
+                await self._refresh()
+
+        return self._usable
+
+    async def _refresh(self) -> None:
+        was_usable = self._usable
+
+        try:
+            async with self.replica.connect() as conn:
+                lag = (await conn.execute(REPLICA_LAG_SQL)).scalar()
+            self.lag_seconds = None if lag is None else float(lag)
+        except Exception as e:
+            self.lag_seconds = None
+            logger.warning("Replica lag check failed", error=str(e))
+
+        self._usable = (
+            self.lag_seconds is not None and self.lag_seconds <= self.max_lag_seconds
+        )
+        self._checked_at = _time.monotonic()
+
+        if self.lag_seconds is not None:
+            metrics.DB_REPLICA_LAG_SECONDS.set(self.lag_seconds)
+        if self._usable != was_usable:
+            logger.info(
+                "Replica routing changed",
+                usable=self._usable,
+                lag_seconds=self.lag_seconds,
+                max_lag_seconds=self.max_lag_seconds,
+            )
+
+
+replica_monitor = (
+    ReplicaLagMonitor(
+        replica_engine,
+        max_lag_seconds=settings.DB_REPLICA_MAX_LAG_SECONDS,
+        check_interval_seconds=settings.DB_REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+    )
+    if replica_engine is not None
+    else None
+)
+
+
+async def _read_target() -> Tuple[Any, str]:
+    """Pick the engine for a read-only query and the reason for the choice"""
+
+    if replica_monitor is None:
+        return engine, "no_replica"
+    if await replica_monitor.is_usable():
+        return replica_engine, "replica"
+    return engine, "replica_unavailable"
+
 
 @asynccontextmanager
-async def get_db_session():
-    """Get database session context manager"""
-    async with async_session_maker() as session:
+async def get_db_session(readonly: bool = False):
+    """
+    Get database session context manager
+
+    readonly=True routes the session to the replica when it is configured
+    and within the lag threshold. Nothing may be written through it.
+    """
+    session_maker = async_session_maker
+    if readonly:
+        target, reason = await _read_target()
+        if target is replica_engine:
+            session_maker = replica_session_maker
+        metrics.DB_READS_ROUTED.labels(
+            target="replica" if target is replica_engine else "primary",
+            reason=reason,
+        ).inc()
+
+    async with session_maker() as session:
         try:
             yield session
         except Exception:
@@ -57,6 +356,51 @@ async def get_db_session():
             await session.close()
 
 
+@asynccontextmanager
+async def get_db_connection(readonly: bool = False):
+    """
+    Get a Core connection
+
+    Used by the hot-path queries in queries.py, which skip the ORM session.
+    By default the connection is on the primary in a transaction committed
+    on exit. readonly=True gives a connection that is never committed,
+    on the replica when it is configured and within the lag threshold.
+    """
+    if not readonly:
+        async with engine.begin() as conn:
+            yield conn
+        return
+
+    target, reason = await _read_target()
+    metrics.DB_READS_ROUTED.labels(
+        target="replica" if target is replica_engine else "primary", reason=reason
+    ).inc()
+
+    async with target.connect() as conn:
+        yield conn
+
+
+async def fetch_readonly(
+    fetch: Callable[..., Awaitable[Optional[Any]]], *args: Any
+) -> Optional[Any]:
+    """
+    Run fetch(conn, *args) on a read-only connection
+
+    A row the replica does not have yet (e.g. a booking committed a moment
+    ago) is looked up again on the primary.
+    """
+    async with get_db_connection(readonly=True) as conn:
+        on_replica = conn.engine is replica_engine
+        row = await fetch(conn, *args)
+
+    if row is None and on_replica:
+        metrics.DB_READS_ROUTED.labels(target="primary", reason="missing_row").inc()
+        async with engine.connect() as conn:
+            row = await fetch(conn, *args)
+
+    return row
+
+
 # Models (matching your existing schema)
 
 
@@ -157,7 +501,7 @@ class NotificationLog(Base):
     message_content: Mapped[str] = mapped_column(Text)
     sent_at: Mapped[Optional[datetime]]
     status: Mapped[str] = mapped_column(String(20))
-    provider_message_id: Mapped[Optional[str]] = mapped_column(String(200))
+    provider_message_id: Mapped[Optional[str]] = mapped_column(String(200), index=True)
     error_message: Mapped[Optional[str]] = mapped_column(Text)
     retry_count: Mapped[int] = mapped_column(Integer, default=0)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
@@ -166,6 +510,70 @@ class NotificationLog(Base):
     )
 
 
+# Hourly notification counts, maintained alongside notification_logs inserts
+class NotificationStatsHourly(Base):
+    __tablename__ = "notification_stats_hourly"
+    __table_args__ = {"schema": "public", "extend_existing": True}
+
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    message_type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), primary_key=True)
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
+    )
+
+
+# Shared cache of closed-workflow status for the API (see status_cache.py)
+class WorkflowStatusSnapshot(Base):
+    __tablename__ = "workflow_status_cache"
+    __table_args__ = {"schema": "public", "extend_existing": True}
+
+    workflow_id: Mapped[str] = mapped_column(String(200), primary_key=True)
+    payload: Mapped[dict] = mapped_column(JSONB)
+    cached_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# Booking events written by the backend in the same transaction as the
+# booking change, consumed by outbox.py (backend/migrations/002)
+class NotificationOutbox(Base):
+    __tablename__ = "notification_outbox"
+    __table_args__ = {"schema": "public", "extend_existing": True}
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    booking_id: Mapped[UUID] = mapped_column(UUID)
+    event_type: Mapped[str] = mapped_column(String(30))
+    payload: Mapped[dict] = mapped_column(JSONB, default=dict)
+    attempts: Mapped[int] = mapped_column(Integer, default=0)
+    last_error: Mapped[Optional[str]] = mapped_column(Text)
+    available_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    processed_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+
+
+# Numbers that opted out of marketing messages (see opt_outs.py)
+class MarketingOptOut(Base):
+    __tablename__ = "marketing_opt_outs"
+    __table_args__ = {"schema": "public", "extend_existing": True}
+
+    phone_number: Mapped[str] = mapped_column(String(20), primary_key=True)
+    source: Mapped[str] = mapped_column(String(20))
+    opted_out_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
+# Reminders and aftercare claimed by the dispatcher, one row per booking
+# and kind (see send_reminder_batch in activities.py)
+class ReminderDispatch(Base):
+    __tablename__ = "reminder_dispatches"
+    __table_args__ = {"schema": "public", "extend_existing": True}
+
+    booking_id: Mapped[UUID] = mapped_column(
+        UUID, ForeignKey("public.bookings.id"), primary_key=True
+    )
+    kind: Mapped[str] = mapped_column(String(50), primary_key=True)
+    claimed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+
 # Workflow tracking table (new - optional but recommended)
 class WorkflowTracking(Base):
     __tablename__ = "workflow_tracking"
@@ -186,3 +594,23 @@ class WorkflowTracking(Base):
     updated_at: Mapped[datetime] = mapped_column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
+
+
+async def ensure_stats_table() -> None:
+    """
+    Create notification_stats_hourly if it does not exist yet
+
+    Run at startup so logging never depends on the backfill script having
+    been run. A failure is only logged: the rollup is updated in a
+    savepoint, so notification logging works without it.
+    """
+
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                lambda sync_conn: NotificationStatsHourly.__table__.create(
+                    sync_conn, checkfirst=True
+                )
+            )
+    except Exception as e:
+        logger.warning("Could not create notification_stats_hourly", error=str(e))
@@ -0,0 +1,320 @@
+"""
+Multi-process worker launcher
+
+Runs WORKER_PROCESSES copies of worker.py on the same task queues so a
+pod can use more than one core. Children are spawned fresh, so each has
+its own Temporal client, database pool and WhatsApp HTTP client, and
+they all read the same settings from the environment.
+
+The launcher restarts children that exit or stop heartbeating, serves
+Prometheus metrics aggregated across children (multiprocess mode) and a
+/health endpoint on METRICS_PORT.
+"""
+
+import asyncio
+import math
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+import orjson
+import structlog
+
+logger = structlog.get_logger()
+
+# Children that exit sooner than this after starting count as crash loops
+STABLE_AFTER_SECONDS = 60.0
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity capped by a cgroup CPU quota"""
+
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            limit, period = f.read().split()
+            if limit != "max":
+                quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                limit = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        cpus = min(cpus, math.ceil(quota))
+
+    return max(1, cpus)
+
+
+def _run_child(index: int, heartbeat: Any) -> None:
+    """Entry point of a child process"""
+
+    # Imported here so each spawned child builds its own engine and clients
+    import worker
+
+    def beat() -> None:
+        heartbeat.value = time.time()
+
+    asyncio.run(worker.main(heartbeat=beat, serve_metrics=False))
+
+
+@dataclass
+class Child:
+    index: int
+    heartbeat: Any
+    process: Optional[multiprocessing.process.BaseProcess] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    backoff: float = 0.0
+    restart_at: float = 0.0
+
+
+class Supervisor:
+    """Starts the children and restarts any that exit or hang"""
+
+    def __init__(
+        self,
+        processes: int,
+        heartbeat_timeout_seconds: float,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+    ):
+        self.heartbeat_timeout_seconds = heartbeat_timeout_seconds
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._context = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self.children = [
+            Child(index, self._context.Value("d", 0.0)) for index in range(processes)
+        ]
+
+    def start(self) -> None:
+        for child in self.children:
+            self._start(child)
+
+    def _start(self, child: Child) -> None:
+        child.heartbeat.value = 0.0
+        child.process = self._context.Process(
+            target=_run_child,
+            args=(child.index, child.heartbeat),
+            name=f"worker-{child.index}",
+        )
+        child.process.start()
+        child.started_at = time.time()
+        logger.info("Started worker process", index=child.index, pid=child.process.pid)
+
+    def check(self) -> None:
+        """Restart children that exited or whose heartbeat went stale"""
+
+        now = time.time()
+        with self._lock:
+            for child in self.children:
+                process = child.process
+
+                if process is not None and process.is_alive():
+                    last_beat = child.heartbeat.value or child.started_at
+                    if now - last_beat <= self.heartbeat_timeout_seconds:
+                        continue
+                    logger.error(
+                        "Worker process unresponsive, killing",
+                        index=child.index,
+                        pid=process.pid,
+                    )
+                    process.kill()
+                    process.join()
+
+                if process is not None:
+                    self._reap(child, now)
+                    continue
+
+                if now >= child.restart_at:
+                    child.restarts += 1
+                    self._start(child)
+
+    def _reap(self, child: Child, now: float) -> None:
+        process = child.process
+        _mark_process_dead(process.pid)
+        child.process = None
+
+        if now - child.started_at >= STABLE_AFTER_SECONDS:
+            child.backoff = 0.0
+        child.backoff = min(
+            self.backoff_max_seconds,
+            child.backoff * 2 if child.backoff else self.backoff_seconds,
+        )
+        child.restart_at = now + child.backoff
+
+        logger.error(
+            "Worker process exited",
+            index=child.index,
+            pid=process.pid,
+            exitcode=process.exitcode,
+            restart_in_seconds=child.backoff,
+        )
+
+    def health(self) -> Dict[str, Any]:
+        """Per-child liveness; healthy only when every child is alive and beating"""
+
+        now = time.time()
+        children = []
+        with self._lock:
+            for child in self.children:
+                alive = child.process is not None and child.process.is_alive()
+                beat = child.heartbeat.value
+                children.append(
+                    {
+                        "index": child.index,
+                        "pid": child.process.pid if alive else None,
+                        "alive": alive,
+                        "heartbeat_age_seconds": (
+                            round(now - beat, 1) if alive and beat else None
+                        ),
+                        "restarts": child.restarts,
+                    }
+                )
+
+        healthy = all(
+            c["alive"]
+            and c["heartbeat_age_seconds"] is not None
+            and c["heartbeat_age_seconds"] <= self.heartbeat_timeout_seconds
+            for c in children
+        )
+        return {"status": "healthy" if healthy else "unhealthy", "children": children}
+
+    def stop(self, timeout_seconds: float = 30.0) -> None:
+        """Ask children to stop, then kill any still running after the timeout"""
+
+        processes = [c.process for c in self.children if c.process is not None]
+        for process in processes:
+            process.terminate()
+
+        deadline = time.time() + timeout_seconds
+        for process in processes:
+            process.join(max(0.0, deadline - time.time()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+
+
+def _mark_process_dead(pid: int) -> None:
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(pid)
+
+
+def _serve(port: int, supervisor: Supervisor) -> ThreadingHTTPServer:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST,
+        CollectorRegistry,
+        generate_latest,
+    )
+    from prometheus_client import multiprocess
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.startswith("/health"):
+                health = supervisor.health()
+                status = 200 if health["status"] == "healthy" else 503
+                self._reply(status, "application/json", orjson.dumps(health))
+                return
+
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            self._reply(200, CONTENT_TYPE_LATEST, generate_latest(registry))
+
+        def _reply(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _prepare_metrics_dir() -> Optional[str]:
+    """
+    Empty directory shared by the children for multiprocess metrics.
+    Returns it when it is a temporary one to remove on exit.
+    """
+
+    directory = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if directory:
+        # Files left by a previous run would be aggregated too
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+        return None
+
+    directory = tempfile.mkdtemp(prefix="worker-metrics-")
+    # Inherited by the spawned children
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = directory
+    return directory
+
+
+def main() -> None:
+    # Must be set before anything imports prometheus_client
+    temporary_metrics_dir = _prepare_metrics_dir()
+
+    from config import get_settings
+    from utils.logger import setup_logging_from_settings
+
+    settings = get_settings()
+    setup_logging_from_settings(settings)
+
+    processes = settings.WORKER_PROCESSES or available_cpus()
+    supervisor = Supervisor(
+        processes,
+        heartbeat_timeout_seconds=settings.WORKER_HEARTBEAT_TIMEOUT_SECONDS,
+        backoff_seconds=settings.WORKER_RESTART_BACKOFF_SECONDS,
+        backoff_max_seconds=settings.WORKER_RESTART_BACKOFF_MAX_SECONDS,
+    )
+
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *_: stopping.set())
+
+    server = (
+        _serve(settings.METRICS_PORT, supervisor) if settings.METRICS_PORT else None
+    )
+
+    logger.info("Starting worker processes", processes=processes)
+    supervisor.start()
+
+    while not stopping.wait(1.0):
+        supervisor.check()
+
+    logger.info("Stopping worker processes")
+    supervisor.stop()
+    if server is not None:
+        server.shutdown()
+    if temporary_metrics_dir:
+        shutil.rmtree(temporary_metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
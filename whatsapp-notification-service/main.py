@@ -4,20 +4,45 @@ Provides REST API to trigger and manage workflows
 """
 
 import asyncio
-from datetime import datetime
+import hmac
+from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 from uuid import UUID
 
+import queries
 import structlog
 from config import get_settings
-from fastapi import BackgroundTasks, FastAPI, HTTPException
+from converter import data_converter
+from database import ensure_stats_table, fetch_readonly, get_db_connection
+from fastapi import (
+    BackgroundTasks,
+    FastAPI,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from models.schemas import NotificationStats
+from opt_outs import parse_stop_senders
+from outbox import OutboxConsumer, listen_dsn
+from prometheus_client import make_asgi_app
 from pydantic import BaseModel, Field
-from temporalio.client import Client, WorkflowHandle
+from receipts import ReceiptBuffer, parse_status_events
+from start_batcher import StartBatcher
+from status_cache import WorkflowStatusCache
+from temporalio.client import Client, WorkflowFailureError, WorkflowHandle
 from temporalio.common import RetryPolicy
+from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.service import RPCError, RPCStatusCode
+from utils import metrics
+from utils.logger import setup_logging_from_settings
+from utils.phone_formatter import normalize_phone_number
 from workflow import (
     AppointmentBookingWorkflow,
     BookingWorkflowInput,
     CancellationInput,
+    CancelSignal,
     CancellationWorkflow,
     MarketingCampaignWorkflow,
     RescheduleInput,
@@ -27,12 +52,30 @@ from workflow import (
 logger = structlog.get_logger()
 
 settings = get_settings()
+setup_logging_from_settings(settings)
 
 app = FastAPI(title="Temporal Notification Service", version="1.0.0")
+app.mount("/metrics", make_asgi_app())
 
 # Global Temporal client
 temporal_client: Optional[Client] = None
 
+# Delivery receipts waiting to be applied to notification_logs
+receipt_buffer: Optional[ReceiptBuffer] = None
+
+# Booking events from the backend's notification_outbox table
+outbox_consumer: Optional[OutboxConsumer] = None
+
+# Queued booking workflow starts (WORKFLOW_START_MODE=accept)
+start_batcher: Optional[StartBatcher] = None
+
+status_cache = WorkflowStatusCache(
+    max_entries=settings.STATUS_CACHE_MAX_ENTRIES,
+    closed_ttl_seconds=settings.STATUS_CACHE_CLOSED_TTL_SECONDS,
+    running_ttl_seconds=settings.STATUS_CACHE_RUNNING_TTL_SECONDS,
+    shared=settings.STATUS_CACHE_SHARED,
+)
+
 
 # Pydantic models for API requests
 
@@ -66,29 +109,97 @@ class MarketingCampaignRequest(BaseModel):
     message_template: str
 
 
+class MarketingOptOutRequest(BaseModel):
+    phone_number: str
+
+
 class WorkflowStatusResponse(BaseModel):
     workflow_id: str
     status: str
     result: Optional[Dict[str, Any]] = None
 
 
+class BulkWorkflowStatusRequest(BaseModel):
+    workflow_ids: List[str] = Field(default_factory=list)
+    booking_ids: List[str] = Field(default_factory=list)
+
+
 # Startup/Shutdown events
 
 
 @app.on_event("startup")
 async def startup() -> None:
     """Initialize Temporal client on startup"""
-    global temporal_client
+    global temporal_client, receipt_buffer, outbox_consumer, start_batcher
+
+    receipt_buffer = ReceiptBuffer(
+        flush_interval_seconds=settings.RECEIPT_FLUSH_INTERVAL_SECONDS,
+        batch_size=settings.RECEIPT_BATCH_SIZE,
+        max_pending=settings.RECEIPT_MAX_PENDING,
+    )
+    receipt_buffer.start()
+
+    await status_cache.ensure_table()
+    await ensure_stats_table()
 
     # Connect to Temporal server
-    temporal_client = await Client.connect(settings.TEMPORAL_HOST)
+    temporal_client = await Client.connect(
+        settings.TEMPORAL_HOST,
+        data_converter=data_converter(
+            settings.TEMPORAL_PAYLOAD_COMPRESSION_THRESHOLD_BYTES
+        ),
+    )
     logger.info("Connected to Temporal server")
 
+    if settings.WORKFLOW_START_MODE == "accept":
+        start_batcher = StartBatcher(
+            batch_size=settings.START_BATCH_SIZE,
+            flush_interval_seconds=settings.START_FLUSH_INTERVAL_SECONDS,
+            concurrency=settings.START_CONCURRENCY,
+            max_attempts=settings.START_MAX_ATTEMPTS,
+            backoff_seconds=settings.START_RETRY_BACKOFF_SECONDS,
+            max_pending=settings.START_MAX_PENDING,
+            status_ttl_seconds=settings.START_STATUS_TTL_SECONDS,
+        )
+        start_batcher.start()
+
+    if settings.OUTBOX_ENABLED:
+        outbox_consumer = OutboxConsumer(
+            dsn=listen_dsn(settings.TEMPORAL_DATABASE_URL),
+            handlers={
+                "booking_created": _outbox_booking_created,
+                "booking_cancelled": _outbox_booking_cancelled,
+                "booking_rescheduled": _outbox_booking_rescheduled,
+            },
+            batch_size=settings.OUTBOX_BATCH_SIZE,
+            concurrency=settings.OUTBOX_CONCURRENCY,
+            poll_interval_seconds=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+            max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+            backoff_seconds=settings.OUTBOX_RETRY_BACKOFF_SECONDS,
+            backoff_max_seconds=settings.OUTBOX_RETRY_BACKOFF_MAX_SECONDS,
+        )
+        outbox_consumer.start()
+
 
 @app.on_event("shutdown")
 async def shutdown() -> None:
     """Close Temporal client on shutdown"""
     global temporal_client
+
+    if outbox_consumer is not None:
+        await outbox_consumer.stop()
+
+    if start_batcher is not None:
+        await start_batcher.stop()
+
+    if receipt_buffer is not None:
+        try:
+            await receipt_buffer.stop()
+        except Exception as e:
+            logger.error(
+                f"Failed to apply {len(receipt_buffer)} delivery receipts: {e}"
+            )
+
     if temporal_client is not None:
         # Temporal client doesn't have a close method, just set to None
         temporal_client = None
@@ -113,44 +224,49 @@ async def health_check() -> Dict[str, Any]:
 @app.post("/workflows/booking/start", response_model=WorkflowStatusResponse)
 async def start_booking_workflow(
     request: StartBookingWorkflowRequest,
+    response: Response,
 ) -> WorkflowStatusResponse:
     """
     Start a new appointment booking workflow.
     This will send confirmation immediately and schedule reminders/aftercare.
+
+    In accept mode the start is queued and this answers 202 with the
+    workflow id; /workflows/{workflow_id}/status reports queued starts.
     """
 
     if not temporal_client:
         raise HTTPException(status_code=503, detail="Temporal client not connected")
 
-    workflow_id = f"booking-{request.booking_id}-{int(datetime.utcnow().timestamp())}"
+    workflow_input = _booking_workflow_input(
+        booking_id=request.booking_id,
+        client_id=request.client_id,
+        appointment_datetime=request.appointment_datetime,
+        client_phone=request.client_phone,
+        client_name=request.client_name,
+        treatment_name=request.treatment_name,
+        staff_name=request.staff_name,
+    )
 
-    try:
-        # Prepare workflow input
-        workflow_input = BookingWorkflowInput(
-            booking_id=request.booking_id,
-            client_id=request.client_id,
-            appointment_datetime=request.appointment_datetime.isoformat(),
-            client_phone=request.client_phone,
-            client_name=request.client_name,
-            treatment_name=request.treatment_name,
-            staff_name=request.staff_name,
+    if start_batcher is not None:
+        # Same booking and time, same workflow: duplicates collapse
+        workflow_id = (
+            f"booking-{request.booking_id}-"
+            f"{request.appointment_datetime:%Y%m%dT%H%M}"
         )
 
-        # Start workflow
-        handle: WorkflowHandle = await temporal_client.start_workflow(
-            AppointmentBookingWorkflow.run,
-            workflow_input,
-            id=workflow_id,
-            task_queue="notifications-queue",
-            # Workflow can run for weeks (appointment + 24h aftercare)
-            execution_timeout=None,
-        )
+        async def start() -> None:
+            await _start_booking_workflow(workflow_input, workflow_id)
 
-        logger.info(
-            "Started booking workflow",
-            workflow_id=workflow_id,
-            booking_id=request.booking_id,
-        )
+        if not start_batcher.submit(workflow_id, start):
+            raise HTTPException(status_code=503, detail="Start queue is full")
+
+        response.status_code = 202
+        return WorkflowStatusResponse(workflow_id=workflow_id, status="accepted")
+
+    workflow_id = f"booking-{request.booking_id}-{_id_suffix()}"
+
+    try:
+        await _start_booking_workflow(workflow_input, workflow_id)
 
         return WorkflowStatusResponse(
             workflow_id=workflow_id,
@@ -173,54 +289,17 @@ async def cancel_booking_workflow(request: CancelWorkflowRequest) -> Dict[str, A
         raise HTTPException(status_code=503, detail="Temporal client not connected")
 
     try:
-        # Find the booking workflow
-        workflow_id = await _find_booking_workflow(request.booking_id)
+        cancelled = await _cancel_booking(
+            request.booking_id, request.cancellation_reason, _id_suffix()
+        )
 
-        if not workflow_id:
+        if cancelled is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"No active workflow found for booking {request.booking_id}",
             )
 
-        # Get workflow handle
-        handle: WorkflowHandle = temporal_client.get_workflow_handle(workflow_id)
-
-        # Send cancellation signal to stop the workflow
-        await handle.signal(AppointmentBookingWorkflow.cancel)
-
-        logger.info(
-            "Sent cancellation signal to workflow",
-            workflow_id=workflow_id,
-            booking_id=request.booking_id,
-        )
-
-        # Start cancellation notification workflow
-        cancellation_workflow_id = (
-            f"cancellation-{request.booking_id}-{int(datetime.utcnow().timestamp())}"
-        )
-
-        # Get booking details from database for cancellation message
-        # (In production, you'd fetch this from your database)
-        cancellation_input = CancellationInput(
-            booking_id=request.booking_id,
-            client_phone="",  # Fetch from DB
-            client_name="",  # Fetch from DB
-            appointment_datetime=datetime.utcnow(),  # Fetch from DB
-            cancellation_reason=request.cancellation_reason,
-        )
-
-        await temporal_client.start_workflow(
-            CancellationWorkflow.run,
-            cancellation_input,
-            id=cancellation_workflow_id,
-            task_queue="notifications-queue",
-        )
-
-        return {
-            "status": "cancelled",
-            "booking_workflow_id": workflow_id,
-            "cancellation_workflow_id": cancellation_workflow_id,
-        }
+        return cancelled
 
     except HTTPException:
         raise
@@ -241,67 +320,17 @@ async def reschedule_booking_workflow(
         raise HTTPException(status_code=503, detail="Temporal client not connected")
 
     try:
-        # Find and cancel old workflow
-        old_workflow_id = await _find_booking_workflow(request.booking_id)
-
-        if old_workflow_id:
-            handle: WorkflowHandle = temporal_client.get_workflow_handle(
-                old_workflow_id
-            )
-            await handle.signal(AppointmentBookingWorkflow.cancel)
-            logger.info(f"Cancelled old workflow: {old_workflow_id}")
-
-        # Send reschedule notification
-        reschedule_workflow_id = (
-            f"reschedule-{request.booking_id}-{int(datetime.utcnow().timestamp())}"
-        )
-
-        reschedule_input = RescheduleInput(
-            booking_id=request.booking_id,
-            old_workflow_id=old_workflow_id or "",
-            new_appointment_datetime=request.new_appointment_datetime,
-            client_phone=request.client_phone,
-            client_name=request.client_name,
-            treatment_name=request.treatment_name,
-            staff_name=request.staff_name,
-        )
-
-        await temporal_client.start_workflow(
-            RescheduleWorkflow.run,
-            reschedule_input,
-            id=reschedule_workflow_id,
-            task_queue="notifications-queue",
-        )
-
-        # Start new booking workflow
-        new_workflow_id = (
-            f"booking-{request.booking_id}-{int(datetime.utcnow().timestamp())}"
-        )
-
-        new_booking_input = BookingWorkflowInput(
+        return await _reschedule_booking(
             booking_id=request.booking_id,
             client_id=0,  # Fetch from DB
-            appointment_datetime=request.new_appointment_datetime,
+            new_appointment_datetime=request.new_appointment_datetime,
             client_phone=request.client_phone,
             client_name=request.client_name,
             treatment_name=request.treatment_name,
             staff_name=request.staff_name,
+            suffix=_id_suffix(),
         )
 
-        await temporal_client.start_workflow(
-            AppointmentBookingWorkflow.run,
-            new_booking_input,
-            id=new_workflow_id,
-            task_queue="notifications-queue",
-        )
-
-        return {
-            "status": "rescheduled",
-            "old_workflow_id": old_workflow_id,
-            "reschedule_workflow_id": reschedule_workflow_id,
-            "new_workflow_id": new_workflow_id,
-        }
-
     except Exception as e:
         logger.error(f"Failed to reschedule booking workflow: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -326,7 +355,7 @@ async def start_marketing_campaign(request: MarketingCampaignRequest) -> Dict[st
             MarketingCampaignWorkflow.run,
             args=[request.campaign_id, request.message_template],
             id=workflow_id,
-            task_queue="notifications-queue",
+            task_queue=settings.TEMPORAL_MARKETING_TASK_QUEUE,
         )
 
         logger.info(
@@ -352,30 +381,71 @@ async def get_workflow_status(workflow_id: str) -> Dict[str, Any]:
     if not temporal_client:
         raise HTTPException(status_code=503, detail="Temporal client not connected")
 
+    # Accepted starts Temporal does not know about yet
+    if start_batcher is not None:
+        queued = start_batcher.status(workflow_id)
+        if queued is not None and queued["status"] != "started":
+            return queued
+
     try:
-        handle: WorkflowHandle = temporal_client.get_workflow_handle(workflow_id)
+        return await _describe_workflow(workflow_id)
+
+    except Exception as e:
+        logger.error(f"Failed to get workflow status: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Try to get workflow description
-        desc = await handle.describe()
 
-        result: Optional[Any] = None
-        if desc.status.name in ["COMPLETED", "FAILED", "CANCELLED"]:
+@app.post("/workflows/status/bulk")
+async def get_bulk_workflow_status(
+    request: BulkWorkflowStatusRequest,
+) -> Dict[str, Any]:
+    """
+    Status of many workflows in one call.
+
+    Workflow ids are described directly; booking ids are resolved to their
+    running workflow and also queried for its state. Lookups run
+    concurrently, at most BULK_STATUS_CONCURRENCY at a time. A failed item
+    carries an "error" instead of failing the whole request.
+    """
+
+    if not temporal_client:
+        raise HTTPException(status_code=503, detail="Temporal client not connected")
+
+    total = len(request.workflow_ids) + len(request.booking_ids)
+    if total > settings.BULK_STATUS_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_STATUS_MAX_ITEMS} ids per request",
+        )
+
+    semaphore = asyncio.Semaphore(settings.BULK_STATUS_CONCURRENCY)
+
+    async def workflow_item(workflow_id: str) -> Dict[str, Any]:
+        async with semaphore:
             try:
-                result = await handle.result()
-            except Exception:
-                pass
+                return await _describe_workflow(workflow_id)
+            except Exception as e:
+                return {"workflow_id": workflow_id, "error": str(e)}
 
-        return {
-            "workflow_id": workflow_id,
-            "status": desc.status.name,
-            "start_time": desc.start_time.isoformat() if desc.start_time else None,
-            "close_time": desc.close_time.isoformat() if desc.close_time else None,
-            "result": result,
-        }
+    async def booking_item(booking_id: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                state = await _describe_booking_workflow(booking_id)
+            except Exception as e:
+                return {"booking_id": booking_id, "error": str(e)}
+            if state is None:
+                return {"booking_id": booking_id, "error": "No active workflow found"}
+            return state
+
+    results = await asyncio.gather(
+        *(workflow_item(workflow_id) for workflow_id in request.workflow_ids),
+        *(booking_item(booking_id) for booking_id in request.booking_ids),
+    )
 
-    except Exception as e:
-        logger.error(f"Failed to get workflow status: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "results": results,
+        "errors": sum(1 for item in results if "error" in item),
+    }
 
 
 @app.get("/workflows/booking/{booking_id}")
@@ -386,27 +456,15 @@ async def get_booking_workflow(booking_id: int) -> Dict[str, Any]:
         raise HTTPException(status_code=503, detail="Temporal client not connected")
 
     try:
-        workflow_id = await _find_booking_workflow(booking_id)
+        state = await _describe_booking_workflow(booking_id)
 
-        if not workflow_id:
+        if state is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"No active workflow found for booking {booking_id}",
             )
 
-        # Get workflow status
-        handle: WorkflowHandle = temporal_client.get_workflow_handle(workflow_id)
-        desc = await handle.describe()
-
-        # Query workflow state
-        status = await handle.query(AppointmentBookingWorkflow.get_status)
-
-        return {
-            "workflow_id": workflow_id,
-            "booking_id": booking_id,
-            "status": desc.status.name,
-            "workflow_state": status,
-        }
+        return state
 
     except HTTPException:
         raise
@@ -415,15 +473,623 @@ async def get_booking_workflow(booking_id: int) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# Webhooks
+
+
+@app.post("/webhooks/chakra/status")
+async def chakra_status_webhook(
+    request: Request,
+    x_webhook_token: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """
+    ChakraHQ message status callback.
+
+    Events are queued and applied to notification_logs in batches, so this
+    returns as soon as the body is parsed. STOP replies among inbound
+    messages are recorded as marketing opt-outs before answering.
+    """
+
+    if settings.CHAKRA_WEBHOOK_TOKEN and not hmac.compare_digest(
+        x_webhook_token or "", settings.CHAKRA_WEBHOOK_TOKEN
+    ):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+
+    if receipt_buffer is None:
+        raise HTTPException(status_code=503, detail="Receipt buffer not running")
+
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be JSON")
+
+    stop_senders = parse_stop_senders(payload, settings.DEFAULT_COUNTRY_CODE)
+    if stop_senders:
+        try:
+            await _record_opt_outs(stop_senders, "stop_reply")
+        except Exception as e:
+            # Failing the callback makes the provider deliver it again
+            logger.error(f"Failed to record opt-outs: {e}")
+            raise HTTPException(status_code=500, detail="Failed to record opt-outs")
+
+    events = parse_status_events(payload)
+    receipt_buffer.add(events)
+
+    return {"accepted": len(events), "opt_outs": len(stop_senders)}
+
+
+# Marketing opt-outs
+
+
+async def _record_opt_outs(phone_numbers: List[str], source: str) -> List[str]:
+    async with get_db_connection() as conn:
+        added = await queries.add_opt_outs(conn, phone_numbers, source)
+
+    if added:
+        metrics.MARKETING_OPT_OUTS_RECORDED.labels(source=source).inc(len(added))
+        logger.info("Recorded marketing opt-outs", count=len(added), source=source)
+    return added
+
+
+def _e164_or_400(phone_number: str) -> str:
+    number = normalize_phone_number(phone_number, settings.DEFAULT_COUNTRY_CODE)
+    if not number.valid:
+        raise HTTPException(
+            status_code=400, detail=f"Invalid phone number: {number.reason}"
+        )
+    return number.e164
+
+
+@app.post("/marketing/opt-outs")
+async def add_marketing_opt_out(request: MarketingOptOutRequest) -> Dict[str, Any]:
+    """Opt a number out of marketing campaigns"""
+
+    phone_number = _e164_or_400(request.phone_number)
+
+    try:
+        added = await _record_opt_outs([phone_number], "api")
+    except Exception as e:
+        logger.error(f"Failed to record opt-out: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return {"phone_number": phone_number, "opted_out": True, "created": bool(added)}
+
+
+@app.delete("/marketing/opt-outs/{phone_number}")
+async def remove_marketing_opt_out(phone_number: str) -> Dict[str, Any]:
+    """Opt a number back in to marketing campaigns"""
+
+    phone_number = _e164_or_400(phone_number)
+
+    try:
+        async with get_db_connection() as conn:
+            removed = await queries.remove_opt_out(conn, phone_number)
+    except Exception as e:
+        logger.error(f"Failed to remove opt-out: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not removed:
+        raise HTTPException(status_code=404, detail="Number is not opted out")
+
+    return {"phone_number": phone_number, "opted_out": False}
+
+
+# Stats
+
+
+@app.get("/stats", response_model=NotificationStats)
+async def get_notification_stats(
+    days: int = Query(7, ge=1, le=366),
+) -> NotificationStats:
+    """
+    Notification counts for the last `days` days.
+
+    Answered from the hourly rollup table, so the cost grows with the
+    number of hours in the period rather than the number of messages.
+    """
+
+    since = datetime.utcnow() - timedelta(days=days)
+
+    try:
+        async with get_db_connection(readonly=True) as conn:
+            by_type = await queries.fetch_stats(conn, since)
+    except Exception as e:
+        logger.error(f"Failed to load notification stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # Delivered and read messages were sent first
+    return NotificationStats(
+        total_sent=sum(
+            counts.get(status, 0)
+            for counts in by_type.values()
+            for status in ("sent", "delivered", "read")
+        ),
+        total_failed=sum(counts.get("failed", 0) for counts in by_type.values()),
+        by_type=by_type,
+        period_days=days,
+    )
+
+
+# Booking workflow operations, shared by the endpoints and the outbox
+
+
+def _id_suffix() -> str:
+    """Workflow id suffix for requests made through the API"""
+    return str(int(datetime.utcnow().timestamp()))
+
+
+def _booking_workflow_input(
+    booking_id: UUID,
+    client_id: Any,
+    appointment_datetime: datetime,
+    client_phone: str,
+    client_name: str,
+    treatment_name: str,
+    staff_name: str,
+) -> BookingWorkflowInput:
+    return BookingWorkflowInput(
+        booking_id=booking_id,
+        client_id=client_id,
+        appointment_datetime=appointment_datetime.isoformat(),
+        client_phone=client_phone,
+        client_name=client_name,
+        treatment_name=treatment_name,
+        staff_name=staff_name,
+        reminder_mode=settings.REMINDER_SCHEDULING_MODE,
+        reminders_task_queue=settings.TEMPORAL_REMINDERS_TASK_QUEUE,
+        reminder_24h_spread_minutes=settings.REMINDER_24H_SPREAD_MINUTES,
+        reminder_1h_spread_minutes=settings.REMINDER_1H_SPREAD_MINUTES,
+        reminder_24h_hours_before=settings.REMINDER_24H_HOURS_BEFORE,
+        reminder_1h_hours_before=settings.REMINDER_1H_HOURS_BEFORE,
+        aftercare_hours_after=settings.AFTERCARE_HOURS_AFTER,
+    )
+
+
+async def _start_workflow_once(*args: Any, **kwargs: Any) -> None:
+    """Start a workflow; one already started under the same id counts as done"""
+
+    try:
+        await temporal_client.start_workflow(*args, **kwargs)
+    except WorkflowAlreadyStartedError:
+        logger.info("Workflow already started", workflow_id=kwargs.get("id"))
+
+
+async def _start_booking_workflow(
+    workflow_input: BookingWorkflowInput, workflow_id: str
+) -> None:
+    await _start_workflow_once(
+        AppointmentBookingWorkflow.run,
+        workflow_input,
+        id=workflow_id,
+        task_queue=settings.TEMPORAL_TASK_QUEUE,
+        # Workflow can run for weeks (appointment + 24h aftercare)
+        execution_timeout=None,
+    )
+
+    logger.info(
+        "Started booking workflow",
+        workflow_id=workflow_id,
+        booking_id=workflow_input.booking_id,
+    )
+
+    try:
+        async with get_db_connection() as conn:
+            await queries.track_workflow(
+                conn, workflow_input.booking_id, workflow_id, "booking"
+            )
+    except Exception as e:
+        # Lookups fall back to the visibility query
+        logger.warning("Failed to track booking workflow", error=str(e))
+
+
+async def _signal_cancel(workflow_id: str, signal: CancelSignal) -> bool:
+    """Signal a booking workflow to cancel; False if it is no longer running"""
+
+    handle: WorkflowHandle = temporal_client.get_workflow_handle(workflow_id)
+    try:
+        await handle.signal(AppointmentBookingWorkflow.cancel, signal)
+    except RPCError as e:
+        if e.status != RPCStatusCode.NOT_FOUND:
+            raise
+        return False
+
+    try:
+        async with get_db_connection() as conn:
+            await queries.mark_workflow_cancelled(conn, workflow_id)
+    except Exception as e:
+        logger.warning("Failed to update workflow tracking", error=str(e))
+
+    return True
+
+
+async def _refresh_tracking(
+    booking_id: Any, stale_workflow_id: str, running_workflow_id: Optional[str]
+) -> None:
+    """Point a stale tracking row at the running workflow, or close it"""
+
+    try:
+        async with get_db_connection() as conn:
+            if running_workflow_id:
+                await queries.track_workflow(
+                    conn, UUID(str(booking_id)), running_workflow_id, "booking"
+                )
+            else:
+                await queries.mark_workflow_completed(conn, stale_workflow_id)
+    except Exception as e:
+        logger.warning("Failed to update workflow tracking", error=str(e))
+
+
+async def _cancel_booking_workflow(
+    booking_id: Any, signal: CancelSignal, exclude: Optional[str] = None
+) -> Optional[str]:
+    """
+    Signal a booking's running workflow to cancel; its id, or None
+
+    The tracked workflow may have finished since it was tracked, e.g. when
+    a reschedule started a newer one whose tracking write failed. When it
+    no longer takes signals, the visibility query finds the running one,
+    and the tracking row is moved to it (or closed if there is none).
+    exclude is a workflow id to leave alone.
+    """
+
+    tracked = await _tracked_booking_workflow(booking_id)
+    if tracked == exclude and tracked is not None:
+        return None
+    if tracked and await _signal_cancel(tracked, signal):
+        return tracked
+
+    running = await _running_booking_workflow(booking_id, exclude)
+    if tracked:
+        await _refresh_tracking(booking_id, tracked, running)
+    if running and running != tracked and await _signal_cancel(running, signal):
+        return running
+
+    return None
+
+
+async def _cancel_booking(
+    booking_id: UUID, cancellation_reason: Optional[str], suffix: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Cancel a booking and send the cancellation notification.
+    Returns None when there is no running workflow to cancel.
+
+    A running booking workflow is told to cancel and sends the message
+    itself. With the reminder dispatcher, booking workflows finish after
+    the confirmation (the cancelled booking status stops its reminders),
+    so a CancellationWorkflow sends it instead.
+    """
+
+    workflow_id = await _cancel_booking_workflow(
+        booking_id, CancelSignal(cancellation_reason=cancellation_reason)
+    )
+
+    if workflow_id:
+        logger.info(
+            "Sent cancellation signal to workflow",
+            workflow_id=workflow_id,
+            booking_id=booking_id,
+        )
+        return {
+            "status": "cancelled",
+            "booking_workflow_id": workflow_id,
+            "cancellation_workflow_id": None,
+        }
+
+    if settings.REMINDER_SCHEDULING_MODE != "dispatcher":
+        return None
+
+    cancellation_workflow_id = f"cancellation-{booking_id}-{suffix}"
+
+    await _start_workflow_once(
+        CancellationWorkflow.run,
+        CancellationInput(
+            booking_id=booking_id, cancellation_reason=cancellation_reason
+        ),
+        id=cancellation_workflow_id,
+        task_queue=settings.TEMPORAL_TASK_QUEUE,
+    )
+
+    return {
+        "status": "cancelled",
+        "booking_workflow_id": None,
+        "cancellation_workflow_id": cancellation_workflow_id,
+    }
+
+
+async def _reschedule_booking(
+    booking_id: UUID,
+    client_id: Any,
+    new_appointment_datetime: datetime,
+    client_phone: str,
+    client_name: str,
+    treatment_name: str,
+    staff_name: str,
+    suffix: str,
+) -> Dict[str, Any]:
+    """
+    Cancel a booking's workflow, send the reschedule notification and
+    start a workflow for the new time
+    """
+
+    new_workflow_id = f"booking-{booking_id}-{suffix}"
+
+    # Find and cancel old workflow. On a retry the new workflow may
+    # already be running; leave that one alone.
+    # Silent: the reschedule message replaces a cancellation
+    old_workflow_id = await _cancel_booking_workflow(
+        booking_id, CancelSignal(notify=False), exclude=new_workflow_id
+    )
+    if old_workflow_id:
+        logger.info(f"Cancelled old workflow: {old_workflow_id}")
+
+    # Send reschedule notification
+    reschedule_workflow_id = f"reschedule-{booking_id}-{suffix}"
+
+    reschedule_input = RescheduleInput(
+        booking_id=booking_id,
+        old_workflow_id=old_workflow_id or "",
+        new_appointment_datetime=new_appointment_datetime,
+        client_phone=client_phone,
+        client_name=client_name,
+        treatment_name=treatment_name,
+        staff_name=staff_name,
+    )
+
+    await _start_workflow_once(
+        RescheduleWorkflow.run,
+        reschedule_input,
+        id=reschedule_workflow_id,
+        task_queue=settings.TEMPORAL_TASK_QUEUE,
+    )
+
+    # Start new booking workflow
+    await _start_booking_workflow(
+        _booking_workflow_input(
+            booking_id=booking_id,
+            client_id=client_id,
+            appointment_datetime=new_appointment_datetime,
+            client_phone=client_phone,
+            client_name=client_name,
+            treatment_name=treatment_name,
+            staff_name=staff_name,
+        ),
+        new_workflow_id,
+    )
+
+    return {
+        "status": "rescheduled",
+        "old_workflow_id": old_workflow_id,
+        "reschedule_workflow_id": reschedule_workflow_id,
+        "new_workflow_id": new_workflow_id,
+    }
+
+
+# Outbox event handlers
+
+
+def _booking_fields(booking: Any) -> Dict[str, Any]:
+    """Workflow input fields from an outbox booking details row"""
+
+    staff_name = " ".join(
+        name for name in (booking.staff_first_name, booking.staff_last_name) if name
+    )
+    return {
+        "client_id": booking.client_id,
+        "client_phone": booking.whatsapp or booking.phone,
+        "client_name": f"{booking.first_name} {booking.last_name}",
+        "treatment_name": booking.treatment_name or "Treatment",
+        "staff_name": staff_name or "Staff",
+    }
+
+
+def _appointment_datetime(booking: Any) -> datetime:
+    return datetime.combine(booking.booking_date, booking.start_time)
+
+
+async def _outbox_booking_created(event: Any, booking: Optional[Any]) -> None:
+    if booking is None or booking.status == "cancelled":
+        logger.info(
+            "Skipping booking_created for a missing or cancelled booking",
+            booking_id=str(event.booking_id),
+        )
+        return
+
+    await _start_booking_workflow(
+        _booking_workflow_input(
+            booking_id=booking.id,
+            appointment_datetime=_appointment_datetime(booking),
+            **_booking_fields(booking),
+        ),
+        f"booking-{booking.id}-{event.id}",
+    )
+
+
+async def _outbox_booking_cancelled(event: Any, booking: Optional[Any]) -> None:
+    reason = (event.payload or {}).get("reason")
+    if await _cancel_booking(event.booking_id, reason, str(event.id)) is not None:
+        return
+
+    # Nothing running: a past booking's workflow has simply finished
+    if booking is None or _appointment_datetime(booking) <= datetime.utcnow():
+        logger.info(
+            "No running workflow for a cancelled past or missing booking",
+            booking_id=str(event.booking_id),
+        )
+        return
+
+    # Cancelled before booking_created was handled: that event skipped the
+    # booking, so there is no workflow to cancel
+    if booking.status == "cancelled" and not await _booking_workflow_started(
+        event.booking_id
+    ):
+        logger.info(
+            "No workflow was started for a booking cancelled before creation",
+            booking_id=str(event.booking_id),
+        )
+        return
+
+    # An upcoming booking should have one; usually it was started moments
+    # ago and visibility does not list it yet. Retried with backoff.
+    raise LookupError(f"No active workflow found for booking {event.booking_id}")
+
+
+async def _outbox_booking_rescheduled(event: Any, booking: Optional[Any]) -> None:
+    if booking is None:
+        logger.info(
+            "Skipping booking_rescheduled for a missing booking",
+            booking_id=str(event.booking_id),
+        )
+        return
+
+    await _reschedule_booking(
+        booking_id=booking.id,
+        new_appointment_datetime=_appointment_datetime(booking),
+        suffix=str(event.id),
+        **_booking_fields(booking),
+    )
+
+
 # Helper functions
 
+CLOSED_WORKFLOW_STATUSES = ("COMPLETED", "FAILED", "CANCELLED")
+
+
+async def _describe_workflow(workflow_id: str) -> Dict[str, Any]:
+    """
+    Status, timings and (once closed) result of a workflow
 
-async def _find_booking_workflow(booking_id: int) -> Optional[str]:
+    Closed workflows are served from the status cache after the first
+    lookup; running ones for a few seconds.
+    """
+
+    cached = await status_cache.get_closed(workflow_id)
+    if cached is None:
+        cached = status_cache.get_running(workflow_id)
+    if cached is not None:
+        return cached
+
+    handle: WorkflowHandle = temporal_client.get_workflow_handle(workflow_id)
+
+    desc = await handle.describe()
+
+    closed = desc.status.name in CLOSED_WORKFLOW_STATUSES
+    cacheable = True
+    result: Optional[Any] = None
+    if closed:
+        try:
+            result = await handle.result()
+        except WorkflowFailureError:
+            pass
+        except Exception:
+            # Transient; try again on the next request
+            cacheable = False
+
+    description = {
+        "workflow_id": workflow_id,
+        "status": desc.status.name,
+        "start_time": desc.start_time.isoformat() if desc.start_time else None,
+        "close_time": desc.close_time.isoformat() if desc.close_time else None,
+        "result": result,
+    }
+
+    if closed and cacheable:
+        await status_cache.put_closed(workflow_id, description)
+    elif not closed:
+        status_cache.put_running(workflow_id, description)
+
+    return description
+
+
+async def _describe_booking_workflow(booking_id: Any) -> Optional[Dict[str, Any]]:
+    """Status and queried state of a booking's running workflow, if any"""
+
+    cache_key = ("booking", str(booking_id))
+    cached = status_cache.get_running(cache_key)
+    if cached is not None:
+        return cached
+
+    workflow_id = await _find_booking_workflow(booking_id)
+    if not workflow_id:
+        return None
+
+    handle: WorkflowHandle = temporal_client.get_workflow_handle(workflow_id)
+
+    # Describe and query independently of each other
+    desc, status = await asyncio.gather(
+        handle.describe(),
+        handle.query(AppointmentBookingWorkflow.get_status),
+    )
+
+    state = {
+        "workflow_id": workflow_id,
+        "booking_id": booking_id,
+        "status": desc.status.name,
+        "workflow_state": status,
+    }
+    status_cache.put_running(cache_key, state)
+
+    return state
+
+
+async def _booking_workflow_started(booking_id: Any) -> bool:
+    """
+    Whether a booking workflow was ever started for the booking, running
+    or not. A failed lookup counts as started, so the caller retries.
+    """
+
+    try:
+        if await fetch_readonly(
+            queries.fetch_any_tracked_workflow, UUID(str(booking_id))
+        ):
+            return True
+
+        async for _ in temporal_client.list_workflows(
+            query=f'WorkflowId STARTS_WITH "booking-{booking_id}-"'
+        ):
+            return True
+    except Exception as e:
+        logger.warning("Booking workflow lookup failed", error=str(e))
+        return True
+
+    return False
+
+
+async def _find_booking_workflow(booking_id: Any) -> Optional[str]:
     """
     Find active workflow ID for a booking.
-    Uses Temporal's list API to search for workflows.
+
+    Looks in workflow_tracking first; the tracked workflow may have
+    completed since. Bookings started before tracking, or whose tracking
+    write failed, are found with Temporal's list API.
     """
 
+    if not temporal_client:
+        return None
+
+    tracked = await _tracked_booking_workflow(booking_id)
+    if tracked:
+        return tracked
+
+    return await _running_booking_workflow(booking_id)
+
+
+async def _tracked_booking_workflow(booking_id: Any) -> Optional[str]:
+    """The booking's workflow in workflow_tracking, unless it was cancelled"""
+
+    try:
+        return await fetch_readonly(
+            queries.fetch_tracked_workflow, UUID(str(booking_id))
+        )
+    except Exception as e:
+        logger.warning("Workflow tracking lookup failed", error=str(e))
+        return None
+
+
+async def _running_booking_workflow(
+    booking_id: Any, exclude: Optional[str] = None
+) -> Optional[str]:
+    """A running booking workflow for the booking from Temporal's list API"""
+
     if not temporal_client:
         return None
 
@@ -433,7 +1099,7 @@ async def _find_booking_workflow(booking_id: int) -> Optional[str]:
         async for workflow in temporal_client.list_workflows(
             query=f'WorkflowId STARTS_WITH "booking-{booking_id}-"'
         ):
-            if workflow.status.name == "RUNNING":
+            if workflow.status.name == "RUNNING" and workflow.id != exclude:
                 return workflow.id
 
         return None
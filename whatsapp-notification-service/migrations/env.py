@@ -0,0 +1,87 @@
+"""
+Alembic environment for the notification service
+
+The database is shared with the backend, which owns clients, bookings and
+the outbox through its own SQL migrations. This service versions only the
+tables it writes and the indexes its hot queries need, in a version table
+of its own. Each revision runs in its own transaction so a revision can
+step out of it for CREATE INDEX CONCURRENTLY.
+"""
+
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from config import get_settings
+from database import Base
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+VERSION_TABLE = "alembic_version_notifications"
+
+# Tables whose schema this service owns; autogenerate ignores the rest
+SERVICE_TABLES = {
+    "marketing_opt_outs",
+    "notification_logs",
+    "notification_stats_hourly",
+    "reminder_dispatches",
+    "workflow_status_cache",
+    "workflow_tracking",
+}
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to) -> bool:
+    if type_ == "table":
+        return name in SERVICE_TABLES
+    return True
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=include_object,
+        include_schemas=True,
+        version_table=VERSION_TABLE,
+        version_table_schema="public",
+        transaction_per_migration=True,
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    """Print the SQL instead of running it (alembic upgrade head --sql)"""
+
+    _configure(
+        url=get_settings().TEMPORAL_DATABASE_URL,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run_sync(connection) -> None:
+    _configure(connection=connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(
+        get_settings().TEMPORAL_DATABASE_URL, poolclass=NullPool
+    )
+    async with engine.connect() as connection:
+        await connection.run_sync(_run_sync)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
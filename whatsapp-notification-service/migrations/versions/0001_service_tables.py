@@ -0,0 +1,81 @@
+"""
+Tables the notification service writes
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Mirrors the models in database.py. Existing deployments already have
+some of these tables (created by hand or by status_cache.ensure_table and
+scripts/backfill_notification_stats.py), so every statement is IF NOT
+EXISTS and this revision also serves as the baseline for them.
+notification_outbox belongs to the backend (backend/migrations/002).
+"""
+
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.notification_logs (
+            id SERIAL PRIMARY KEY,
+            booking_id UUID REFERENCES public.bookings(id),
+            client_id UUID NOT NULL REFERENCES public.clients(id),
+            phone_number VARCHAR(20) NOT NULL,
+            message_type VARCHAR(50) NOT NULL,
+            message_content TEXT NOT NULL,
+            sent_at TIMESTAMP,
+            status VARCHAR(20) NOT NULL,
+            provider_message_id VARCHAR(200),
+            error_message TEXT,
+            retry_count INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.notification_stats_hourly (
+            bucket TIMESTAMP NOT NULL,
+            message_type VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            message_count INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (bucket, message_type, status)
+        )
+        """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.workflow_status_cache (
+            workflow_id VARCHAR(200) PRIMARY KEY,
+            payload JSONB NOT NULL,
+            cached_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """)
+
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.workflow_tracking (
+            id SERIAL PRIMARY KEY,
+            booking_id UUID NOT NULL UNIQUE REFERENCES public.bookings(id),
+            workflow_id VARCHAR(200) NOT NULL UNIQUE,
+            workflow_type VARCHAR(50) NOT NULL,
+            status VARCHAR(20) NOT NULL,
+            started_at TIMESTAMP NOT NULL DEFAULT now(),
+            completed_at TIMESTAMP,
+            cancelled_at TIMESTAMP,
+            error_message TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT now(),
+            updated_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """)
+
+
+def downgrade() -> None:
+    # The tables may predate this revision and hold the notification
+    # history, so they are left in place
+    pass
@@ -0,0 +1,157 @@
+"""
+Index pack for the hot notification queries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+- notification_logs (provider_message_id): delivery receipt updates
+- notification_logs (client_id, message_type, created_at): a client's
+  messages of one type, newest first
+- notification_logs (booking_id, message_type), partial on delivered
+  statuses: the reminder dispatcher's "already sent" probe
+- bookings ((booking_date + start_time)): due-window range scans
+- clients (last_visit_date), partial on marketing eligibility: campaign
+  audience selection only reads consenting, active, unblocked clients
+
+The first and fourth used to be created by scripts/create_indexes.py and
+keep their names, so existing databases skip them. Everything is built
+with CREATE INDEX CONCURRENTLY outside the revision's transaction, so
+writes continue meanwhile; an invalid index left by an interrupted run is
+dropped and built again. A partitioned notification_logs gets each index
+on the parent only, then per partition concurrently and attached;
+partitions created later inherit it. With --sql the plain-table
+statements are printed.
+"""
+
+from typing import List, Optional
+
+from alembic import context, op
+from partitions import LOG_INDEXES
+from sqlalchemy import text
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+# (name, table, columns, predicate)
+TABLE_INDEXES = [
+    ("ix_public_bookings_starts_at", "bookings", "(booking_date + start_time)", None),
+    (
+        "ix_public_clients_marketing_eligible",
+        "clients",
+        "last_visit_date",
+        "marketing_consent AND is_active AND status <> 'blocked'",
+    ),
+]
+
+# Created before this revision; downgrade leaves them in place
+PREEXISTING = {
+    "ix_public_notification_logs_provider_message_id",
+    "ix_public_bookings_starts_at",
+}
+
+
+def _where(predicate: Optional[str]) -> str:
+    return f" WHERE {predicate}" if predicate else ""
+
+
+def _is_partitioned() -> bool:
+    if context.is_offline_mode():
+        return False
+
+    relkind = (
+        op.get_bind()
+        .execute(
+            text(
+                "SELECT c.relkind FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = 'public' AND c.relname = 'notification_logs'"
+            )
+        )
+        .scalar()
+    )
+    return relkind == "p"
+
+
+def _partitions() -> List[str]:
+    rows = op.get_bind().execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'public.notification_logs'::regclass "
+            "ORDER BY c.relname"
+        )
+    )
+    return [name for (name,) in rows]
+
+
+def _drop_if_invalid(name: str) -> None:
+    if context.is_offline_mode():
+        return
+
+    invalid = (
+        op.get_bind()
+        .execute(
+            text(
+                "SELECT NOT indisvalid FROM pg_index "
+                "WHERE indexrelid = to_regclass(:name)"
+            ),
+            {"name": f"public.{name}"},
+        )
+        .scalar()
+    )
+    if invalid:
+        op.execute(f"DROP INDEX CONCURRENTLY public.{name}")
+
+
+def _create_index(
+    name: str, table: str, columns: str, predicate: Optional[str]
+) -> None:
+    _drop_if_invalid(name)
+    op.execute(
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} "
+        f"ON public.{table} ({columns}){_where(predicate)}"
+    )
+
+
+def _create_log_index(
+    suffix: str, columns: str, predicate: Optional[str], partitioned: bool
+) -> None:
+    name = f"ix_public_notification_logs_{suffix}"
+    if not partitioned:
+        _create_index(name, "notification_logs", columns, predicate)
+        return
+
+    op.execute(
+        f"CREATE INDEX IF NOT EXISTS {name} "
+        f"ON ONLY public.notification_logs ({columns}){_where(predicate)}"
+    )
+    for partition in _partitions():
+        partition_index = f"ix_{partition}_{suffix}"
+        _create_index(partition_index, partition, columns, predicate)
+        op.execute(f"ALTER INDEX {name} ATTACH PARTITION {partition_index}")
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        partitioned = _is_partitioned()
+        for suffix, columns, predicate in LOG_INDEXES:
+            _create_log_index(suffix, columns, predicate, partitioned)
+        for name, table, columns, predicate in TABLE_INDEXES:
+            _create_index(name, table, columns, predicate)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        # An index on a partitioned table cannot be dropped concurrently;
+        # dropping it drops the partition indexes with it
+        concurrently = "" if _is_partitioned() else "CONCURRENTLY "
+        for suffix, _, _ in LOG_INDEXES:
+            name = f"ix_public_notification_logs_{suffix}"
+            if name not in PREEXISTING:
+                op.execute(f"DROP INDEX {concurrently}IF EXISTS public.{name}")
+        for name, _, _, _ in TABLE_INDEXES:
+            if name not in PREEXISTING:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS public.{name}")
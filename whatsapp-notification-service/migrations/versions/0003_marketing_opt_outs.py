@@ -0,0 +1,32 @@
+"""
+Marketing opt-out list
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+One row per opted-out E.164 number, written by STOP replies on the
+webhook and by the opt-out endpoints, loaded whole by the campaign path
+(see opt_outs.py).
+"""
+
+from alembic import op
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.marketing_opt_outs (
+            phone_number VARCHAR(20) PRIMARY KEY,
+            source VARCHAR(20) NOT NULL,
+            opted_out_at TIMESTAMP NOT NULL DEFAULT now()
+        )
+        """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS public.marketing_opt_outs")
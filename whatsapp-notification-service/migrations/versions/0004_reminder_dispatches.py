@@ -0,0 +1,34 @@
+"""
+Reminder dispatch claims
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+One row per booking and reminder kind, inserted on the primary by the
+reminder dispatcher before it sends and removed again if the send fails.
+The due-reminders query skips claimed items, so overlapping dispatcher
+windows never send the same reminder twice.
+"""
+
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS public.reminder_dispatches (
+            booking_id UUID NOT NULL REFERENCES public.bookings(id),
+            kind VARCHAR(50) NOT NULL,
+            claimed_at TIMESTAMP NOT NULL DEFAULT now(),
+            PRIMARY KEY (booking_id, kind)
+        )
+        """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS public.reminder_dispatches")
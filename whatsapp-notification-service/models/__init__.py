@@ -3,7 +3,13 @@ Models package initialization
 """
 
 # ---- SQLAlchemy ORM Models ----
-from database import Booking, Client, NotificationLog, WorkflowTracking
+from database import (
+    Booking,
+    Client,
+    NotificationLog,
+    NotificationStatsHourly,
+    WorkflowTracking,
+)
 
 # ---- Pydantic Schemas ----
 from models.schemas import (
@@ -23,5 +29,6 @@ __all__ = [
     "Client",
     "Booking",
     "NotificationLog",
+    "NotificationStatsHourly",
     "WorkflowTracking",
 ]
@@ -0,0 +1,153 @@
+"""
+Marketing opt-outs
+
+Numbers that replied STOP, or were opted out through the API, are kept in
+marketing_opt_outs by E.164 number. The campaign path loads them into a
+PhoneSet and drops them, along with repeated numbers, while building the
+audience, so no send is scheduled for them. Each page of a running
+campaign checks the set again (refreshed every
+MARKETING_OPT_OUT_REFRESH_SECONDS), so a STOP mid-campaign also stops
+the pages still to come.
+"""
+
+import asyncio
+import re
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Iterable, List, Optional
+
+import queries
+import structlog
+from database import get_db_connection
+from utils.phone_formatter import normalize_phone_number
+
+logger = structlog.get_logger()
+
+# Whole-message replies that opt out, compared without case, spaces or
+# punctuation. "cancel" is left out: clients send it about bookings.
+STOP_KEYWORDS = frozenset({"stop", "stopall", "unsubscribe", "optout"})
+
+_NON_LETTERS = re.compile(r"[^a-z]")
+
+
+class PhoneSet:
+    """
+    Read-only set of E.164 numbers held as sorted 64-bit integers
+
+    Eight bytes per number instead of a str object and a hash slot, so the
+    whole opt-out list stays small in every worker process.
+    """
+
+    def __init__(self, phone_numbers: Iterable[str] = ()):
+        self._numbers = array(
+            "Q", sorted({self._key(phone) for phone in phone_numbers if phone})
+        )
+
+    @staticmethod
+    def _key(phone: str) -> int:
+        return int(phone.lstrip("+"))
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    def __contains__(self, phone: object) -> bool:
+        if not isinstance(phone, str) or not phone.lstrip("+").isdigit():
+            return False
+
+        key = self._key(phone)
+        index = bisect_left(self._numbers, key)
+        return index < len(self._numbers) and self._numbers[index] == key
+
+
+def is_stop_message(text: Optional[str]) -> bool:
+    return bool(text) and _NON_LETTERS.sub("", text.lower()) in STOP_KEYWORDS
+
+
+def _message_text(message: dict) -> Optional[str]:
+    if isinstance(message.get("text"), dict):
+        return message["text"].get("body")
+    if isinstance(message.get("button"), dict):
+        return message["button"].get("text")
+    if isinstance(message.get("body"), str):
+        return message["body"]
+    return None
+
+
+def parse_stop_senders(payload: Any, country_code: str) -> List[str]:
+    """
+    E.164 numbers of the senders of STOP replies in a webhook body
+
+    Reads inbound messages from the WhatsApp Cloud API envelope
+    (entry[].changes[].value.messages[]) or a {"messages": [...]} body.
+    Other payloads, such as status callbacks, yield nothing.
+    """
+
+    if isinstance(payload, dict) and "entry" in payload:
+        messages = [
+            message
+            for entry in payload.get("entry") or []
+            for change in entry.get("changes") or []
+            for message in (change.get("value") or {}).get("messages") or []
+        ]
+    elif isinstance(payload, dict):
+        messages = payload.get("messages") or []
+    else:
+        messages = []
+
+    senders = []
+    for message in messages:
+        if not isinstance(message, dict) or not is_stop_message(_message_text(message)):
+            continue
+
+        number = normalize_phone_number(str(message.get("from") or ""), country_code)
+        if number.valid and number.e164 not in senders:
+            senders.append(number.e164)
+
+    return senders
+
+
+class OptOutCache:
+    """The opt-out list as a PhoneSet, reloaded once it is older than a TTL"""
+
+    def __init__(
+        self,
+        refresh_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self._clock = clock
+        self._phones = PhoneSet()
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    def _fresh(self, max_age_seconds: float) -> bool:
+        return (
+            self._loaded_at is not None
+            and self._clock() - self._loaded_at < max_age_seconds
+        )
+
+    async def get(self, max_age_seconds: Optional[float] = None) -> PhoneSet:
+        """
+        The opt-out set, reloaded if older than max_age_seconds (default
+        the refresh interval). Concurrent callers share one reload.
+        """
+
+        max_age = self.refresh_seconds if max_age_seconds is None else max_age_seconds
+        if self._fresh(max_age):
+            return self._phones
+
+        requested_at = self._clock()
+        async with self._lock:
+            # Someone else reloaded while this caller waited
+            if self._loaded_at is not None and self._loaded_at >= requested_at:
+                return self._phones
+
+            async with get_db_connection(readonly=True) as conn:
+                phones = await queries.fetch_opt_out_phones(conn)
+
+            self._phones = PhoneSet(phones)
+            self._loaded_at = self._clock()
+            logger.debug("marketing_opt_outs_loaded", count=len(self._phones))
+
+        return self._phones
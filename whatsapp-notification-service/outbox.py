@@ -0,0 +1,215 @@
+"""
+Booking event outbox consumer
+
+The backend writes a notification_outbox row in the same transaction as
+each booking change, so an event exists exactly when the change
+committed. An insert trigger NOTIFYs the notification_outbox channel;
+the consumer LISTENs on its own connection and also polls every
+poll interval, so a missed notification or a dropped listener only
+delays events.
+
+Each pass claims a batch with FOR UPDATE SKIP LOCKED, so API replicas
+share the work, runs the handlers for the whole batch concurrently and
+records every outcome in one statement before committing. An event is
+not claimed while an earlier event of the same booking is pending, even
+one backing off or held by another replica, so a booking's events are
+handled one at a time and in order. An event whose outcome was not committed is
+handled again, so handlers must be idempotent.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import asyncpg
+import queries
+import structlog
+from database import get_db_connection
+from sqlalchemy.engine import make_url
+from utils import metrics
+
+logger = structlog.get_logger()
+
+CHANNEL = "notification_outbox"
+
+# handler(event row, booking details row or None)
+OutboxHandler = Callable[[Any, Optional[Any]], Awaitable[None]]
+
+
+class OutboxOutcome(NamedTuple):
+    id: int
+    error: Optional[str]
+    delay_seconds: float
+    done: bool
+
+
+def listen_dsn(database_url: str) -> str:
+    """Plain asyncpg DSN for a SQLAlchemy database URL"""
+    url = make_url(database_url).set(drivername="postgresql")
+    return url.render_as_string(hide_password=False)
+
+
+class OutboxConsumer:
+    """Claims notification_outbox events in batches and hands them to handlers"""
+
+    def __init__(
+        self,
+        dsn: str,
+        handlers: Dict[str, OutboxHandler],
+        batch_size: int,
+        concurrency: int,
+        poll_interval_seconds: float,
+        max_attempts: int,
+        backoff_seconds: float,
+        backoff_max_seconds: float,
+    ):
+        self.dsn = dsn
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self._wakeup = asyncio.Event()
+        self._listener: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+    async def _listen(self) -> None:
+        """(Re)open the LISTEN connection; polling covers for it meanwhile"""
+
+        if self._listener is not None and not self._listener.is_closed():
+            return
+
+        try:
+            self._listener = await asyncpg.connect(self.dsn)
+            await self._listener.add_listener(CHANNEL, self._notified)
+        except Exception as e:
+            self._listener = None
+            logger.warning("Outbox LISTEN unavailable, polling only", error=str(e))
+
+    def _notified(self, *args: Any) -> None:
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            await self._listen()
+
+            # Cleared first, so a NOTIFY during the pass triggers another
+            self._wakeup.clear()
+            try:
+                while await self.process_batch() == self.batch_size:
+                    pass
+            except Exception as e:
+                logger.error("Failed to process outbox events", error=str(e))
+
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.poll_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    async def process_batch(self) -> int:
+        """Claim, handle and finish one batch; returns how many were claimed"""
+
+        async with get_db_connection() as conn:
+            events = await queries.claim_outbox_events(conn, self.batch_size)
+            if not events:
+                return 0
+
+            bookings = await queries.fetch_outbox_booking_details(
+                conn, {event.booking_id for event in events}
+            )
+            outcomes = await self._handle(events, bookings)
+            await queries.finish_outbox_events(conn, outcomes)
+
+        return len(events)
+
+    async def _handle(
+        self, events: List[Any], bookings: Dict[Any, Any]
+    ) -> List[OutboxOutcome]:
+        by_booking: Dict[Any, List[Any]] = defaultdict(list)
+        for event in events:
+            by_booking[event.booking_id].append(event)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def handle_booking(booking_events: List[Any]) -> List[OutboxOutcome]:
+            async with semaphore:
+                outcomes = []
+                for position, event in enumerate(booking_events):
+                    outcome = await self._handle_one(
+                        event, bookings.get(event.booking_id)
+                    )
+                    outcomes.append(outcome)
+                    if not outcome.done:
+                        # Later events of this booking wait for this one
+                        outcomes.extend(
+                            outcome._replace(id=later.id, error=f"after {event.id}")
+                            for later in booking_events[position + 1 :]
+                        )
+                        break
+                return outcomes
+
+        results = await asyncio.gather(
+            *(handle_booking(booking_events) for booking_events in by_booking.values())
+        )
+        return [outcome for outcomes in results for outcome in outcomes]
+
+    async def _handle_one(self, event: Any, booking: Optional[Any]) -> OutboxOutcome:
+        handler = self.handlers.get(event.event_type)
+        if handler is None:
+            metrics.OUTBOX_EVENTS.labels(
+                event_type=event.event_type, result="unknown"
+            ).inc()
+            logger.error("Unknown outbox event type", event_id=event.id)
+            return OutboxOutcome(event.id, "unknown event type", 0.0, True)
+
+        try:
+            await handler(event, booking)
+        except Exception as e:
+            attempts = event.attempts + 1
+            give_up = attempts >= self.max_attempts
+            metrics.OUTBOX_EVENTS.labels(
+                event_type=event.event_type, result="failed" if give_up else "retried"
+            ).inc()
+            logger.warning(
+                "Outbox event failed",
+                event_id=event.id,
+                event_type=event.event_type,
+                booking_id=str(event.booking_id),
+                attempts=attempts,
+                giving_up=give_up,
+                error=str(e),
+            )
+            delay = min(
+                self.backoff_max_seconds, self.backoff_seconds * 2 ** (attempts - 1)
+            )
+            return OutboxOutcome(event.id, str(e), delay, give_up)
+
+        metrics.OUTBOX_EVENTS.labels(
+            event_type=event.event_type, result="handled"
+        ).inc()
+        metrics.OUTBOX_EVENT_LAG_SECONDS.observe(
+            (datetime.now(timezone.utc) - event.created_at).total_seconds()
+        )
+        return OutboxOutcome(event.id, None, 0.0, True)
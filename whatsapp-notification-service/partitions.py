@@ -0,0 +1,347 @@
+"""
+Monthly range partitioning and retention for notification_logs
+
+notification_logs is partitioned by created_at into one table per month,
+named notification_logs_pYYYYMM. Rows written before the conversion live
+in notification_logs_legacy, attached as the partition covering
+everything before the first monthly one.
+
+Retention works in three steps so an interrupted run can resume:
+partitions older than the retention window are detached, each detached
+partition is exported to <archive_dir>/<partition>.ndjson.gz, and only
+then is it dropped.
+"""
+
+import asyncio
+import gzip
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import orjson
+import structlog
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+logger = structlog.get_logger()
+
+PARENT_TABLE = "notification_logs"
+
+# Only names matching this are ever interpolated into DDL
+PARTITION_NAME_RE = re.compile(r"^notification_logs_(p\d{6}|legacy)$")
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+EXPORT_CHUNK_ROWS = 5000
+
+SENT_STATUSES = "status IN ('sent', 'delivered', 'read')"
+
+# Indexes the hot queries need on every partition: (suffix, columns,
+# predicate). The parent's index is ix_public_notification_logs_<suffix>
+# and each partition's ix_<partition>_<suffix>; partitions created later
+# inherit them. Built on existing tables by migrations/versions/0002.
+LOG_INDEXES = [
+    ("provider_message_id", "provider_message_id", None),
+    ("client_type_created", "client_id, message_type, created_at", None),
+    ("sent_markers", "booking_id, message_type", SENT_STATUSES),
+]
+
+
+@dataclass
+class Partition:
+    """A notification_logs partition and its [lower, upper) bounds (None = unbounded)"""
+
+    name: str
+    lower: Optional[datetime]
+    upper: Optional[datetime]
+
+    def overlaps(self, lower: datetime, upper: datetime) -> bool:
+        return (self.lower is None or self.lower < upper) and (
+            self.upper is None or self.upper > lower
+        )
+
+
+def month_start(value: datetime) -> datetime:
+    """First instant of the month containing value (naive)"""
+    return datetime(value.year, value.month, 1)
+
+
+def add_months(value: datetime, months: int) -> datetime:
+    """Shift a month start by a number of months"""
+    index = value.year * 12 + value.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f"{PARENT_TABLE}_p{month:%Y%m}"
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    value = value.strip()
+    if value.upper() == "MINVALUE" or value.upper() == "MAXVALUE":
+        return None
+    return datetime.fromisoformat(value.strip("'"))
+
+
+def _index_ddl(suffix: str, columns: str, predicate: Optional[str]) -> List[str]:
+    """Hot index on the parent, built on the legacy partition and attached"""
+
+    where = f" WHERE {predicate}" if predicate else ""
+    parent_index = f"ix_public_{PARENT_TABLE}_{suffix}"
+    legacy_index = f"ix_{PARENT_TABLE}_legacy_{suffix}"
+    return [
+        # Existing indexes are picked up, not built again
+        f"CREATE INDEX IF NOT EXISTS {legacy_index} "
+        f"ON public.{PARENT_TABLE}_legacy ({columns}){where}",
+        f"CREATE INDEX {parent_index} "
+        f"ON ONLY public.{PARENT_TABLE} ({columns}){where}",
+        f"ALTER INDEX public.{parent_index} ATTACH PARTITION public.{legacy_index}",
+    ]
+
+
+def _checked_name(name: str) -> str:
+    if not PARTITION_NAME_RE.match(name):
+        raise ValueError(f"Not a notification_logs partition: {name}")
+    return name
+
+
+async def is_partitioned(conn: AsyncConnection) -> bool:
+    """True when public.notification_logs is a partitioned table"""
+
+    relkind = (
+        await conn.execute(
+            text(
+                "SELECT c.relkind FROM pg_class c "
+                "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = 'public' AND c.relname = :name"
+            ),
+            {"name": PARENT_TABLE},
+        )
+    ).scalar()
+    return relkind == "p"
+
+
+async def list_partitions(conn: AsyncConnection) -> List[Partition]:
+    """Attached partitions of notification_logs, oldest first"""
+
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = 'public.notification_logs'::regclass"
+        )
+    )
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if not match:
+            continue
+        partitions.append(
+            Partition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2)))
+        )
+
+    return sorted(partitions, key=lambda p: p.lower or datetime.min)
+
+
+async def list_detached_partitions(conn: AsyncConnection) -> List[str]:
+    """Former partitions that were detached but not yet archived and dropped"""
+
+    rows = await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_class c "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "WHERE n.nspname = 'public' AND c.relkind = 'r' "
+            "AND NOT c.relispartition "
+            "AND c.relname ~ '^notification_logs_(p[0-9]{6}|legacy)$' "
+            "ORDER BY c.relname"
+        )
+    )
+    return [name for (name,) in rows]
+
+
+async def convert_to_partitioned(conn: AsyncConnection, now: datetime) -> bool:
+    """
+    Turn a plain notification_logs table into a partitioned one.
+
+    The existing table is renamed to notification_logs_legacy and attached
+    as the partition for everything before the month after the newest row
+    (or after now). Monthly partitions are created from there on by
+    ensure_partitions(). The LOG_INDEXES are created on the parent with
+    the legacy table's existing indexes attached, so every later partition
+    gets them. Runs in the caller's transaction and takes an exclusive
+    lock on the table. Returns False if already partitioned.
+    """
+
+    if await is_partitioned(conn):
+        return False
+
+    await conn.execute(
+        text("LOCK TABLE public.notification_logs IN ACCESS EXCLUSIVE MODE")
+    )
+
+    sequence, identity = (
+        await conn.execute(
+            text(
+                "SELECT pg_get_serial_sequence('public.notification_logs', 'id'), "
+                "a.attidentity FROM pg_attribute a "
+                "WHERE a.attrelid = 'public.notification_logs'::regclass "
+                "AND a.attname = 'id'"
+            )
+        )
+    ).one()
+    if sequence is None or identity:
+        raise RuntimeError(
+            "notification_logs.id must be a serial column to convert automatically"
+        )
+
+    newest = (
+        await conn.execute(text("SELECT max(created_at) FROM public.notification_logs"))
+    ).scalar()
+    legacy_upper = add_months(month_start(max(now, newest or now)), 1)
+
+    statements = [
+        # The legacy table's indexes keep their names across the rename;
+        # free the parent's names for the partitioned indexes
+        *(
+            f"ALTER INDEX IF EXISTS public.ix_public_notification_logs_{suffix} "
+            f"RENAME TO ix_notification_logs_legacy_{suffix}"
+            for suffix, _, _ in LOG_INDEXES
+        ),
+        "UPDATE public.notification_logs "
+        "SET created_at = COALESCE(sent_at, now()) WHERE created_at IS NULL",
+        "ALTER TABLE public.notification_logs RENAME TO notification_logs_legacy",
+        "ALTER TABLE public.notification_logs_legacy ALTER COLUMN created_at SET NOT NULL",
+        "CREATE TABLE public.notification_logs "
+        "(LIKE public.notification_logs_legacy INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+        "PARTITION BY RANGE (created_at)",
+        "ALTER TABLE public.notification_logs ADD PRIMARY KEY (id, created_at)",
+        "ALTER TABLE public.notification_logs ALTER COLUMN created_at SET DEFAULT now()",
+        # The sequence must survive the legacy partition being dropped later
+        f"ALTER SEQUENCE {sequence} OWNED BY public.notification_logs.id",
+        "ALTER TABLE public.notification_logs ATTACH PARTITION "
+        "public.notification_logs_legacy "
+        f"FOR VALUES FROM (MINVALUE) TO ('{legacy_upper.isoformat()}')",
+        *(
+            statement
+            for suffix, columns, predicate in LOG_INDEXES
+            for statement in _index_ddl(suffix, columns, predicate)
+        ),
+    ]
+    for statement in statements:
+        await conn.execute(text(statement))
+
+    logger.info("notification_logs converted to partitioned", legacy_upper=legacy_upper)
+    return True
+
+
+async def ensure_partitions(
+    conn: AsyncConnection, now: datetime, months_ahead: int
+) -> List[str]:
+    """
+    Create monthly partitions from the current month through months_ahead.
+
+    Months already covered by a partition (including the legacy one) are
+    skipped. Returns the names of partitions created.
+    """
+
+    existing = await list_partitions(conn)
+    created = []
+
+    for offset in range(months_ahead + 1):
+        lower = add_months(month_start(now), offset)
+        upper = add_months(lower, 1)
+        if any(p.overlaps(lower, upper) for p in existing):
+            continue
+
+        name = partition_name(lower)
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS public.{name} "
+                "PARTITION OF public.notification_logs "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+        )
+        existing.append(Partition(name, lower, upper))
+        created.append(name)
+
+    return created
+
+
+async def detach_expired_partitions(
+    conn: AsyncConnection, now: datetime, retention_months: int
+) -> List[str]:
+    """Detach partitions entirely older than retention_months full months"""
+
+    cutoff = add_months(month_start(now), -retention_months)
+    detached = []
+
+    for partition in await list_partitions(conn):
+        if partition.upper is None or partition.upper > cutoff:
+            continue
+        name = _checked_name(partition.name)
+        await conn.execute(
+            text(f"ALTER TABLE public.notification_logs DETACH PARTITION public.{name}")
+        )
+        detached.append(name)
+
+    return detached
+
+
+async def export_partition(
+    conn: AsyncConnection,
+    name: str,
+    archive_dir: str,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Tuple[Path, int]:
+    """
+    Stream a detached partition to <archive_dir>/<name>.ndjson.gz
+
+    One JSON object per row. The file is written under a temporary name
+    and renamed once complete, so a finished archive is never partial.
+    Returns the archive path and the number of rows written.
+    """
+
+    name = _checked_name(name)
+    directory = Path(archive_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.ndjson.gz"
+    partial = directory / f"{name}.ndjson.gz.partial"
+
+    result = await conn.stream(
+        text(f"SELECT * FROM public.{name} ORDER BY created_at, id")
+    )
+
+    rows_written = 0
+    handle = await asyncio.to_thread(gzip.open, partial, "wb")
+    try:
+        async for chunk in result.mappings().partitions(EXPORT_CHUNK_ROWS):
+            lines = b"".join(
+                orjson.dumps(dict(row), default=str) + b"\n" for row in chunk
+            )
+            await asyncio.to_thread(handle.write, lines)
+            rows_written += len(chunk)
+            if progress:
+                progress(rows_written)
+    finally:
+        await asyncio.to_thread(handle.close)
+
+    await asyncio.to_thread(_fsync, partial)
+    os.replace(partial, path)
+
+    return path, rows_written
+
+
+def _fsync(path: Path) -> None:
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+async def drop_partition(conn: AsyncConnection, name: str) -> None:
+    """Drop a detached partition (only after it has been exported)"""
+
+    name = _checked_name(name)
+    await conn.execute(text(f"DROP TABLE public.{name}"))
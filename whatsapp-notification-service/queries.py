@@ -0,0 +1,700 @@
+"""
+Hot-path data access for activities
+
+The statements every message runs are built once here as SQLAlchemy Core
+constructs over the mapped tables. They execute on a plain connection, so
+there is no Session, identity map or entity construction, SQLAlchemy's
+compiled cache skips recompilation, and asyncpg reuses its per-connection
+prepared statements. Results are plain Row tuples.
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+from uuid import UUID
+
+from database import (
+    Booking,
+    Client,
+    MarketingOptOut,
+    NotificationLog,
+    NotificationOutbox,
+    NotificationStatsHourly,
+    ReminderDispatch,
+    WorkflowStatusSnapshot,
+    WorkflowTracking,
+)
+from sqlalchemy import (
+    Interval,
+    bindparam,
+    delete,
+    func,
+    insert,
+    literal_column,
+    or_,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+bookings = Booking.__table__
+clients = Client.__table__
+marketing_opt_outs = MarketingOptOut.__table__
+notification_logs = NotificationLog.__table__
+notification_outbox = NotificationOutbox.__table__
+notification_stats_hourly = NotificationStatsHourly.__table__
+reminder_dispatches = ReminderDispatch.__table__
+workflow_status_cache = WorkflowStatusSnapshot.__table__
+workflow_tracking = WorkflowTracking.__table__
+
+BOOKING_DETAILS = (
+    select(
+        bookings.c.id,
+        bookings.c.client_id,
+        bookings.c.booking_date,
+        bookings.c.start_time,
+        bookings.c.duration_minutes,
+        bookings.c.status,
+        clients.c.first_name,
+        clients.c.last_name,
+        clients.c.whatsapp,
+        clients.c.phone,
+        clients.c.is_active.label("client_is_active"),
+        clients.c.status.label("client_status"),
+    )
+    .join(clients, bookings.c.client_id == clients.c.id)
+    .where(bookings.c.id == bindparam("booking_id"))
+)
+
+APPOINTMENT_TIMING = select(
+    bookings.c.booking_date,
+    bookings.c.start_time,
+    bookings.c.duration_minutes,
+).where(bookings.c.id == bindparam("booking_id"))
+
+INSERT_NOTIFICATION_LOG = insert(notification_logs)
+
+MARK_CONFIRMATION_SENT = (
+    update(bookings)
+    .where(bookings.c.id == bindparam("booking_id"))
+    .values(confirmation_sent_at=bindparam("sent_at"))
+)
+
+MARK_REMINDER_SENT = (
+    update(bookings)
+    .where(bookings.c.id == bindparam("booking_id"))
+    .values(reminder_sent_at=bindparam("sent_at"))
+)
+
+BOOKING_SENT_MARKERS = {
+    "confirmation_sent_at": MARK_CONFIRMATION_SENT,
+    "reminder_sent_at": MARK_REMINDER_SENT,
+}
+
+_stats_upsert = pg_insert(notification_stats_hourly).values(
+    bucket=bindparam("bucket"),
+    message_type=bindparam("message_type"),
+    status=bindparam("status"),
+    message_count=bindparam("delta"),
+    updated_at=func.now(),
+)
+INCREMENT_STATS_HOURLY = _stats_upsert.on_conflict_do_update(
+    index_elements=["bucket", "message_type", "status"],
+    set_={
+        "message_count": notification_stats_hourly.c.message_count
+        + _stats_upsert.excluded.message_count,
+        "updated_at": func.now(),
+    },
+)
+
+STATS_SINCE = (
+    select(
+        notification_stats_hourly.c.message_type,
+        notification_stats_hourly.c.status,
+        func.sum(notification_stats_hourly.c.message_count).label("total"),
+    )
+    .where(notification_stats_hourly.c.bucket >= bindparam("since"))
+    .group_by(
+        notification_stats_hourly.c.message_type,
+        notification_stats_hourly.c.status,
+    )
+)
+
+# Delivery statuses only ever move forward. "read" and "failed" are both
+# final, so whichever arrives first wins.
+STATUS_RANK = {"sent": 1, "delivered": 2, "read": 3, "failed": 3}
+
+_current_rank = "CASE nl.status {} ELSE 0 END".format(
+    " ".join(f"WHEN '{status}' THEN {rank}" for status, rank in STATUS_RANK.items())
+)
+
+# One statement per batch: moves matching logs forward, shifts their counts
+# between statuses in the hourly rollup, and returns the message ids that
+# matched no log row yet.
+APPLY_DELIVERY_STATUSES = text(f"""
+    WITH v AS (
+        SELECT * FROM unnest(
+            CAST(:message_ids AS text[]),
+            CAST(:statuses AS text[]),
+            CAST(:ranks AS int[]),
+            CAST(:errors AS text[])
+        ) AS v(provider_message_id, status, rank, error)
+    ),
+    prev AS (
+        SELECT nl.id, nl.created_at, nl.message_type,
+               nl.status AS old_status, v.status AS new_status, v.error
+        FROM public.notification_logs nl
+        JOIN v ON nl.provider_message_id = v.provider_message_id
+        WHERE v.rank > {_current_rank}
+        FOR UPDATE OF nl
+    ),
+    upd AS (
+        UPDATE public.notification_logs nl
+        SET status = prev.new_status,
+            error_message = COALESCE(prev.error, nl.error_message),
+            updated_at = now()
+        FROM prev
+        WHERE nl.id = prev.id AND nl.created_at = prev.created_at
+        RETURNING prev.created_at, prev.message_type,
+                  prev.old_status, prev.new_status
+    ),
+    deltas AS (
+        SELECT date_trunc('hour', created_at) AS bucket, message_type,
+               old_status AS status, -1 AS delta
+        FROM upd
+        UNION ALL
+        SELECT date_trunc('hour', created_at), message_type, new_status, 1
+        FROM upd
+    ),
+    rollup AS (
+        INSERT INTO public.notification_stats_hourly
+            (bucket, message_type, status, message_count, updated_at)
+        SELECT bucket, message_type, status, sum(delta), now()
+        FROM deltas
+        GROUP BY bucket, message_type, status
+        ON CONFLICT (bucket, message_type, status) DO UPDATE
+        SET message_count =
+                notification_stats_hourly.message_count + excluded.message_count,
+            updated_at = now()
+    )
+    SELECT v.provider_message_id
+    FROM v
+    WHERE NOT EXISTS (
+        SELECT 1 FROM public.notification_logs nl
+        WHERE nl.provider_message_id = v.provider_message_id
+    )
+    """)
+
+STATUS_SNAPSHOT = select(workflow_status_cache.c.payload).where(
+    workflow_status_cache.c.workflow_id == bindparam("workflow_id")
+)
+
+# Closed workflows never change, so the first writer wins
+INSERT_STATUS_SNAPSHOT = (
+    pg_insert(workflow_status_cache)
+    .values(
+        workflow_id=bindparam("workflow_id"),
+        payload=bindparam("payload"),
+        cached_at=func.now(),
+    )
+    .on_conflict_do_nothing(index_elements=["workflow_id"])
+)
+
+# Latest booking workflow per booking, so a cancel can find it without a
+# Temporal visibility query
+_tracking_upsert = pg_insert(workflow_tracking).values(
+    booking_id=bindparam("booking_id"),
+    workflow_id=bindparam("workflow_id"),
+    workflow_type=bindparam("workflow_type"),
+    status="running",
+    started_at=func.now(),
+    created_at=func.now(),
+    updated_at=func.now(),
+)
+TRACK_WORKFLOW = _tracking_upsert.on_conflict_do_update(
+    index_elements=["booking_id"],
+    set_={
+        "workflow_id": _tracking_upsert.excluded.workflow_id,
+        "workflow_type": _tracking_upsert.excluded.workflow_type,
+        "status": "running",
+        "started_at": func.now(),
+        "completed_at": None,
+        "cancelled_at": None,
+        "error_message": None,
+        "updated_at": func.now(),
+    },
+)
+
+TRACKED_WORKFLOW = select(workflow_tracking.c.workflow_id).where(
+    workflow_tracking.c.booking_id == bindparam("booking_id"),
+    workflow_tracking.c.status == "running",
+)
+
+MARK_WORKFLOW_COMPLETED = (
+    update(workflow_tracking)
+    .where(
+        workflow_tracking.c.workflow_id == bindparam("workflow_id"),
+        workflow_tracking.c.status == "running",
+    )
+    .values(status="completed", completed_at=func.now(), updated_at=func.now())
+)
+
+ANY_TRACKED_WORKFLOW = select(workflow_tracking.c.workflow_id).where(
+    workflow_tracking.c.booking_id == bindparam("booking_id")
+)
+
+MARK_WORKFLOW_CANCELLED = (
+    update(workflow_tracking)
+    .where(workflow_tracking.c.workflow_id == bindparam("workflow_id"))
+    .values(status="cancelled", cancelled_at=func.now(), updated_at=func.now())
+)
+
+# Upper bound on duration_minutes, used only to bound the aftercare range scan
+MAX_APPOINTMENT_DURATION = timedelta(hours=12)
+
+# Bookings with a reminder or aftercare due in [window_start, window_end)
+# that has not been sent yet, neither by a booking workflow (a sent log
+# row) nor claimed by an earlier dispatcher run. Each branch is a range
+# scan on the (booking_date + start_time) expression index.
+DUE_REMINDERS = text("""
+    WITH due AS (
+        SELECT id, 'reminder_24h' AS kind
+        FROM public.bookings
+        WHERE (booking_date + start_time) >= :start_24h
+          AND (booking_date + start_time) < :end_24h
+          AND status IN ('confirmed', 'pending')
+        UNION ALL
+        SELECT id, 'reminder_1h'
+        FROM public.bookings
+        WHERE (booking_date + start_time) >= :start_1h
+          AND (booking_date + start_time) < :end_1h
+          AND status IN ('confirmed', 'pending')
+        UNION ALL
+        SELECT id, 'aftercare'
+        FROM public.bookings
+        WHERE (booking_date + start_time) >= :start_aftercare
+          AND (booking_date + start_time) < :end_aftercare
+          AND status = 'completed'
+          AND (booking_date + start_time)
+              + make_interval(mins => COALESCE(duration_minutes, 60))
+              + :aftercare_after_end >= :window_start
+          AND (booking_date + start_time)
+              + make_interval(mins => COALESCE(duration_minutes, 60))
+              + :aftercare_after_end < :window_end
+    )
+    SELECT due.id, due.kind
+    FROM due
+    WHERE NOT EXISTS (
+        SELECT 1 FROM public.notification_logs nl
+        WHERE nl.booking_id = due.id
+          AND nl.message_type = due.kind
+          AND nl.status IN ('sent', 'delivered', 'read')
+    )
+    AND NOT EXISTS (
+        SELECT 1 FROM public.reminder_dispatches rd
+        WHERE rd.booking_id = due.id
+          AND rd.kind = due.kind
+    )
+    ORDER BY due.kind, due.id
+    """).bindparams(
+    bindparam("aftercare_after_end", type_=Interval()),
+)
+
+
+CLAIM_REMINDER_DISPATCH = (
+    pg_insert(reminder_dispatches)
+    .values(
+        booking_id=bindparam("booking_id"),
+        kind=bindparam("kind"),
+        claimed_at=bindparam("claimed_at"),
+    )
+    .on_conflict_do_nothing(index_elements=["booking_id", "kind"])
+    .returning(reminder_dispatches.c.booking_id)
+)
+
+RELEASE_REMINDER_DISPATCH = delete(reminder_dispatches).where(
+    reminder_dispatches.c.booking_id == bindparam("booking_id"),
+    reminder_dispatches.c.kind == bindparam("kind"),
+)
+
+
+# Clients a campaign may message. The consent, active and blocked
+# conditions are literals so the planner can match them against the
+# partial index ix_public_clients_marketing_eligible in every plan.
+ELIGIBLE_MARKETING_CLIENTS = select(
+    clients.c.id,
+    clients.c.first_name,
+    clients.c.last_name,
+    clients.c.whatsapp,
+    clients.c.phone,
+).where(
+    clients.c.marketing_consent == True,
+    clients.c.is_active == True,
+    clients.c.status != literal_column("'blocked'"),
+    or_(
+        clients.c.last_visit_date < bindparam("visited_before"),
+        clients.c.last_visit_date.is_(None),
+    ),
+    or_(clients.c.whatsapp.isnot(None), clients.c.phone.isnot(None)),
+)
+
+
+# Adds E.164 numbers to the opt-out list; a repeated opt-out keeps the
+# first. Returns the numbers that were not on the list yet.
+ADD_OPT_OUTS = text("""
+    INSERT INTO public.marketing_opt_outs (phone_number, source, opted_out_at)
+    SELECT phone_number, CAST(:source AS text), now()
+    FROM unnest(CAST(:phone_numbers AS text[])) AS phone_number
+    ON CONFLICT (phone_number) DO NOTHING
+    RETURNING phone_number
+    """)
+
+REMOVE_OPT_OUT = delete(marketing_opt_outs).where(
+    marketing_opt_outs.c.phone_number == bindparam("phone_number")
+)
+
+OPT_OUT_PHONES = select(marketing_opt_outs.c.phone_number)
+
+
+# Oldest unprocessed outbox events that are due, locked for this consumer.
+# Rows another consumer holds are skipped rather than waited for. An event
+# waits while an earlier event of its booking is still pending (backing
+# off, or held by another replica), so a booking's events are always
+# handled in order.
+_earlier_outbox = notification_outbox.alias("earlier")
+
+CLAIM_OUTBOX_EVENTS = (
+    select(
+        notification_outbox.c.id,
+        notification_outbox.c.booking_id,
+        notification_outbox.c.event_type,
+        notification_outbox.c.payload,
+        notification_outbox.c.attempts,
+        notification_outbox.c.created_at,
+    )
+    .where(
+        notification_outbox.c.processed_at.is_(None),
+        notification_outbox.c.available_at <= func.now(),
+        ~select(_earlier_outbox.c.id)
+        .where(
+            _earlier_outbox.c.booking_id == notification_outbox.c.booking_id,
+            _earlier_outbox.c.processed_at.is_(None),
+            _earlier_outbox.c.id < notification_outbox.c.id,
+        )
+        .exists(),
+    )
+    .order_by(notification_outbox.c.id)
+    .limit(bindparam("batch_size"))
+    .with_for_update(skip_locked=True)
+)
+
+# Everything a booking workflow input needs, for a batch of bookings
+OUTBOX_BOOKING_DETAILS = text("""
+    SELECT b.id, b.client_id, b.booking_date, b.start_time, b.status,
+           c.first_name, c.last_name, c.whatsapp, c.phone,
+           t.name AS treatment_name,
+           s.first_name AS staff_first_name, s.last_name AS staff_last_name
+    FROM public.bookings b
+    JOIN public.clients c ON c.id = b.client_id
+    LEFT JOIN public.treatments t ON t.id = b.treatment_id
+    LEFT JOIN public.staff s ON s.id = b.staff_id
+    WHERE b.id = ANY(CAST(:booking_ids AS uuid[]))
+    """)
+
+# Records the outcome of a claimed batch in one statement. Failed events
+# become available again after their delay unless they are given up on.
+FINISH_OUTBOX_EVENTS = text("""
+    UPDATE public.notification_outbox o
+    SET attempts = o.attempts + 1,
+        last_error = f.error,
+        available_at = now() + make_interval(secs => f.delay_seconds),
+        processed_at = CASE WHEN f.done THEN now() END
+    FROM unnest(
+        CAST(:ids AS bigint[]),
+        CAST(:errors AS text[]),
+        CAST(:delays AS float8[]),
+        CAST(:done AS boolean[])
+    ) AS f(id, error, delay_seconds, done)
+    WHERE o.id = f.id
+    """)
+
+
+def hour_bucket(value: datetime) -> datetime:
+    """Start of the hour containing value"""
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+async def fetch_booking_details(
+    conn: AsyncConnection, booking_id: UUID
+) -> Optional[Row]:
+    """
+    Booking joined with the client's contact and eligibility columns
+
+    Covers both the booking details join and the client eligibility check
+    in one round trip.
+    """
+    result = await conn.execute(BOOKING_DETAILS, {"booking_id": booking_id})
+    return result.first()
+
+
+async def fetch_appointment_timing(
+    conn: AsyncConnection, booking_id: UUID
+) -> Optional[Row]:
+    """(booking_date, start_time, duration_minutes) for a booking"""
+    result = await conn.execute(APPOINTMENT_TIMING, {"booking_id": booking_id})
+    return result.first()
+
+
+async def insert_notification_log(conn: AsyncConnection, **values: Any) -> None:
+    """Insert one notification_logs row"""
+    await conn.execute(INSERT_NOTIFICATION_LOG, values)
+
+
+async def mark_booking_sent(
+    conn: AsyncConnection, booking_id: UUID, marker: str, sent_at: datetime
+) -> None:
+    """Stamp confirmation_sent_at or reminder_sent_at on a booking"""
+    await conn.execute(
+        BOOKING_SENT_MARKERS[marker], {"booking_id": booking_id, "sent_at": sent_at}
+    )
+
+
+async def increment_stats(
+    conn: AsyncConnection,
+    created_at: datetime,
+    message_type: str,
+    status: str,
+    delta: int = 1,
+) -> None:
+    """
+    Add delta to the hourly rollup for (message_type, status)
+
+    Run in the same transaction as the notification_logs write it counts,
+    as the last statement so the rollup row lock is held briefly.
+    """
+    await conn.execute(
+        INCREMENT_STATS_HOURLY,
+        {
+            "bucket": hour_bucket(created_at),
+            "message_type": message_type,
+            "status": status,
+            "delta": delta,
+        },
+    )
+
+
+async def fetch_stats(
+    conn: AsyncConnection, since: datetime
+) -> Dict[str, Dict[str, int]]:
+    """Message counts per type and status from the hourly rollup since a time"""
+    result = await conn.execute(STATS_SINCE, {"since": hour_bucket(since)})
+
+    by_type: Dict[str, Dict[str, int]] = {}
+    for message_type, status, total in result:
+        by_type.setdefault(message_type, {})[status] = int(total)
+    return by_type
+
+
+async def apply_delivery_statuses(
+    conn: AsyncConnection,
+    events: Sequence[Any],
+) -> List[str]:
+    """
+    Apply (provider_message_id, status, error) events in one statement
+
+    Events that would move a log backwards are ignored. Returns the ids
+    with no notification_logs row yet.
+    """
+    result = await conn.execute(
+        APPLY_DELIVERY_STATUSES,
+        {
+            "message_ids": [e.provider_message_id for e in events],
+            "statuses": [e.status for e in events],
+            "ranks": [STATUS_RANK[e.status] for e in events],
+            "errors": [e.error for e in events],
+        },
+    )
+    return [message_id for (message_id,) in result]
+
+
+async def fetch_status_snapshot(
+    conn: AsyncConnection, workflow_id: str
+) -> Optional[Dict[str, Any]]:
+    """Cached status of a closed workflow, if stored"""
+    result = await conn.execute(STATUS_SNAPSHOT, {"workflow_id": workflow_id})
+    return result.scalar()
+
+
+async def insert_status_snapshot(
+    conn: AsyncConnection, workflow_id: str, payload: Dict[str, Any]
+) -> None:
+    """Store the status of a closed workflow"""
+    await conn.execute(
+        INSERT_STATUS_SNAPSHOT, {"workflow_id": workflow_id, "payload": payload}
+    )
+
+
+async def track_workflow(
+    conn: AsyncConnection, booking_id: UUID, workflow_id: str, workflow_type: str
+) -> None:
+    """Record workflow_id as the booking's current workflow"""
+    await conn.execute(
+        TRACK_WORKFLOW,
+        {
+            "booking_id": booking_id,
+            "workflow_id": workflow_id,
+            "workflow_type": workflow_type,
+        },
+    )
+
+
+async def fetch_tracked_workflow(
+    conn: AsyncConnection, booking_id: UUID
+) -> Optional[str]:
+    """
+    The booking's tracked workflow id, unless it was cancelled. It may have
+    completed since it was tracked.
+    """
+    result = await conn.execute(TRACKED_WORKFLOW, {"booking_id": booking_id})
+    return result.scalar()
+
+
+async def fetch_any_tracked_workflow(
+    conn: AsyncConnection, booking_id: UUID
+) -> Optional[str]:
+    """The booking's tracked workflow id in any status; None if never tracked"""
+    result = await conn.execute(ANY_TRACKED_WORKFLOW, {"booking_id": booking_id})
+    return result.scalar()
+
+
+async def mark_workflow_cancelled(conn: AsyncConnection, workflow_id: str) -> None:
+    await conn.execute(MARK_WORKFLOW_CANCELLED, {"workflow_id": workflow_id})
+
+
+async def mark_workflow_completed(conn: AsyncConnection, workflow_id: str) -> None:
+    await conn.execute(MARK_WORKFLOW_COMPLETED, {"workflow_id": workflow_id})
+
+
+async def fetch_due_reminders(
+    conn: AsyncConnection,
+    window_start: datetime,
+    window_end: datetime,
+    reminder_24h_before: timedelta,
+    reminder_1h_before: timedelta,
+    aftercare_after_end: timedelta,
+) -> List[Row]:
+    """
+    (booking id, kind) for every unsent reminder or aftercare due in the
+    window. The offsets are Settings.reminder_offsets(), the same ones
+    AppointmentBookingWorkflow waits for: reminders before the start,
+    aftercare after the end (start + duration).
+    """
+    result = await conn.execute(
+        DUE_REMINDERS,
+        {
+            "window_start": window_start,
+            "window_end": window_end,
+            "start_24h": window_start + reminder_24h_before,
+            "end_24h": window_end + reminder_24h_before,
+            "start_1h": window_start + reminder_1h_before,
+            "end_1h": window_end + reminder_1h_before,
+            "start_aftercare": window_start
+            - aftercare_after_end
+            - MAX_APPOINTMENT_DURATION,
+            "end_aftercare": window_end - aftercare_after_end,
+            "aftercare_after_end": aftercare_after_end,
+        },
+    )
+    return result.all()
+
+
+async def claim_reminder_dispatch(
+    conn: AsyncConnection, booking_id: UUID, kind: str, claimed_at: datetime
+) -> bool:
+    """Claim a due item for sending; False when another run already has it"""
+    result = await conn.execute(
+        CLAIM_REMINDER_DISPATCH,
+        {"booking_id": booking_id, "kind": kind, "claimed_at": claimed_at},
+    )
+    return result.first() is not None
+
+
+async def release_reminder_dispatch(
+    conn: AsyncConnection, booking_id: UUID, kind: str
+) -> None:
+    await conn.execute(
+        RELEASE_REMINDER_DISPATCH, {"booking_id": booking_id, "kind": kind}
+    )
+
+
+async def fetch_eligible_marketing_clients(
+    conn: AsyncConnection, visited_before: datetime
+) -> List[Row]:
+    """(id, first_name, last_name, whatsapp, phone) of clients a campaign may message"""
+    result = await conn.execute(
+        ELIGIBLE_MARKETING_CLIENTS, {"visited_before": visited_before}
+    )
+    return result.all()
+
+
+async def add_opt_outs(
+    conn: AsyncConnection, phone_numbers: Sequence[str], source: str
+) -> List[str]:
+    """Opt E.164 numbers out of marketing; returns the newly added ones"""
+    result = await conn.execute(
+        ADD_OPT_OUTS, {"phone_numbers": list(phone_numbers), "source": source}
+    )
+    return [phone_number for (phone_number,) in result]
+
+
+async def remove_opt_out(conn: AsyncConnection, phone_number: str) -> bool:
+    """Opt a number back in; False when it was not opted out"""
+    result = await conn.execute(REMOVE_OPT_OUT, {"phone_number": phone_number})
+    return result.rowcount > 0
+
+
+async def fetch_opt_out_phones(conn: AsyncConnection) -> List[str]:
+    """Every opted-out E.164 number"""
+    result = await conn.execute(OPT_OUT_PHONES)
+    return list(result.scalars())
+
+
+async def claim_outbox_events(conn: AsyncConnection, batch_size: int) -> List[Row]:
+    """
+    Lock up to batch_size due outbox events
+
+    The locks last until conn's transaction ends, so finish the events on
+    the same connection.
+    """
+    result = await conn.execute(CLAIM_OUTBOX_EVENTS, {"batch_size": batch_size})
+    return result.all()
+
+
+async def fetch_outbox_booking_details(
+    conn: AsyncConnection, booking_ids: Sequence[UUID]
+) -> Dict[UUID, Row]:
+    """Booking, client, treatment and staff details by booking id"""
+    result = await conn.execute(
+        OUTBOX_BOOKING_DETAILS, {"booking_ids": list(booking_ids)}
+    )
+    return {row.id: row for row in result}
+
+
+async def finish_outbox_events(
+    conn: AsyncConnection,
+    outcomes: Sequence[Any],
+) -> None:
+    """Apply (id, error, delay_seconds, done) outcomes for claimed events"""
+    if not outcomes:
+        return
+    await conn.execute(
+        FINISH_OUTBOX_EVENTS,
+        {
+            "ids": [o.id for o in outcomes],
+            "errors": [o.error for o in outcomes],
+            "delays": [o.delay_seconds for o in outcomes],
+            "done": [o.done for o in outcomes],
+        },
+    )
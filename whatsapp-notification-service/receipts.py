@@ -0,0 +1,224 @@
+"""
+Delivery receipt ingestion
+
+The webhook hands status callbacks to a ReceiptBuffer and returns at
+once. The buffer keeps only the furthest status seen per message and a
+background task applies everything pending every flush interval (or as
+soon as a full batch is waiting) with one statement per batch.
+
+Receipts can arrive before the send that produced them has logged its
+row. Those are held back for a few flushes before being dropped.
+"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import queries
+import structlog
+from database import get_db_connection
+from utils import metrics
+
+logger = structlog.get_logger()
+
+# Flushes an unmatched receipt is retried for before it is dropped
+UNMATCHED_RETRIES = 5
+
+
+class StatusEvent(NamedTuple):
+    provider_message_id: str
+    status: str
+    error: Optional[str] = None
+
+
+def parse_status_events(payload: Any) -> List[StatusEvent]:
+    """
+    Status events from a webhook body
+
+    Accepts the WhatsApp Cloud API envelope (entry[].changes[].value.statuses[]),
+    a {"statuses": [...]} body, a bare list, or a single status object.
+    Unknown statuses and entries without a message id are skipped.
+    """
+
+    if isinstance(payload, dict) and "entry" in payload:
+        statuses = [
+            status
+            for entry in payload.get("entry") or []
+            for change in entry.get("changes") or []
+            for status in (change.get("value") or {}).get("statuses") or []
+        ]
+    elif isinstance(payload, dict) and "statuses" in payload:
+        statuses = payload["statuses"] or []
+    elif isinstance(payload, list):
+        statuses = payload
+    else:
+        statuses = [payload]
+
+    events = []
+    for item in statuses:
+        if not isinstance(item, dict):
+            continue
+
+        message_id = item.get("id") or item.get("message_id")
+        status = str(item.get("status") or "").lower()
+        if not message_id or status not in queries.STATUS_RANK:
+            continue
+
+        error = None
+        if item.get("errors"):
+            error = "; ".join(
+                (
+                    str(e.get("title") or e.get("message") or e)
+                    if isinstance(e, dict)
+                    else str(e)
+                )
+                for e in item["errors"]
+            )
+
+        events.append(StatusEvent(str(message_id), status, error))
+
+    return events
+
+
+class ReceiptBuffer:
+    """In-memory, coalescing queue of delivery status events"""
+
+    def __init__(
+        self, flush_interval_seconds: float, batch_size: int, max_pending: int
+    ):
+        self.flush_interval_seconds = flush_interval_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending: Dict[str, StatusEvent] = {}
+        self._attempts: Dict[str, int] = {}
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, events: List[StatusEvent]) -> None:
+        """Queue events, keeping the furthest status per message"""
+
+        for event in events:
+            current = self._pending.get(event.provider_message_id)
+            if current is not None:
+                if (
+                    queries.STATUS_RANK[event.status]
+                    > queries.STATUS_RANK[current.status]
+                ):
+                    self._pending[event.provider_message_id] = event
+                continue
+
+            if len(self._pending) >= self.max_pending:
+                metrics.DELIVERY_RECEIPTS_DROPPED.labels(reason="buffer_full").inc()
+                continue
+
+            self._pending[event.provider_message_id] = event
+
+        metrics.DELIVERY_RECEIPTS_RECEIVED.inc(len(events))
+
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and apply what is still pending"""
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._batch_ready.wait(), timeout=self.flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Failed to apply delivery receipts", error=str(e))
+
+    async def flush(self) -> int:
+        """Apply pending events in batches; returns how many were applied"""
+
+        retry: List[StatusEvent] = []
+
+        try:
+            applied = await self._flush_batches(retry)
+        finally:
+            # Retried on the next flush, once the send may have logged its row
+            for event in retry:
+                self._pending.setdefault(event.provider_message_id, event)
+
+        return applied
+
+    async def _flush_batches(self, retry: List[StatusEvent]) -> int:
+        applied = 0
+
+        while self._pending:
+            batch = []
+            for message_id in list(self._pending)[: self.batch_size]:
+                batch.append(self._pending.pop(message_id))
+
+            started = time.perf_counter()
+            try:
+                async with get_db_connection() as conn:
+                    unmatched = await queries.apply_delivery_statuses(conn, batch)
+            except Exception:
+                # Put the batch back without overriding newer events
+                for event in batch:
+                    self._pending.setdefault(event.provider_message_id, event)
+                raise
+            finally:
+                metrics.DELIVERY_RECEIPT_FLUSH_SECONDS.observe(
+                    time.perf_counter() - started
+                )
+
+            matched = len(batch) - len(unmatched)
+            applied += matched
+            metrics.DELIVERY_RECEIPTS_APPLIED.inc(matched)
+            retry.extend(self._unmatched_to_retry(batch, set(unmatched)))
+
+            if len(batch) < self.batch_size:
+                break
+
+        return applied
+
+    def _unmatched_to_retry(
+        self, batch: List[StatusEvent], unmatched: set
+    ) -> List[StatusEvent]:
+        retry = []
+        for event in batch:
+            message_id = event.provider_message_id
+            if message_id not in unmatched:
+                self._attempts.pop(message_id, None)
+                continue
+
+            attempts = self._attempts.get(message_id, 0) + 1
+            if attempts > UNMATCHED_RETRIES:
+                self._attempts.pop(message_id, None)
+                metrics.DELIVERY_RECEIPTS_DROPPED.labels(reason="unmatched").inc()
+                logger.debug(
+                    "Dropped receipt for unknown message", message_id=message_id
+                )
+                continue
+
+            self._attempts[message_id] = attempts
+            retry.append(event)
+
+        return retry
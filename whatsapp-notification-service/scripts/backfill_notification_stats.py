@@ -0,0 +1,62 @@
+"""
+Create and backfill the notification_stats_hourly rollup
+
+    python scripts/backfill_notification_stats.py
+    python scripts/backfill_notification_stats.py --since 2026-01-01
+
+Creates the table if needed (the worker and API also create it at
+startup) and recomputes every hour from --since (default: all history)
+from notification_logs. The rollup is locked while it is rebuilt, so sends
+that log concurrently wait and then add their own increment on top;
+nothing is counted twice or missed.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import engine, ensure_stats_table  # noqa: E402
+from sqlalchemy import text  # noqa: E402
+
+REBUILD_SQL = text("""
+    INSERT INTO public.notification_stats_hourly
+        (bucket, message_type, status, message_count, updated_at)
+    SELECT date_trunc('hour', created_at), message_type, status, count(*), now()
+    FROM public.notification_logs
+    WHERE created_at >= :since
+    GROUP BY 1, 2, 3
+    """)
+
+
+async def main(since: datetime) -> None:
+    await ensure_stats_table()
+
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("LOCK TABLE public.notification_stats_hourly IN EXCLUSIVE MODE")
+        )
+        await conn.execute(
+            text("DELETE FROM public.notification_stats_hourly WHERE bucket >= :since"),
+            {"since": since},
+        )
+        result = await conn.execute(REBUILD_SQL, {"since": since})
+
+    print(f"Rebuilt {result.rowcount} hourly rows since {since}")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        default=datetime(1970, 1, 1),
+        help="ISO date/time to rebuild from (truncated to the hour by the rollup)",
+    )
+    args = parser.parse_args()
+
+    asyncio.run(main(args.since))
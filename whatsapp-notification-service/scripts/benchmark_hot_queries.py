@@ -0,0 +1,172 @@
+"""
+Benchmark the hot activity queries: ORM session path vs Core fast path
+Run against a database that already holds at least one booking:
+
+    python scripts/benchmark_hot_queries.py --iterations 2000
+    python scripts/benchmark_hot_queries.py --booking-id <uuid>
+
+The notification_logs insert runs inside a transaction that is rolled
+back, so no rows are left behind.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries  # noqa: E402
+from database import (  # noqa: E402
+    Booking,
+    Client,
+    NotificationLog,
+    async_session_maker,
+    engine,
+)
+from sqlalchemy import select  # noqa: E402
+
+
+async def _timed(
+    label: str, iterations: int, call: Callable[[], Awaitable[None]]
+) -> float:
+    # Warm up compiled and prepared statement caches first
+    for _ in range(min(50, iterations)):
+        await call()
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await call()
+    elapsed = time.perf_counter() - started
+
+    per_call_us = elapsed / iterations * 1_000_000
+    print(
+        f"  {label:<28} {per_call_us:9.1f} µs/call  {iterations / elapsed:9.0f} ops/s"
+    )
+    return per_call_us
+
+
+async def benchmark(booking_id, iterations: int) -> None:
+    async with engine.connect() as conn:
+        if booking_id is None:
+            row = (await conn.execute(select(Booking.id).limit(1))).first()
+            if not row:
+                print("No bookings found; pass --booking-id or seed the database")
+                return
+            booking_id = row[0]
+
+        details = await queries.fetch_booking_details(conn, booking_id)
+
+    print(f"Booking {booking_id}, {iterations} iterations\n")
+    results = {}
+
+    # Booking details + eligibility
+    async with async_session_maker() as session:
+
+        async def orm_details():
+            await session.execute(
+                select(
+                    Booking,
+                    Client.first_name,
+                    Client.last_name,
+                    Client.whatsapp,
+                    Client.phone,
+                )
+                .join(Client, Booking.client_id == Client.id)
+                .where(Booking.id == booking_id)
+            )
+            await session.execute(
+                select(Client.is_active, Client.status, Client.whatsapp_verified).where(
+                    Client.id == details.client_id
+                )
+            )
+            session.expunge_all()
+
+        async def orm_end_time():
+            await session.execute(
+                select(
+                    Booking.booking_date, Booking.start_time, Booking.duration_minutes
+                ).where(Booking.id == booking_id)
+            )
+
+        print("ORM session path")
+        results["details_orm"] = await _timed(
+            "booking details + check", iterations, orm_details
+        )
+        results["timing_orm"] = await _timed(
+            "end time lookup", iterations, orm_end_time
+        )
+
+        async def orm_insert():
+            session.add(
+                NotificationLog(
+                    booking_id=booking_id,
+                    client_id=details.client_id,
+                    phone_number="+263000000000",
+                    message_type="benchmark",
+                    message_content="benchmark",
+                    sent_at=datetime.utcnow(),
+                    status="sent",
+                    retry_count=0,
+                )
+            )
+            await session.flush()
+            session.expunge_all()
+
+        results["insert_orm"] = await _timed("log insert", iterations, orm_insert)
+        await session.rollback()
+
+    async with engine.connect() as conn:
+
+        async def core_details():
+            await queries.fetch_booking_details(conn, booking_id)
+
+        async def core_end_time():
+            await queries.fetch_appointment_timing(conn, booking_id)
+
+        async def core_insert():
+            await queries.insert_notification_log(
+                conn,
+                booking_id=booking_id,
+                client_id=details.client_id,
+                phone_number="+263000000000",
+                message_type="benchmark",
+                message_content="benchmark",
+                sent_at=datetime.utcnow(),
+                status="sent",
+                retry_count=0,
+            )
+
+        print("\nCore fast path")
+        results["details_core"] = await _timed(
+            "booking details + check", iterations, core_details
+        )
+        results["timing_core"] = await _timed(
+            "end time lookup", iterations, core_end_time
+        )
+        results["insert_core"] = await _timed("log insert", iterations, core_insert)
+        await conn.rollback()
+
+    print("\nSpeed-up (ORM / Core)")
+    for name in ("details", "timing", "insert"):
+        print(f"  {name:<28} {results[name + '_orm'] / results[name + '_core']:9.2f}x")
+
+    await engine.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--booking-id", default=None)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    booking_id = UUID(args.booking_id) if args.booking_id else None
+    asyncio.run(benchmark(booking_id, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
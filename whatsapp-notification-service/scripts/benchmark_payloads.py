@@ -0,0 +1,120 @@
+"""
+Benchmark Temporal payload size and codec time: default JSON vs msgpack + zlib
+No server or database needed:
+
+    python scripts/benchmark_payloads.py --clients 5000 --iterations 2000
+
+Compares what a booking workflow and a marketing campaign write to history
+before (full input to every activity, client dicts, JSON) and after (ids
+only, client rows, msgpack with compression above the threshold).
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import uuid
+from typing import Any, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from converter import data_converter  # noqa: E402
+from temporalio.converter import DataConverter  # noqa: E402
+from workflow import BookingWorkflowInput  # noqa: E402
+
+BOOKING_ACTIVITIES = 5
+
+
+def booking_payloads(slim: bool) -> List[Any]:
+    """Workflow input plus the input of each booking activity"""
+
+    booking_id = uuid.uuid4()
+    workflow_input = BookingWorkflowInput(
+        booking_id=booking_id,
+        client_id=uuid.uuid4(),
+        appointment_datetime="2026-03-14T10:30:00+02:00",
+        client_phone="+263771234567",
+        client_name="Tendai Moyo",
+        treatment_name="Signature Facial with Hydrating Mask",
+        staff_name="Rutendo Chikwanha",
+    )
+    activity_input = {"booking_id": booking_id} if slim else workflow_input
+    return [workflow_input] + [activity_input] * BOOKING_ACTIVITIES
+
+
+def marketing_payloads(clients: int, slim: bool) -> List[Any]:
+    """Eligible client list as returned by the activity"""
+
+    rows = []
+    for index in range(clients):
+        client_id = str(uuid.uuid4())
+        name = f"Client Number{index}"
+        phone = f"+26377{index:07d}"
+        rows.append(
+            [client_id, name, phone]
+            if slim
+            else {"id": client_id, "name": name, "phone": phone}
+        )
+    return [rows]
+
+
+async def _encoded_size(converter: DataConverter, values: List[Any]) -> int:
+    payloads = await converter.encode(values)
+    return sum(payload.ByteSize() for payload in payloads)
+
+
+async def _codec_us(
+    converter: DataConverter, values: List[Any], iterations: int
+) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        payloads = await converter.encode(values)
+        await converter.decode(payloads)
+    return (time.perf_counter() - started) / iterations * 1_000_000
+
+
+async def benchmark(clients: int, iterations: int, threshold: int) -> None:
+    before = DataConverter.default
+    after = data_converter(threshold)
+
+    cases = [
+        ("booking workflow", booking_payloads(False), booking_payloads(True)),
+        (
+            f"marketing, {clients} clients",
+            marketing_payloads(clients, False),
+            marketing_payloads(clients, True),
+        ),
+    ]
+
+    print(
+        f"  {'case':<28} {'bytes before':>13} {'bytes after':>12} {'ratio':>7} "
+        f"{'µs before':>10} {'µs after':>9}"
+    )
+    for label, old_values, new_values in cases:
+        # Large payloads get fewer round trips
+        rounds = max(10, iterations // max(1, len(str(old_values)) // 1000))
+
+        old_size = await _encoded_size(before, old_values)
+        new_size = await _encoded_size(after, new_values)
+        old_us = await _codec_us(before, old_values, rounds)
+        new_us = await _codec_us(after, new_values, rounds)
+
+        print(
+            f"  {label:<28} {old_size:13d} {new_size:12d} "
+            f"{old_size / new_size:6.1f}x {old_us:10.1f} {new_us:9.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--threshold", type=int, default=512)
+    args = parser.parse_args()
+
+    asyncio.run(benchmark(args.clients, args.iterations, args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Run the ChakraHQ simulator as a local HTTP server
+Point the real client at it to exercise the httpx path end to end:
+
+    python scripts/chakra_simulator.py --port 8099 --max-per-second 80
+    CHAKRA_API_URL=http://localhost:8099 python worker.py
+
+POST /messages answers like ChakraHQ after a simulated latency, with
+injected 429/5xx responses and a throughput cap. GET /stats returns the
+status counts so far.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn  # noqa: E402
+from fastapi import FastAPI, Request  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from services.provider_simulator import ProviderSimulator  # noqa: E402
+
+
+def create_app(simulator: ProviderSimulator) -> FastAPI:
+    app = FastAPI(title="ChakraHQ simulator")
+
+    @app.post("/messages")
+    async def messages(request: Request) -> JSONResponse:
+        await request.body()
+        status, body = await simulator.handle()
+        return JSONResponse(body, status_code=status)
+
+    @app.get("/stats")
+    async def stats() -> dict:
+        return {str(status): count for status, count in simulator.counts.items()}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-median-ms", type=float, default=150.0)
+    parser.add_argument("--latency-p99-ms", type=float, default=800.0)
+    parser.add_argument("--rate-limit-error-rate", type=float, default=0.0)
+    parser.add_argument("--server-error-rate", type=float, default=0.0)
+    parser.add_argument("--max-per-second", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    simulator = ProviderSimulator(
+        latency_median_ms=args.latency_median_ms,
+        latency_p99_ms=args.latency_p99_ms,
+        rate_limit_error_rate=args.rate_limit_error_rate,
+        server_error_rate=args.server_error_rate,
+        max_messages_per_second=args.max_per_second,
+        seed=args.seed,
+    )
+    uvicorn.run(
+        create_app(simulator), host=args.host, port=args.port, log_level="warning"
+    )
+
+
+if __name__ == "__main__":
+    main()
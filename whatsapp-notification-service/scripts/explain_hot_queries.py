@@ -0,0 +1,255 @@
+"""
+Print EXPLAIN ANALYZE for each hot query against a seeded database
+
+    python scripts/explain_hot_queries.py
+    python scripts/explain_hot_queries.py --query due_reminders --query claim_outbox_events
+    python scripts/explain_hot_queries.py --check
+
+Each query runs through its function in queries.py, so the plan is for
+the exact SQL and parameters the service sends. Sample parameters come
+from the newest rows in the database. Everything runs in one transaction
+that is rolled back, including the UPDATEs inside the receipt and outbox
+statements, so nothing is left behind.
+
+--check turns sequential scans off and exits non-zero when a query's
+plan does not use the index it is meant to (migrations/versions), so a
+small seed still shows whether each index is usable.
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+from collections import namedtuple
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Tuple
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import queries  # noqa: E402
+from config import get_settings  # noqa: E402
+from database import engine  # noqa: E402
+from outbox import OutboxOutcome  # noqa: E402
+from sqlalchemy import event, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncConnection  # noqa: E402
+
+ReceiptEvent = namedtuple("ReceiptEvent", "provider_message_id status error")
+
+
+class HotQuery(NamedTuple):
+    name: str
+    run: Callable[[AsyncConnection, Dict[str, Any]], Awaitable[Any]]
+    # Index name fragments the plan is expected to use (--check)
+    indexes: Tuple[str, ...]
+
+
+HOT_QUERIES = [
+    HotQuery(
+        "booking_details",
+        lambda conn, s: queries.fetch_booking_details(conn, s["booking_id"]),
+        (),
+    ),
+    HotQuery(
+        "appointment_timing",
+        lambda conn, s: queries.fetch_appointment_timing(conn, s["booking_id"]),
+        (),
+    ),
+    HotQuery(
+        "due_reminders",
+        lambda conn, s: queries.fetch_due_reminders(
+            conn,
+            s["now"],
+            s["now"] + timedelta(minutes=5),
+            *get_settings().reminder_offsets(),
+        ),
+        ("bookings_starts_at", "sent_markers"),
+    ),
+    HotQuery(
+        "eligible_marketing_clients",
+        lambda conn, s: queries.fetch_eligible_marketing_clients(
+            conn, s["now"] - timedelta(days=get_settings().MARKETING_INACTIVE_DAYS)
+        ),
+        ("clients_marketing_eligible",),
+    ),
+    HotQuery(
+        "apply_delivery_statuses",
+        lambda conn, s: queries.apply_delivery_statuses(
+            conn,
+            [ReceiptEvent(message_id, "read", None) for message_id in s["message_ids"]],
+        ),
+        ("provider_message_id",),
+    ),
+    HotQuery(
+        "stats_since",
+        lambda conn, s: queries.fetch_stats(conn, s["now"] - timedelta(hours=24)),
+        ("notification_stats_hourly_pkey",),
+    ),
+    HotQuery(
+        "tracked_workflow",
+        lambda conn, s: queries.fetch_tracked_workflow(conn, s["booking_id"]),
+        (),
+    ),
+    HotQuery(
+        "status_snapshot",
+        lambda conn, s: queries.fetch_status_snapshot(conn, s["workflow_id"]),
+        (),
+    ),
+    HotQuery(
+        "claim_outbox_events",
+        lambda conn, s: queries.claim_outbox_events(conn, 100),
+        ("notification_outbox_pending",),
+    ),
+    HotQuery(
+        "finish_outbox_events",
+        lambda conn, s: queries.finish_outbox_events(
+            conn,
+            [OutboxOutcome(event_id, None, 0.0, True) for event_id in s["event_ids"]],
+        ),
+        (),
+    ),
+]
+
+_INDEX_RE = re.compile(
+    r"Index (?:Only )?Scan(?: Backward)? using (\S+)|Bitmap Index Scan on (\S+)"
+)
+
+
+async def _values(conn: AsyncConnection, statement) -> List[Any]:
+    """First column of statement's rows; empty when its table is missing"""
+    try:
+        async with conn.begin_nested():
+            return list((await conn.execute(statement)).scalars())
+    except Exception:
+        return []
+
+
+async def sample_parameters(conn: AsyncConnection) -> Dict[str, Any]:
+    """Newest booking, log message ids, workflow and outbox ids, or stand-ins"""
+
+    logs = queries.notification_logs
+    booking_ids = await _values(
+        conn,
+        select(queries.bookings.c.id)
+        .order_by(queries.bookings.c.created_at.desc())
+        .limit(1),
+    )
+    message_ids = await _values(
+        conn,
+        select(logs.c.provider_message_id)
+        .where(logs.c.provider_message_id.isnot(None))
+        .order_by(logs.c.created_at.desc())
+        .limit(50),
+    )
+    workflow_ids = await _values(
+        conn, select(queries.workflow_status_cache.c.workflow_id).limit(1)
+    )
+    event_ids = await _values(
+        conn,
+        select(queries.notification_outbox.c.id)
+        .order_by(queries.notification_outbox.c.id.desc())
+        .limit(50),
+    )
+
+    return {
+        "now": datetime.utcnow(),
+        "booking_id": booking_ids[0] if booking_ids else uuid4(),
+        "message_ids": message_ids or [f"missing-{uuid4()}"],
+        "workflow_id": workflow_ids[0] if workflow_ids else f"missing-{uuid4()}",
+        "event_ids": event_ids or [0],
+    }
+
+
+async def explain(
+    conn: AsyncConnection, query: HotQuery, sample: Dict[str, Any]
+) -> List[str]:
+    """Run the query once to capture its SQL, then EXPLAIN ANALYZE that SQL"""
+
+    captured: List[Tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(conn.sync_connection, "before_cursor_execute", capture)
+    try:
+        await query.run(conn, sample)
+    finally:
+        event.remove(conn.sync_connection, "before_cursor_execute", capture)
+
+    statement, parameters = captured[-1]
+    result = await conn.exec_driver_sql(
+        f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters
+    )
+    return [line for (line,) in result]
+
+
+def used_indexes(plan: List[str]) -> List[str]:
+    return [
+        next(name for name in match.groups() if name)
+        for line in plan
+        for match in [_INDEX_RE.search(line)]
+        if match
+    ]
+
+
+async def main(selected: List[str], check: bool) -> int:
+    hot_queries = [q for q in HOT_QUERIES if not selected or q.name in selected]
+    failures = []
+
+    async with engine.connect() as conn:
+        await conn.begin()
+        sample = await sample_parameters(conn)
+        if check:
+            await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+        for query in hot_queries:
+            print(f"== {query.name}")
+            try:
+                async with conn.begin_nested():
+                    plan = await explain(conn, query, sample)
+            except Exception as e:
+                print(f"  failed: {e}\n")
+                failures.append(query.name)
+                continue
+
+            for line in plan:
+                print(f"  {line}")
+
+            indexes = used_indexes(plan)
+            missing = [
+                expected
+                for expected in query.indexes
+                if not any(expected in name for name in indexes)
+            ]
+            if check and missing:
+                print(f"  expected index not used: {', '.join(missing)}")
+                failures.append(query.name)
+            print()
+
+        await conn.rollback()
+
+    await engine.dispose()
+
+    if failures:
+        print(f"Plan check failed: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--query",
+        action="append",
+        default=[],
+        choices=[q.name for q in HOT_QUERIES],
+        help="only explain this query (repeatable)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="disable sequential scans and fail when an expected index is unused",
+    )
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.query, args.check)))
@@ -0,0 +1,47 @@
+"""
+One-time conversion of notification_logs to monthly partitions
+
+    python scripts/partition_notification_logs.py
+
+The existing table becomes notification_logs_legacy, attached as the
+partition for all rows up to the end of the current month (or of the
+newest row). Partitions for the next NOTIFICATION_LOG_PARTITIONS_AHEAD
+months are created in the same transaction. The table is locked
+exclusively while this runs, so stop the workers first. From then on
+the maintenance workflow keeps partitions ahead and applies retention.
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import partitions  # noqa: E402
+from config import get_settings  # noqa: E402
+from database import engine  # noqa: E402
+
+
+async def main() -> None:
+    settings = get_settings()
+    now = datetime.utcnow()
+
+    async with engine.begin() as conn:
+        converted = await partitions.convert_to_partitioned(conn, now)
+        created = await partitions.ensure_partitions(
+            conn, now, settings.NOTIFICATION_LOG_PARTITIONS_AHEAD
+        )
+        attached = await partitions.list_partitions(conn)
+
+    print("Converted notification_logs" if converted else "Already partitioned")
+    if created:
+        print(f"Created partitions: {', '.join(created)}")
+    for partition in attached:
+        print(f"  {partition.name}: {partition.lower} -> {partition.upper}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -3,6 +3,21 @@ Business logic services
 """
 
 from .message_templates import MessageTemplates
-from .whatsapp_provider import WhatsAppProvider
+from .template_registry import RenderedMessage, TemplateRegistry
+from .provider_simulator import ProviderSimulator, SimulatedProvider
+from .providers import create_provider, register_provider
+from .sender_pool import SenderPool
+from .whatsapp_provider import ChakraHQProvider, WhatsAppProvider
 
-__all__ = ["WhatsAppProvider", "MessageTemplates"]
+__all__ = [
+    "WhatsAppProvider",
+    "ChakraHQProvider",
+    "SimulatedProvider",
+    "ProviderSimulator",
+    "SenderPool",
+    "create_provider",
+    "register_provider",
+    "MessageTemplates",
+    "TemplateRegistry",
+    "RenderedMessage",
+]
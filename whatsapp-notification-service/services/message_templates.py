@@ -3,8 +3,12 @@ WhatsApp message templates for ChakraHQ
 Returns both message text and template parameters
 """
 
-from datetime import datetime
-from typing import Dict, Optional, Tuple
+from pathlib import Path
+from typing import Optional, Sequence
+
+from .template_registry import RenderedBatch, RenderedMessage, TemplateRegistry
+
+DEFAULT_TEMPLATES_DIR = Path(__file__).resolve().parent.parent / "templates"
 
 
 class MessageTemplates:
@@ -15,10 +19,24 @@ class MessageTemplates:
         business_name: str,
         business_phone: str,
         business_address: str,
+        registry: Optional[TemplateRegistry] = None,
     ):
         self.business_name = business_name
         self.business_phone = business_phone
         self.business_address = business_address
+        self.registry = registry or TemplateRegistry(
+            str(DEFAULT_TEMPLATES_DIR),
+            constants=self.constants,
+        )
+
+    @property
+    def constants(self) -> dict:
+        """Business values folded into templates at compile time"""
+        return {
+            "business_name": self.business_name,
+            "business_phone": self.business_phone,
+            "business_address": self.business_address,
+        }
 
     def confirmation_message(
         self,
@@ -28,39 +46,25 @@ class MessageTemplates:
         treatment_name: str,
         staff_name: str,
         location: str,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """
         Generate booking confirmation message
 
         Returns:
-            (message_text, template_parameters, template_name)
+            RenderedMessage(text, parameters, template_name, template_id)
         """
 
-        message = f"""{client_name}! ✨
-
-Your appointment has been confirmed!
-
-📅 Date: {appointment_date}
-🕐 Time: {appointment_time}
-💆 Treatment: {treatment_name}
-👤 With: {staff_name}
-📍 Location: {location}
-
-We look forward to seeing you!"""
-
-        # ChakraHQ template parameters
-        parameters = {
-            "customer_name": client_name,
-            "appointment_date": appointment_date,
-            "appointment_time": appointment_time,
-            "treatment_name": treatment_name,
-            "staff_name": staff_name,
-            "location": location,
-            "business_phone": self.business_phone,
-            "business_name": self.business_name,
-        }
-
-        return message, parameters, "confirmation"
+        return self.registry.render(
+            "confirmation",
+            {
+                "customer_name": client_name,
+                "appointment_date": appointment_date,
+                "appointment_time": appointment_time,
+                "treatment_name": treatment_name,
+                "staff_name": staff_name,
+                "location": location,
+            },
+        )
 
     def reminder_24h_message(
         self,
@@ -69,81 +73,51 @@ We look forward to seeing you!"""
         appointment_time: str,
         treatment_name: str,
         staff_name: str,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """Generate 24-hour reminder message"""
 
-        message = f"""{client_name}! 👋
-
-Just a friendly reminder about your appointment tomorrow:
-
-📅 {appointment_date} at {appointment_time}
-💆 {treatment_name} with {staff_name}
-
-See you soon! ✨"""
-
-        parameters = {
-            "customer_name": client_name,
-            "appointment_date": appointment_date,
-            "appointment_time": appointment_time,
-            "treatment_name": treatment_name,
-            "staff_name": staff_name,
-            "business_phone": self.business_phone,
-        }
-
-        return message, parameters, "reminder"
+        return self.registry.render(
+            "reminder_24h",
+            {
+                "customer_name": client_name,
+                "appointment_date": appointment_date,
+                "appointment_time": appointment_time,
+                "treatment_name": treatment_name,
+                "staff_name": staff_name,
+            },
+        )
 
     def reminder_1h_message(
         self,
         client_name: str,
         appointment_time: str,
         treatment_name: str,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """Generate 1-hour reminder message"""
 
-        message = f"""{client_name}!
-
-Quick reminder: Your {treatment_name} appointment is at {appointment_time} (in about 1 hour).
-
-See you soon! ✨
-
-- {self.business_name}"""
-
-        parameters = {
-            "customer_name": client_name,
-            "appointment_time": appointment_time,
-            "treatment_name": treatment_name,
-        }
-
-        return message, parameters, "reminder"
+        return self.registry.render(
+            "reminder_1h",
+            {
+                "customer_name": client_name,
+                "appointment_time": appointment_time,
+                "treatment_name": treatment_name,
+            },
+        )
 
     def aftercare_message(
         self,
         client_name: str,
         treatment_name: str,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """Generate aftercare message"""
 
-        message = f"""Hi {client_name}! 💕
-
-Thank you for choosing {self.business_name}!
-
-We hope you loved your {treatment_name}. Here are some aftercare tips:
-
-• Avoid touching the treated area for 24 hours
-• Stay hydrated
-• Use gentle, fragrance-free products
-• Contact us if you have any concerns
-
-We'd love to hear your feedback! Book your next appointment."""
-
-        parameters = {
-            "customer_name": client_name,
-            "treatment_name": treatment_name,
-            "business_name": self.business_name,
-            "business_phone": self.business_phone,
-        }
-
-        return message, parameters, "aftercare"
+        return self.registry.render(
+            "aftercare",
+            {
+                "customer_name": client_name,
+                "treatment_name": treatment_name,
+            },
+        )
 
     def cancellation_message(
         self,
@@ -151,26 +125,18 @@ We'd love to hear your feedback! Book your next appointment."""
         appointment_date: str,
         appointment_time: str,
         cancellation_reason: Optional[str] = None,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """Generate cancellation message"""
 
-        reason_text = f"\nReason: {cancellation_reason}" if cancellation_reason else ""
-
-        message = f"""{client_name},
-
-Your appointment on {appointment_date} at {appointment_time} has been cancelled.{reason_text}
-
-We hope to see you again soon! To book a new appointment, contact us"""
-
-        parameters = {
-            "customer_name": client_name,
-            "appointment_date": appointment_date,
-            "appointment_time": appointment_time,
-            "cancellation_reason": cancellation_reason or "No reason provided",
-            "business_phone": self.business_phone,
-        }
-
-        return message, parameters, "cancellation"
+        return self.registry.render(
+            "cancellation",
+            {
+                "customer_name": client_name,
+                "appointment_date": appointment_date,
+                "appointment_time": appointment_time,
+                "cancellation_reason": cancellation_reason,
+            },
+        )
 
     def reschedule_message(
         self,
@@ -178,49 +144,45 @@ We hope to see you again soon! To book a new appointment, contact us"""
         new_appointment_date: str,
         new_appointment_time: str,
         treatment_name: str,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """Generate reschedule message"""
 
-        message = f"""{client_name}! 📅
-
-Your appointment has been rescheduled:
-
-New Date: {new_appointment_date}
-New Time: {new_appointment_time}
-Treatment: {treatment_name}
-
-See you then!"""
-
-        parameters = {
-            "customer_name": client_name,
-            "new_appointment_date": new_appointment_date,
-            "new_appointment_time": new_appointment_time,
-            "treatment_name": treatment_name,
-        }
-
-        return message, parameters, "reschedule"
+        return self.registry.render(
+            "reschedule",
+            {
+                "customer_name": client_name,
+                "new_appointment_date": new_appointment_date,
+                "new_appointment_time": new_appointment_time,
+                "treatment_name": treatment_name,
+            },
+        )
 
     def marketing_message(
         self,
         client_name: str,
         custom_message: str,
-    ) -> Tuple[str, Dict[str, str], str]:
+    ) -> RenderedMessage:
         """Generate marketing message"""
 
-        message = f"""Hi {client_name}! 🎉
-
-{custom_message}
-
-Book now: {self.business_phone}
+        return self.registry.render(
+            "marketing",
+            {
+                "customer_name": client_name,
+                "custom_message": custom_message,
+            },
+        )
 
-Reply STOP to unsubscribe.
-
-- {self.business_name}"""
+    def marketing_batch(
+        self,
+        client_names: Sequence[str],
+        custom_message: str,
+    ) -> RenderedBatch:
+        """
+        Generate marketing messages for a page of recipients
 
-        parameters = {
-            "customer_name": client_name,
-            "custom_message": custom_message,
-            "business_phone": self.business_phone,
-        }
+        The custom message and business details are rendered once for the
+        whole page; only the customer name is filled per recipient.
+        """
 
-        return message, parameters, "marketing"
+        bound = self.registry.bind("marketing", {"custom_message": custom_message})
+        return bound.render_column("customer_name", client_names)
@@ -0,0 +1,158 @@
+"""
+Local ChakraHQ simulator for load tests
+
+ProviderSimulator decides how each request would go: a lognormal
+latency, injected 429 and 5xx responses, and a throughput cap past which
+requests are rate limited like the real API. SimulatedProvider uses it
+in-process (WHATSAPP_PROVIDER=simulator); scripts/chakra_simulator.py
+serves it over HTTP for the real ChakraHQ client to talk to.
+"""
+
+import asyncio
+import math
+import random
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from .whatsapp_provider import WhatsAppProvider
+
+logger = structlog.get_logger()
+
+# z-score of the 99th percentile of a standard normal distribution
+_Z_P99 = 2.3263
+
+# Same wording as ChakraHQProvider._parse_error_response
+_ERRORS = {
+    429: "Rate Limited - Too many requests",
+    500: "ChakraHQ Server Error",
+    503: "ChakraHQ Service Unavailable",
+}
+
+
+class ProviderSimulator:
+    """Simulated provider behaviour shared by the in-process and HTTP backends"""
+
+    def __init__(
+        self,
+        latency_median_ms: float = 150.0,
+        latency_p99_ms: float = 800.0,
+        rate_limit_error_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        max_messages_per_second: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency_median_ms = latency_median_ms
+        self._mu = math.log(latency_median_ms / 1000) if latency_median_ms > 0 else 0.0
+        self._sigma = (
+            math.log(latency_p99_ms / latency_median_ms) / _Z_P99
+            if latency_p99_ms > latency_median_ms > 0
+            else 0.0
+        )
+        self.rate_limit_error_rate = rate_limit_error_rate
+        self.server_error_rate = server_error_rate
+        self.max_messages_per_second = max_messages_per_second
+        self._random = random.Random(seed)
+        self._tokens = max_messages_per_second
+        self._refilled_at = time.monotonic()
+        self.counts: Counter = Counter()
+
+    def latency_seconds(self) -> float:
+        if self.latency_median_ms <= 0:
+            return 0.0
+        return self._random.lognormvariate(self._mu, self._sigma)
+
+    def _take_token(self) -> bool:
+        if self.max_messages_per_second <= 0:
+            return True
+
+        now = time.monotonic()
+        # One second of burst, like a per-second provider quota
+        self._tokens = min(
+            self.max_messages_per_second,
+            self._tokens + (now - self._refilled_at) * self.max_messages_per_second,
+        )
+        self._refilled_at = now
+
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    async def handle(self) -> Tuple[int, Dict[str, Any]]:
+        """Simulate one send: (HTTP status, ChakraHQ-shaped response body)"""
+
+        # The cap is checked on arrival, before the request "travels"
+        within_cap = self._take_token()
+        await asyncio.sleep(self.latency_seconds())
+
+        roll = self._random.random()
+        if not within_cap:
+            status = 429
+        elif roll < self.rate_limit_error_rate:
+            status = 429
+        elif roll < self.rate_limit_error_rate + self.server_error_rate:
+            status = self._random.choice((500, 503))
+        else:
+            status = 200
+
+        self.counts[status] += 1
+
+        if status != 200:
+            return status, {"error": {"message": "simulated", "code": status}}
+
+        message_id = f"wamid.sim-{uuid.uuid4().hex}"
+        return 200, {"messaging_product": "whatsapp", "messages": [{"id": message_id}]}
+
+
+class SimulatedProvider(WhatsAppProvider):
+    """In-process provider backed by ProviderSimulator; sends nothing"""
+
+    def __init__(self, simulator: ProviderSimulator):
+        self.simulator = simulator
+
+    @classmethod
+    def from_settings(cls, settings: Any) -> "SimulatedProvider":
+        return cls(
+            ProviderSimulator(
+                latency_median_ms=settings.SIMULATOR_LATENCY_MEDIAN_MS,
+                latency_p99_ms=settings.SIMULATOR_LATENCY_P99_MS,
+                rate_limit_error_rate=settings.SIMULATOR_RATE_LIMIT_ERROR_RATE,
+                server_error_rate=settings.SIMULATOR_SERVER_ERROR_RATE,
+                max_messages_per_second=settings.SIMULATOR_MAX_MESSAGES_PER_SECOND,
+                seed=settings.SIMULATOR_SEED,
+            )
+        )
+
+    async def send_message(
+        self,
+        to: str,
+        message: str,
+        template_name: str = "reminder",
+        parameters: Optional[Dict[str, str]] = None,
+        parameter_blocks: Optional[List[Dict[str, str]]] = None,
+    ) -> Dict[str, Any]:
+        status, body = await self.simulator.handle()
+
+        if status != 200:
+            error = f"{_ERRORS[status]}: {body['error']['message']}"
+            logger.debug(
+                "simulated_send_failed",
+                to=to,
+                status_code=status,
+                template=template_name,
+            )
+            return {"success": False, "error": error, "status_code": status}
+
+        message_id = body["messages"][0]["id"]
+        logger.info(
+            "whatsapp_message_sent",
+            to=to.replace("+", ""),
+            message_id=message_id,
+            template=template_name,
+            simulated=True,
+        )
+        return {"success": True, "message_id": message_id}
@@ -0,0 +1,93 @@
+"""
+WhatsApp provider registry
+
+Maps WHATSAPP_PROVIDER values to factories that build a WhatsAppProvider
+from settings. New backends register a factory under their name. With
+WHATSAPP_SENDERS set, one provider is built per sender number and they
+are wrapped in a SenderPool.
+"""
+
+from typing import Any, Callable, Dict
+
+from .provider_simulator import SimulatedProvider
+from .sender_pool import SendBudget, Sender, SenderPool
+from .whatsapp_provider import ChakraHQProvider, WhatsAppProvider
+
+ProviderFactory = Callable[[Any], WhatsAppProvider]
+
+
+def _chakrahq(settings: Any) -> WhatsAppProvider:
+    return ChakraHQProvider(
+        api_key=settings.CHAKRA_API_KEY, api_url=settings.CHAKRA_API_URL
+    )
+
+
+PROVIDERS: Dict[str, ProviderFactory] = {
+    "chakrahq": _chakrahq,
+    "chakra": _chakrahq,
+    "simulator": SimulatedProvider.from_settings,
+}
+
+
+def register_provider(name: str, factory: ProviderFactory) -> None:
+    PROVIDERS[name.lower()] = factory
+
+
+def create_provider(settings: Any) -> WhatsAppProvider:
+    """
+    Build the provider named by settings.WHATSAPP_PROVIDER, or a sender
+    pool when WHATSAPP_SENDERS is set
+
+    An empty value means ChakraHQ. Unknown names fail loudly rather than
+    falling back to a real backend.
+    """
+
+    if settings.WHATSAPP_SENDERS:
+        return _create_sender_pool(settings)
+    return _create_single(settings)
+
+
+def _create_single(settings: Any) -> WhatsAppProvider:
+    name = settings.WHATSAPP_PROVIDER.strip().lower() or "chakrahq"
+    factory = PROVIDERS.get(name)
+    if factory is None:
+        raise ValueError(
+            f"Unknown WHATSAPP_PROVIDER {settings.WHATSAPP_PROVIDER!r}; "
+            f"available: {', '.join(sorted(PROVIDERS))}"
+        )
+    return factory(settings)
+
+
+def _create_sender_pool(settings: Any) -> SenderPool:
+    senders = []
+    for entry in settings.WHATSAPP_SENDERS:
+        if not entry.get("name"):
+            raise ValueError(f"WHATSAPP_SENDERS entry without a name: {entry}")
+
+        sender_settings = settings.model_copy(
+            update={
+                "CHAKRA_API_KEY": entry.get("api_key", settings.CHAKRA_API_KEY),
+                "CHAKRA_API_URL": entry.get("api_url", settings.CHAKRA_API_URL),
+                "WHATSAPP_PROVIDER": entry.get("provider", settings.WHATSAPP_PROVIDER),
+            }
+        )
+        per_second = float(
+            entry.get(
+                "messages_per_second", settings.WHATSAPP_SENDER_MESSAGES_PER_SECOND
+            )
+        )
+        senders.append(
+            Sender(
+                name=str(entry["name"]),
+                provider=_create_single(sender_settings),
+                budget=SendBudget(per_second),
+            )
+        )
+
+    return SenderPool(
+        senders,
+        max_queue_seconds=settings.WHATSAPP_SENDER_MAX_QUEUE_SECONDS,
+        failure_threshold=settings.WHATSAPP_SENDER_FAILURE_THRESHOLD,
+        unhealthy_seconds=settings.WHATSAPP_SENDER_UNHEALTHY_SECONDS,
+        rate_limit_cooldown_seconds=settings.WHATSAPP_SENDER_RATE_LIMIT_COOLDOWN_SECONDS,
+    )
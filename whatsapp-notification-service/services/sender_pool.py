@@ -0,0 +1,213 @@
+"""
+Pool of WhatsApp sender numbers
+
+Each sender has its own provider client, send budget and health state.
+A recipient is pinned to a sender by rendezvous hashing on the phone
+number, so a conversation stays on one number and only the recipients
+of a sender that drops out move elsewhere.
+
+A send waits for its sender's budget, and spills to the recipient's next
+sender only when that wait would exceed max_queue_seconds. A 429 puts
+the sender in cooldown and retries the message on the next sender; it
+was not sent. Consecutive server or network errors take a sender out of
+rotation for a while. Other failures are returned to the caller as-is,
+since the message may have gone out.
+
+Budgets are per process; divide a number's tier across worker processes.
+"""
+
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import structlog
+from utils import metrics
+
+from .whatsapp_provider import WhatsAppProvider
+
+logger = structlog.get_logger()
+
+
+class SendBudget:
+    """Token bucket that hands out reservations instead of blocking"""
+
+    def __init__(self, per_second: float, clock: Callable[[], float] = time.monotonic):
+        self.per_second = per_second
+        self.burst = max(1.0, per_second)
+        self._clock = clock
+        self._tokens = self.burst
+        self._updated = clock()
+
+    def reserve(self) -> float:
+        """Take a token; returns how long to wait before using it"""
+
+        now = self._clock()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._updated) * self.per_second
+        )
+        self._updated = now
+        self._tokens -= 1
+        return 0.0 if self._tokens >= 0 else -self._tokens / self.per_second
+
+    def cancel(self) -> None:
+        """Give back a reservation that will not be used"""
+        self._tokens += 1
+
+
+@dataclass
+class Sender:
+    name: str
+    provider: WhatsAppProvider
+    budget: SendBudget
+    consecutive_failures: int = 0
+    unavailable_until: float = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.unavailable_until
+
+
+class SenderPool(WhatsAppProvider):
+    """WhatsAppProvider that spreads sends over several sender numbers"""
+
+    def __init__(
+        self,
+        senders: List[Sender],
+        max_queue_seconds: float = 5.0,
+        failure_threshold: int = 5,
+        unhealthy_seconds: float = 60.0,
+        rate_limit_cooldown_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not senders:
+            raise ValueError("SenderPool needs at least one sender")
+
+        self.senders = senders
+        self.max_queue_seconds = max_queue_seconds
+        self.failure_threshold = failure_threshold
+        self.unhealthy_seconds = unhealthy_seconds
+        self.rate_limit_cooldown_seconds = rate_limit_cooldown_seconds
+        self._clock = clock
+
+        for sender in senders:
+            metrics.WHATSAPP_SENDER_BUDGET.labels(sender=sender.name).set(
+                sender.budget.per_second
+            )
+            metrics.WHATSAPP_SENDER_HEALTHY.labels(sender=sender.name).set(1)
+
+    def ranked(self, to: str) -> List[Sender]:
+        """Senders in rendezvous order for a recipient, available ones first"""
+
+        def score(sender: Sender) -> bytes:
+            key = f"{sender.name}|{to}".encode()
+            return hashlib.blake2b(key, digest_size=8).digest()
+
+        order = sorted(self.senders, key=score, reverse=True)
+        now = self._clock()
+        # With every sender out, keep trying in order rather than failing
+        return [s for s in order if s.available(now)] + [
+            s for s in order if not s.available(now)
+        ]
+
+    async def send_message(
+        self,
+        to: str,
+        message: str,
+        template_name: str = "reminder",
+        parameters: Optional[Dict[str, str]] = None,
+        parameter_blocks: Optional[List[Dict[str, str]]] = None,
+    ) -> Dict[str, Any]:
+        candidates = self.ranked(to)
+        result: Dict[str, Any] = {}
+
+        for position, sender in enumerate(candidates):
+            is_last = position == len(candidates) - 1
+
+            wait = sender.budget.reserve()
+            if wait > self.max_queue_seconds and not is_last:
+                sender.budget.cancel()
+                metrics.WHATSAPP_SENDER_SENDS.labels(
+                    sender=sender.name, result="spilled"
+                ).inc()
+                continue
+
+            metrics.WHATSAPP_SENDER_QUEUE_SECONDS.labels(sender=sender.name).observe(
+                wait
+            )
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            result = await sender.provider.send_message(
+                to=to,
+                message=message,
+                template_name=template_name,
+                parameters=parameters,
+                parameter_blocks=parameter_blocks,
+            )
+            result["sender"] = sender.name
+
+            if self._record(sender, result) != "rate_limited":
+                return result
+
+        return result
+
+    def _record(self, sender: Sender, result: Dict[str, Any]) -> str:
+        """Update sender health from a send result; returns the outcome"""
+
+        status_code = result.get("status_code")
+        now = self._clock()
+
+        if result.get("success"):
+            outcome = "success"
+            sender.consecutive_failures = 0
+        elif status_code == 429:
+            outcome = "rate_limited"
+            self._take_out(
+                sender, now + self.rate_limit_cooldown_seconds, "rate_limited"
+            )
+        elif status_code is None or status_code >= 500:
+            outcome = "failed"
+            sender.consecutive_failures += 1
+            if sender.consecutive_failures >= self.failure_threshold:
+                self._take_out(sender, now + self.unhealthy_seconds, "failing")
+        else:
+            # Rejected for this message (bad template, number, ...)
+            outcome = "rejected"
+
+        if outcome == "success" and sender.unavailable_until:
+            sender.unavailable_until = 0.0
+            metrics.WHATSAPP_SENDER_HEALTHY.labels(sender=sender.name).set(1)
+            logger.info("WhatsApp sender back in rotation", sender=sender.name)
+
+        metrics.WHATSAPP_SENDER_SENDS.labels(sender=sender.name, result=outcome).inc()
+        return outcome
+
+    def _take_out(self, sender: Sender, until: float, reason: str) -> None:
+        sender.unavailable_until = until
+        sender.consecutive_failures = 0
+        metrics.WHATSAPP_SENDER_HEALTHY.labels(sender=sender.name).set(0)
+        logger.warning(
+            "WhatsApp sender taken out of rotation",
+            sender=sender.name,
+            reason=reason,
+            seconds=round(until - self._clock(), 1),
+        )
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Per-sender state for logs and health output"""
+
+        now = self._clock()
+        return [
+            {
+                "sender": sender.name,
+                "available": sender.available(now),
+                "budget_per_second": sender.budget.per_second,
+                "consecutive_failures": sender.consecutive_failures,
+            }
+            for sender in self.senders
+        ]
+
+    async def close(self):
+        for sender in self.senders:
+            await sender.provider.close()
@@ -0,0 +1,419 @@
+"""
+Template registry for WhatsApp messages
+Loads template definitions from JSON files, compiles them once and
+hot-reloads them when the files change
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from string import Formatter
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+_MISSING = object()
+
+
+class TemplateError(Exception):
+    """Raised when a template definition is invalid or cannot be rendered"""
+
+
+class RenderedBatch(NamedTuple):
+    """A page of rendered messages sharing one template"""
+
+    texts: List[str]
+    parameter_blocks: List[List[Dict[str, str]]]
+    template_name: str
+    template_id: str
+
+
+class RenderedMessage(NamedTuple):
+    """A rendered template, ready to hand to the provider"""
+
+    text: str
+    parameters: Dict[str, str]
+    template_name: str
+    template_id: str
+
+
+@dataclass(frozen=True)
+class TemplateParameter:
+    """One provider template parameter"""
+
+    name: str
+    default: Any = _MISSING
+
+
+@dataclass(frozen=True)
+class TemplateFragment:
+    """Optional body text rendered only when its source value is present"""
+
+    source: str
+    format: str
+
+
+def _escape(literal: str) -> str:
+    return literal.replace("{", "{{").replace("}", "}}")
+
+
+def parameter_block(name: str, value: Any) -> Dict[str, str]:
+    """Provider payload entry for one named template parameter"""
+    return {"type": "text", "parameter_name": name, "text": str(value)}
+
+
+class CompiledTemplate:
+    """
+    A template definition compiled into a fast renderer.
+
+    Business constants are folded into the body at compile time, so
+    rendering is a single str.format_map over the per-message values.
+    """
+
+    def __init__(
+        self,
+        template_id: str,
+        version: int,
+        provider_template: str,
+        body: str,
+        parameters: Tuple[TemplateParameter, ...],
+        fragments: Dict[str, TemplateFragment],
+        constants: Mapping[str, str],
+    ):
+        self.id = template_id
+        self.version = version
+        self.provider_template = provider_template
+        self.body = body
+        self.parameters = parameters
+        self.fragments = fragments
+        self.constants = dict(constants)
+        self.fields = self._compile_body(body)
+
+    @property
+    def ref(self) -> str:
+        """Stable identifier stored in logs instead of the rendered text"""
+        return f"{self.id}@v{self.version}"
+
+    def _compile_body(self, body: str) -> Tuple[str, ...]:
+        """Fold constants into literals and keep the remaining field names"""
+
+        parts: List[str] = []
+        fields: List[str] = []
+
+        try:
+            parsed = list(Formatter().parse(body))
+        except ValueError as e:
+            raise TemplateError(f"Template {self.ref} has an invalid body: {e}")
+
+        for literal, field_name, format_spec, conversion in parsed:
+            parts.append(_escape(literal))
+
+            if field_name is None:
+                continue
+
+            if format_spec or conversion:
+                raise TemplateError(
+                    f"Template {self.ref} uses format specs, which are not supported"
+                )
+
+            if field_name in self.constants:
+                parts.append(_escape(str(self.constants[field_name])))
+            else:
+                parts.append("{" + field_name + "}")
+                fields.append(field_name)
+
+        self._format = "".join(parts)
+        return tuple(dict.fromkeys(fields))
+
+    def _resolve(self, name: str, values: Mapping[str, Any], default: Any) -> Any:
+        value = values.get(name)
+        # An empty string counts as missing where there is a default to use
+        if value is not None and not (value == "" and default is not _MISSING):
+            return value
+        if name in self.constants:
+            return self.constants[name]
+        if default is not _MISSING:
+            return default
+        raise TemplateError(f"Template {self.ref} is missing value for '{name}'")
+
+    def render(self, values: Mapping[str, Any]) -> RenderedMessage:
+        """Render the body and provider parameters for one message"""
+
+        body_values: Dict[str, Any] = {}
+        for name in self.fields:
+            fragment = self.fragments.get(name)
+            if fragment is not None:
+                source = values.get(fragment.source)
+                body_values[name] = (
+                    fragment.format.format(value=source) if source else ""
+                )
+            else:
+                body_values[name] = self._resolve(name, values, _MISSING)
+
+        parameters = {
+            param.name: str(self._resolve(param.name, values, param.default))
+            for param in self.parameters
+        }
+
+        return RenderedMessage(
+            text=self._format.format_map(body_values),
+            parameters=parameters,
+            template_name=self.provider_template,
+            template_id=self.ref,
+        )
+
+    def bind(self, shared: Mapping[str, Any]) -> "BoundTemplate":
+        """Pre-render the values that are identical for every recipient"""
+        return BoundTemplate(self, shared)
+
+
+class BoundTemplate:
+    """
+    A compiled template with campaign-invariant values folded in.
+
+    The shared values are baked into the body once and their provider
+    parameter blocks are built once and reused for every recipient, so a
+    page only pays for the fields that actually vary.
+    """
+
+    def __init__(self, template: CompiledTemplate, shared: Mapping[str, Any]):
+        constants = dict(template.constants)
+        constants.update({k: v for k, v in shared.items() if v is not None})
+
+        for name, fragment in template.fragments.items():
+            if fragment.source in shared:
+                source = shared[fragment.source]
+                constants[name] = fragment.format.format(value=source) if source else ""
+
+        self.template = template
+        self._compiled = CompiledTemplate(
+            template_id=template.id,
+            version=template.version,
+            provider_template=template.provider_template,
+            body=template.body,
+            parameters=template.parameters,
+            fragments=template.fragments,
+            constants=constants,
+        )
+
+        # Either a prebuilt shared block or the parameter left to fill per row
+        self._plan: List[Any] = []
+        for param in template.parameters:
+            if param.name in constants:
+                self._plan.append(parameter_block(param.name, constants[param.name]))
+            else:
+                self._plan.append(param)
+
+    @property
+    def varying_fields(self) -> Tuple[str, ...]:
+        """Body fields still filled per recipient"""
+        return self._compiled.fields
+
+    def render_many(self, rows: Sequence[Mapping[str, Any]]) -> RenderedBatch:
+        """Render a page of recipients, one mapping of varying values each"""
+
+        compiled = self._compiled
+        fmt = compiled._format
+        texts: List[str] = []
+        blocks: List[List[Dict[str, str]]] = []
+
+        for values in rows:
+            body_values = {}
+            for name in compiled.fields:
+                fragment = compiled.fragments.get(name)
+                if fragment is not None:
+                    source = values.get(fragment.source)
+                    body_values[name] = (
+                        fragment.format.format(value=source) if source else ""
+                    )
+                else:
+                    body_values[name] = compiled._resolve(name, values, _MISSING)
+            texts.append(fmt.format_map(body_values))
+
+            blocks.append(
+                [
+                    (
+                        entry
+                        if isinstance(entry, dict)
+                        else parameter_block(
+                            entry.name,
+                            compiled._resolve(entry.name, values, entry.default),
+                        )
+                    )
+                    for entry in self._plan
+                ]
+            )
+
+        return RenderedBatch(
+            texts=texts,
+            parameter_blocks=blocks,
+            template_name=compiled.provider_template,
+            template_id=compiled.ref,
+        )
+
+    def render_column(self, field: str, values: Sequence[Any]) -> RenderedBatch:
+        """Render a page where a single field (e.g. customer_name) varies"""
+        return self.render_many([{field: value} for value in values])
+
+
+def compile_definition(
+    definition: Mapping[str, Any], constants: Mapping[str, str]
+) -> CompiledTemplate:
+    """Compile one template definition loaded from a file"""
+
+    try:
+        template_id = definition["id"]
+        version = int(definition.get("version", 1))
+        body = definition["body"]
+    except (KeyError, TypeError, ValueError) as e:
+        raise TemplateError(f"Invalid template definition: {e}")
+
+    parameters = []
+    for entry in definition.get("parameters", []):
+        if isinstance(entry, str):
+            parameters.append(TemplateParameter(entry))
+        else:
+            parameters.append(
+                TemplateParameter(entry["name"], entry.get("default", _MISSING))
+            )
+
+    fragments = {
+        name: TemplateFragment(source=spec["source"], format=spec["format"])
+        for name, spec in definition.get("fragments", {}).items()
+    }
+
+    return CompiledTemplate(
+        template_id=template_id,
+        version=version,
+        provider_template=definition.get("provider_template", template_id),
+        body=body,
+        parameters=tuple(parameters),
+        fragments=fragments,
+        constants=constants,
+    )
+
+
+class TemplateRegistry:
+    """
+    Registry of compiled message templates.
+
+    Every *.json file in the directory holds one template version. The
+    highest version of each template id is active unless a caller pins a
+    version. The directory is re-scanned at most once per reload interval,
+    and a definition that fails to compile keeps the previous set in use.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        constants: Optional[Mapping[str, str]] = None,
+        reload_interval_seconds: float = 30.0,
+    ):
+        self.directory = Path(directory)
+        self.constants = dict(constants or {})
+        self.reload_interval_seconds = reload_interval_seconds
+        self._templates: Dict[str, Dict[int, CompiledTemplate]] = {}
+        self._active: Dict[str, CompiledTemplate] = {}
+        self._signature: Tuple[Tuple[str, int], ...] = ()
+        self._checked_at = 0.0
+        self.load()
+
+    def _scan(self) -> Tuple[Tuple[str, int], ...]:
+        try:
+            entries = sorted(
+                (entry.name, entry.stat().st_mtime_ns)
+                for entry in os.scandir(self.directory)
+                if entry.name.endswith(".json")
+            )
+        except FileNotFoundError:
+            raise TemplateError(f"Template directory not found: {self.directory}")
+        return tuple(entries)
+
+    def load(self) -> None:
+        """Load and compile every template definition in the directory"""
+
+        signature = self._scan()
+        templates: Dict[str, Dict[int, CompiledTemplate]] = {}
+
+        for name, _ in signature:
+            path = self.directory / name
+            try:
+                definition = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                raise TemplateError(f"Could not read template {path}: {e}")
+
+            compiled = compile_definition(definition, self.constants)
+            versions = templates.setdefault(compiled.id, {})
+            if compiled.version in versions:
+                raise TemplateError(f"Duplicate template version {compiled.ref}")
+            versions[compiled.version] = compiled
+
+        self._templates = templates
+        self._active = {
+            template_id: versions[max(versions)]
+            for template_id, versions in templates.items()
+        }
+        self._signature = signature
+        self._checked_at = time.monotonic()
+
+        logger.info(
+            "Loaded message templates",
+            directory=str(self.directory),
+            templates=sorted(t.ref for t in self._active.values()),
+        )
+
+    def maybe_reload(self) -> bool:
+        """Reload if the reload interval elapsed and any file changed"""
+
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval_seconds:
+            return False
+        self._checked_at = now
+
+        try:
+            if self._scan() == self._signature:
+                return False
+            self.load()
+            return True
+        except TemplateError as e:
+            logger.error("Template reload failed, keeping previous set", error=str(e))
+            return False
+
+    def get(self, template_id: str, version: Optional[int] = None) -> CompiledTemplate:
+        """Get the active (or a pinned) version of a template"""
+
+        if self.reload_interval_seconds > 0:
+            self.maybe_reload()
+
+        if version is None:
+            template = self._active.get(template_id)
+        else:
+            template = self._templates.get(template_id, {}).get(version)
+
+        if template is None:
+            suffix = f"@v{version}" if version is not None else ""
+            raise TemplateError(f"Unknown template {template_id}{suffix}")
+
+        return template
+
+    def render(
+        self,
+        template_id: str,
+        values: Mapping[str, Any],
+        version: Optional[int] = None,
+    ) -> RenderedMessage:
+        """Render a template by id"""
+        return self.get(template_id, version).render(values)
+
+    def bind(
+        self,
+        template_id: str,
+        shared: Mapping[str, Any],
+        version: Optional[int] = None,
+    ) -> BoundTemplate:
+        """Bind campaign-invariant values for batch rendering"""
+        return self.get(template_id, version).bind(shared)
@@ -25,18 +25,62 @@
 
 """
 Provider-agnostic WhatsApp interface
-Currently implements ChakraHQ with template messages
+WhatsAppProvider is the interface; ChakraHQProvider sends template messages
+through ChakraHQ. Backends are picked by WHATSAPP_PROVIDER (see providers.py).
 """
+
+from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional
 
 import httpx
 import structlog
 
+from .template_registry import parameter_block
+
 logger = structlog.get_logger()
 
 
-class WhatsAppProvider:
-    """WhatsApp message provider abstraction for ChakraHQ"""
+class WhatsAppProvider(ABC):
+    """
+    Interface every WhatsApp backend implements
+
+    send_message never raises for provider failures; it returns
+    {"success": False, "error": ..., "status_code": ...} instead.
+    """
+
+    @abstractmethod
+    async def send_message(
+        self,
+        to: str,
+        message: str,
+        template_name: str = "reminder",
+        parameters: Optional[Dict[str, str]] = None,
+        parameter_blocks: Optional[List[Dict[str, str]]] = None,
+    ) -> Dict[str, Any]:
+        """Send a template message; see ChakraHQProvider.send_message"""
+
+    async def send_text_message(
+        self,
+        to: str,
+        message: str,
+    ) -> Dict[str, Any]:
+        """
+        Send plain text message (if the provider supports it)
+        Falls back to template message with message as parameter
+        """
+        return await self.send_message(
+            to=to,
+            message=message,
+            template_name="reminder",
+            parameters={"message_body": message},
+        )
+
+    async def close(self):
+        """Release connections held by the provider"""
+
+
+class ChakraHQProvider(WhatsAppProvider):
+    """WhatsApp message provider for ChakraHQ"""
 
     def __init__(self, api_key: str, api_url: str):
         self.api_key = api_key
@@ -55,6 +99,7 @@ class WhatsAppProvider:
         message: str,
         template_name: str = "reminder",
         parameters: Optional[Dict[str, str]] = None,
+        parameter_blocks: Optional[List[Dict[str, str]]] = None,
     ) -> Dict[str, Any]:
         """
         Send WhatsApp template message via ChakraHQ
@@ -64,6 +109,8 @@ class WhatsAppProvider:
             message: Message text (used as first parameter if parameters not provided)
             template_name: ChakraHQ template name (default: "reminder")
             parameters: Template parameters dict
+            parameter_blocks: Prebuilt payload parameters (from a RenderedBatch),
+                used as-is instead of parameters
 
         Returns:
             {
@@ -77,8 +124,12 @@ class WhatsAppProvider:
         formatted_phone = to.replace("+", "")
 
         # If no parameters provided, use message as single parameter
-        if parameters is None:
-            parameters = {"customer_name": message}
+        if parameter_blocks is None:
+            if parameters is None:
+                parameters = {"customer_name": message}
+            parameter_blocks = [
+                parameter_block(key, value) for key, value in parameters.items()
+            ]
 
         # Build ChakraHQ template payload
         payload = {
@@ -92,25 +143,18 @@ class WhatsAppProvider:
                 "components": [
                     {
                         "type": "body",
-                        "parameters": [
-                            {
-                                "type": "text",
-                                "parameter_name": key,
-                                "text": str(value),
-                            }
-                            for key, value in parameters.items()
-                        ],
+                        "parameters": parameter_blocks,
                     }
                 ],
             },
         }
 
         try:
-            logger.info(
-                "Sending WhatsApp message via ChakraHQ",
+            logger.debug(
+                "whatsapp_message_sending",
                 to=formatted_phone,
                 template=template_name,
-                parameters_count=len(parameters),
+                parameters_count=len(parameter_blocks),
             )
 
             response = await self.client.post(
@@ -130,6 +174,7 @@ class WhatsAppProvider:
                 return {
                     "success": False,
                     "error": error_detail,
+                    "status_code": response.status_code,
                 }
 
             response.raise_for_status()
@@ -143,7 +188,7 @@ class WhatsAppProvider:
             )
 
             logger.info(
-                "WhatsApp message sent successfully",
+                "whatsapp_message_sent",
                 to=formatted_phone,
                 message_id=message_id,
                 template=template_name,
@@ -166,6 +211,7 @@ class WhatsAppProvider:
             return {
                 "success": False,
                 "error": error_detail,
+                "status_code": e.response.status_code,
             }
 
         except httpx.TimeoutException as e:
@@ -258,22 +304,6 @@ class WhatsAppProvider:
             # If response isn't JSON, return text
             return f"{base_message}: {response.text[:200]}"
 
-    async def send_text_message(
-        self,
-        to: str,
-        message: str,
-    ) -> Dict[str, Any]:
-        """
-        Send plain text message (if ChakraHQ supports it)
-        Falls back to template message with message as parameter
-        """
-        return await self.send_message(
-            to=to,
-            message=message,
-            template_name="reminder",
-            parameters={"message_body": message},
-        )
-
     async def close(self):
         """Close HTTP client"""
         await self.client.aclose()
@@ -0,0 +1,215 @@
+"""
+Micro-batched workflow starts for the accept mode
+
+With WORKFLOW_START_MODE=accept the start endpoint validates the request,
+queues the start here and answers 202 with the workflow id at once. A
+background task runs queued starts concurrently as soon as a batch is
+waiting or every flush interval, and retries failed ones with backoff.
+Workflow ids are deterministic, so a start repeated by a retry or a
+duplicate request lands on the same execution.
+
+Queued starts live in this process only. Ones still queued when it is
+killed are lost, like requests that never reached the API; durable
+delivery goes through the outbox (outbox.py).
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import structlog
+from utils import metrics
+from utils.cache import TTLCache
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class PendingStart:
+    workflow_id: str
+    start: Callable[[], Awaitable[None]]
+    queued_at: float
+    attempts: int = 0
+    not_before: float = 0.0
+    error: Optional[str] = None
+
+
+class StartBatcher:
+    """In-memory queue of workflow starts, flushed in concurrent batches"""
+
+    def __init__(
+        self,
+        batch_size: int,
+        flush_interval_seconds: float,
+        concurrency: int,
+        max_attempts: int,
+        backoff_seconds: float,
+        max_pending: int,
+        status_ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_pending = max_pending
+        self._clock = clock
+        self._pending: "OrderedDict[str, PendingStart]" = OrderedDict()
+        # Outcome of recent starts, for status lookups
+        self._finished = TTLCache(max_pending, status_ttl_seconds, clock=clock)
+        self._batch_ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def submit(self, workflow_id: str, start: Callable[[], Awaitable[None]]) -> bool:
+        """
+        Queue a start; False when the queue is full. A start already queued
+        or recently made under the same id is not queued again.
+        """
+
+        finished = self._finished.get(workflow_id)
+        if workflow_id in self._pending or (
+            finished is not None and finished["status"] == "started"
+        ):
+            return True
+
+        if len(self._pending) >= self.max_pending:
+            metrics.WORKFLOW_STARTS.labels(result="rejected").inc()
+            return False
+
+        self._pending[workflow_id] = PendingStart(workflow_id, start, self._clock())
+        metrics.WORKFLOW_STARTS_PENDING.set(len(self._pending))
+
+        if len(self._pending) >= self.batch_size:
+            self._batch_ready.set()
+        return True
+
+    def status(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        """Queue state of a start: pending, retrying, started or failed"""
+
+        pending = self._pending.get(workflow_id)
+        if pending is None:
+            return self._finished.get(workflow_id)
+
+        return {
+            "workflow_id": workflow_id,
+            "status": "retrying" if pending.attempts else "pending",
+            "attempts": pending.attempts,
+            "error": pending.error,
+        }
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and try what is still queued once more"""
+
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self.flush(ignore_backoff=True)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    self._batch_ready.wait(), timeout=self.flush_interval_seconds
+                )
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Failed to flush workflow starts", error=str(e))
+
+    async def flush(self, ignore_backoff: bool = False) -> int:
+        """Run the starts that are due, a batch at a time; returns how many started"""
+
+        now = self._clock()
+        due = [
+            pending
+            for pending in self._pending.values()
+            if ignore_backoff or pending.not_before <= now
+        ]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        started = 0
+        for offset in range(0, len(due), self.batch_size):
+            batch = due[offset : offset + self.batch_size]
+            results = await asyncio.gather(
+                *(self._start(pending, semaphore) for pending in batch)
+            )
+            started += sum(results)
+
+        metrics.WORKFLOW_STARTS_PENDING.set(len(self._pending))
+        return started
+
+    async def _start(self, pending: PendingStart, semaphore: asyncio.Semaphore) -> bool:
+        async with semaphore:
+            try:
+                await pending.start()
+            except Exception as e:
+                self._failed(pending, e)
+                return False
+
+        del self._pending[pending.workflow_id]
+        self._finished.set(
+            pending.workflow_id,
+            {
+                "workflow_id": pending.workflow_id,
+                "status": "started",
+                "attempts": pending.attempts + 1,
+                "error": None,
+            },
+        )
+        metrics.WORKFLOW_STARTS.labels(result="started").inc()
+        metrics.WORKFLOW_START_QUEUE_SECONDS.observe(self._clock() - pending.queued_at)
+        return True
+
+    def _failed(self, pending: PendingStart, error: Exception) -> None:
+        pending.attempts += 1
+        pending.error = str(error)
+
+        if pending.attempts < self.max_attempts:
+            pending.not_before = self._clock() + self.backoff_seconds * 2 ** (
+                pending.attempts - 1
+            )
+            metrics.WORKFLOW_STARTS.labels(result="retried").inc()
+            logger.warning(
+                "Workflow start failed, will retry",
+                workflow_id=pending.workflow_id,
+                attempts=pending.attempts,
+                error=pending.error,
+            )
+            return
+
+        del self._pending[pending.workflow_id]
+        self._finished.set(
+            pending.workflow_id,
+            {
+                "workflow_id": pending.workflow_id,
+                "status": "failed",
+                "attempts": pending.attempts,
+                "error": pending.error,
+            },
+        )
+        metrics.WORKFLOW_STARTS.labels(result="failed").inc()
+        logger.error(
+            "Workflow start failed, giving up",
+            workflow_id=pending.workflow_id,
+            attempts=pending.attempts,
+            error=pending.error,
+        )
@@ -0,0 +1,101 @@
+"""
+Workflow status cache for the API
+
+Closed workflows (completed, failed, cancelled) never change, so their
+description and result are kept for a long TTL and, with
+STATUS_CACHE_SHARED, also in the workflow_status_cache table so every API
+replica can reuse them. Running workflow descriptions and get_status
+query results are only kept for a few seconds, enough to absorb repeated
+dashboard polls.
+"""
+
+from typing import Any, Dict, Hashable, Optional
+
+import orjson
+import queries
+import structlog
+from database import WorkflowStatusSnapshot, engine, get_db_connection
+from utils import metrics
+from utils.cache import TTLCache
+
+logger = structlog.get_logger()
+
+
+class WorkflowStatusCache:
+    """Two-tier (memory, then optional Postgres) cache of workflow status"""
+
+    def __init__(
+        self,
+        max_entries: int,
+        closed_ttl_seconds: float,
+        running_ttl_seconds: float,
+        shared: bool = False,
+    ):
+        self.closed = TTLCache(max_entries, closed_ttl_seconds)
+        self.running = TTLCache(max_entries, running_ttl_seconds)
+        self.shared = shared
+
+    async def ensure_table(self) -> None:
+        """Create the shared cache table if it does not exist yet"""
+
+        if not self.shared:
+            return
+
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(
+                    lambda sync_conn: WorkflowStatusSnapshot.__table__.create(
+                        sync_conn, checkfirst=True
+                    )
+                )
+        except Exception as e:
+            logger.warning(
+                "Shared status cache unavailable, using memory only", error=str(e)
+            )
+            self.shared = False
+
+    async def get_closed(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        payload = self.closed.get(workflow_id)
+        if payload is not None:
+            metrics.STATUS_CACHE_LOOKUPS.labels(tier="memory", result="hit").inc()
+            return payload
+
+        if self.shared:
+            try:
+                async with get_db_connection(readonly=True) as conn:
+                    payload = await queries.fetch_status_snapshot(conn, workflow_id)
+            except Exception as e:
+                logger.warning("Status cache read failed", error=str(e))
+
+            if payload is not None:
+                metrics.STATUS_CACHE_LOOKUPS.labels(tier="shared", result="hit").inc()
+                self.closed.set(workflow_id, payload)
+                return payload
+
+        metrics.STATUS_CACHE_LOOKUPS.labels(tier="closed", result="miss").inc()
+        return None
+
+    async def put_closed(self, workflow_id: str, payload: Dict[str, Any]) -> None:
+        # Results may hold UUIDs, datetimes and the like; store the JSON form
+        # so the memory and Postgres tiers return the same thing
+        payload = orjson.loads(orjson.dumps(payload, default=str))
+
+        self.closed.set(workflow_id, payload)
+        self.running.pop(workflow_id)
+
+        if self.shared:
+            try:
+                async with get_db_connection() as conn:
+                    await queries.insert_status_snapshot(conn, workflow_id, payload)
+            except Exception as e:
+                logger.warning("Status cache write failed", error=str(e))
+
+    def get_running(self, key: Hashable) -> Optional[Any]:
+        value = self.running.get(key)
+        metrics.STATUS_CACHE_LOOKUPS.labels(
+            tier="running", result="miss" if value is None else "hit"
+        ).inc()
+        return value
+
+    def put_running(self, key: Hashable, value: Any) -> None:
+        self.running.set(key, value)
@@ -1,6 +1,19 @@
 """Utility functions"""
 
+from .cache import TTLCache
 from .logger import setup_logging
-from .phone_formatter import format_phone_number
+from .phone_formatter import (
+    PhoneNumber,
+    format_phone_number,
+    normalize_phone_number,
+    normalize_phone_numbers,
+)
 
-__all__ = ["format_phone_number", "setup_logging"]
+__all__ = [
+    "PhoneNumber",
+    "TTLCache",
+    "format_phone_number",
+    "normalize_phone_number",
+    "normalize_phone_numbers",
+    "setup_logging",
+]
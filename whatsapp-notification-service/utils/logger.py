@@ -1,29 +1,208 @@
 """Logging configuration"""
 
+import atexit
 import logging
+import queue
+import random
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterable, Optional
 
+import orjson
 import structlog
 
+# High-volume success lines that may be sampled or rate limited. Warnings
+# and errors are never dropped.
+SAMPLED_EVENTS = frozenset(
+    {
+        "notification_sent",
+        "whatsapp_message_sent",
+    }
+)
 
-def setup_logging(log_level: str = "INFO"):
-    """Setup structured logging"""
+_NEVER_SAMPLED_LEVELS = frozenset({"warning", "warn", "error", "critical", "exception"})
 
-    logging.basicConfig(
-        format="%(message)s",
-        level=getattr(logging, log_level.upper()),
+_listener: Optional[QueueListener] = None
+
+
+def _orjson_dumps(obj: Any, default: Any = None, **_: Any) -> str:
+    return orjson.dumps(obj, default=default or str).decode()
+
+
+def _capture_exc_info(
+    logger: Any, method_name: str, event_dict: Dict[str, Any]
+) -> Dict[str, Any]:
+    """Resolve exc_info=True while still inside the except block"""
+    if event_dict.get("exc_info") is True:
+        event_dict["exc_info"] = sys.exc_info()
+    return event_dict
+
+
+class EventSampler:
+    """
+    structlog processor that samples and rate limits high-volume events.
+
+    Each event name in `events` is kept with probability `sample_rate` and
+    at most `max_per_second` times per second (0 disables the limit). The
+    next emitted line for an event carries how many were dropped before it.
+    """
+
+    def __init__(
+        self,
+        events: Iterable[str] = SAMPLED_EVENTS,
+        sample_rate: float = 1.0,
+        max_per_second: int = 0,
+    ):
+        self.events = frozenset(events)
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self._windows: Dict[str, list] = {}
+        self._dropped: Dict[str, int] = {}
+
+    def __call__(
+        self, logger: Any, method_name: str, event_dict: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        event = event_dict.get("event")
+
+        if event not in self.events or method_name in _NEVER_SAMPLED_LEVELS:
+            return event_dict
+
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self._drop(event)
+
+        if self.max_per_second > 0:
+            second = int(time.monotonic())
+            window = self._windows.get(event)
+            if window is None or window[0] != second:
+                window = [second, 0]
+                self._windows[event] = window
+            window[1] += 1
+            if window[1] > self.max_per_second:
+                self._drop(event)
+
+        dropped = self._dropped.pop(event, 0)
+        if dropped:
+            event_dict["sampled_dropped"] = dropped
+
+        return event_dict
+
+    def _drop(self, event: str) -> None:
+        self._dropped[event] = self._dropped.get(event, 0) + 1
+        raise structlog.DropEvent
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the record before enqueueing it, which would
+    keep JSON rendering on the event loop. Records never leave the process,
+    so they can be enqueued as-is. A full queue drops the record rather
+    than blocking the caller.
+    """
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DeferredQueueHandler.dropped += 1
+
+
+def setup_logging(
+    log_level: str = "INFO",
+    async_output: bool = True,
+    queue_size: int = 10000,
+    success_sample_rate: float = 1.0,
+    max_events_per_second: int = 0,
+    sampled_events: Optional[Iterable[str]] = None,
+) -> None:
+    """
+    Setup structured logging
+
+    Events are rendered to JSON with orjson by a stdlib ProcessorFormatter.
+    With async_output the formatter runs on a background QueueListener
+    thread, so the calling coroutine only pays for building the event dict.
+    """
+
+    global _listener
+
+    level = getattr(logging, log_level.upper())
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(
+        structlog.stdlib.ProcessorFormatter(
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.StackInfoRenderer(),
+                structlog.processors.format_exc_info,
+                structlog.processors.JSONRenderer(serializer=_orjson_dumps),
+            ],
+            foreign_pre_chain=[
+                structlog.stdlib.add_log_level,
+                structlog.stdlib.add_logger_name,
+                structlog.processors.TimeStamper(fmt="iso"),
+            ],
+        )
     )
 
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+    if async_output:
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+        handler: logging.Handler = _DeferredQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, stream_handler)
+        _listener.start()
+        atexit.register(_stop_listener)
+    else:
+        handler = stream_handler
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
     structlog.configure(
         processors=[
+            structlog.stdlib.filter_by_level,
             structlog.stdlib.add_log_level,
             structlog.stdlib.add_logger_name,
+            EventSampler(
+                events=SAMPLED_EVENTS if sampled_events is None else sampled_events,
+                sample_rate=success_sample_rate,
+                max_per_second=max_events_per_second,
+            ),
             structlog.processors.TimeStamper(fmt="iso"),
-            structlog.processors.StackInfoRenderer(),
-            structlog.processors.format_exc_info,
-            structlog.processors.JSONRenderer(),
+            _capture_exc_info,
+            structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
         ],
         wrapper_class=structlog.stdlib.BoundLogger,
         context_class=dict,
         logger_factory=structlog.stdlib.LoggerFactory(),
         cache_logger_on_first_use=True,
     )
+
+
+def setup_logging_from_settings(settings: Any) -> None:
+    """Configure logging from the service Settings"""
+
+    setup_logging(
+        log_level=settings.LOG_LEVEL,
+        async_output=settings.LOG_ASYNC,
+        queue_size=settings.LOG_QUEUE_SIZE,
+        success_sample_rate=settings.LOG_SUCCESS_SAMPLE_RATE,
+        max_events_per_second=settings.LOG_EVENT_RATE_LIMIT_PER_SECOND,
+    )
+
+
+def _stop_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,155 @@
+"""Prometheus metrics"""
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "notification_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the database pool",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_CHECKOUT_TIMEOUTS = Counter(
+    "notification_db_pool_checkout_timeouts_total",
+    "Checkouts that gave up waiting for a pooled connection",
+    ["pool"],
+)
+DB_POOL_SIZE = Gauge(
+    "notification_db_pool_size",
+    "Configured number of persistent connections in the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_MAX_OVERFLOW = Gauge(
+    "notification_db_pool_max_overflow",
+    "Configured number of overflow connections allowed above the pool size",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "notification_db_pool_checked_out",
+    "Connections currently checked out of the pool",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_OVERFLOW = Gauge(
+    "notification_db_pool_overflow",
+    "Overflow connections currently open above the pool size",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_CONNECTIONS_OPENED = Counter(
+    "notification_db_pool_connections_opened_total",
+    "New database connections opened by the pool",
+    ["pool"],
+)
+DB_POOL_CONNECTIONS_CLOSED = Counter(
+    "notification_db_pool_connections_closed_total",
+    "Database connections closed by the pool",
+    ["pool"],
+)
+DB_POOL_CONNECTIONS_INVALIDATED = Counter(
+    "notification_db_pool_connections_invalidated_total",
+    "Database connections invalidated after an error or failed validation",
+    ["pool"],
+)
+DB_REPLICA_LAG_SECONDS = Gauge(
+    "notification_db_replica_lag_seconds",
+    "Last measured read replica replication lag",
+    multiprocess_mode="livemax",
+)
+DB_READS_ROUTED = Counter(
+    "notification_db_reads_routed_total",
+    "Read-only queries by the database they were sent to and why",
+    ["target", "reason"],
+)
+DELIVERY_RECEIPTS_RECEIVED = Counter(
+    "notification_delivery_receipts_received_total",
+    "Delivery status events accepted by the webhook",
+)
+DELIVERY_RECEIPTS_APPLIED = Counter(
+    "notification_delivery_receipts_applied_total",
+    "Delivery status events written to notification_logs in a batch",
+)
+DELIVERY_RECEIPTS_DROPPED = Counter(
+    "notification_delivery_receipts_dropped_total",
+    "Delivery status events discarded before being applied",
+    ["reason"],
+)
+DELIVERY_RECEIPT_FLUSH_SECONDS = Histogram(
+    "notification_delivery_receipt_flush_seconds",
+    "Time to apply one batch of delivery status events",
+)
+STATUS_CACHE_LOOKUPS = Counter(
+    "notification_status_cache_lookups_total",
+    "Workflow status cache lookups by tier and outcome",
+    ["tier", "result"],
+)
+
+WHATSAPP_SENDER_SENDS = Counter(
+    "notification_whatsapp_sender_sends_total",
+    "Send attempts per sender number by outcome",
+    ["sender", "result"],
+)
+WHATSAPP_SENDER_BUDGET = Gauge(
+    "notification_whatsapp_sender_budget_per_second",
+    "Configured send budget per sender number and process; "
+    "utilization = rate(sends_total) / budget",
+    ["sender"],
+    multiprocess_mode="livesum",
+)
+WHATSAPP_SENDER_HEALTHY = Gauge(
+    "notification_whatsapp_sender_healthy",
+    "1 while a sender number is taking traffic, 0 while failed over",
+    ["sender"],
+    multiprocess_mode="livemin",
+)
+WHATSAPP_SENDER_QUEUE_SECONDS = Histogram(
+    "notification_whatsapp_sender_queue_seconds",
+    "Time a send waited for its sender's rate budget",
+    ["sender"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+
+OUTBOX_EVENTS = Counter(
+    "notification_outbox_events_total",
+    "Booking outbox events by type and outcome",
+    ["event_type", "result"],
+)
+OUTBOX_EVENT_LAG_SECONDS = Histogram(
+    "notification_outbox_event_lag_seconds",
+    "Time from an outbox event being written to being handled",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+
+WORKFLOW_STARTS = Counter(
+    "notification_workflow_starts_total",
+    "Workflow starts queued in accept mode, by outcome",
+    ["result"],
+)
+WORKFLOW_STARTS_PENDING = Gauge(
+    "notification_workflow_starts_pending",
+    "Workflow starts accepted but not made yet",
+    multiprocess_mode="livesum",
+)
+WORKFLOW_START_QUEUE_SECONDS = Histogram(
+    "notification_workflow_start_queue_seconds",
+    "Time from accepting a workflow start to Temporal accepting it",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+MARKETING_OPT_OUTS_RECORDED = Counter(
+    "notification_marketing_opt_outs_recorded_total",
+    "Numbers newly added to the marketing opt-out list, by source",
+    ["source"],
+)
+MARKETING_RECIPIENTS_SUPPRESSED = Counter(
+    "notification_marketing_recipients_suppressed_total",
+    "Campaign recipients dropped before sending, by reason",
+    ["reason"],
+)
+
+
+def start_metrics_server(port: int) -> None:
+    """Expose /metrics on the given port (0 disables it)"""
+    if port > 0:
+        start_http_server(port)
@@ -1,36 +1,188 @@
-"""Phone number formatting utilities"""
+"""Phone number formatting utilities
+
+Single normalization engine used by both the activities and the campaign
+audience preparation, so every path agrees on what a number looks like.
+"""
 
 import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+DEFAULT_COUNTRY_CODE = "263"
+CACHE_SIZE = 8192
+
+# E.164 allows at most 15 digits, and no real subscriber number is shorter
+# than 8 once the country code is included.
+E164_MIN_DIGITS = 8
+E164_MAX_DIGITS = 15
+
+_NON_DIGITS = re.compile(r"\D")
+
+
+@dataclass(frozen=True)
+class CountryRule:
+    """Dialling rule for one country"""
+
+    country_code: str
+    trunk_prefix: str = "0"
+    national_lengths: Tuple[int, ...] = (9,)
+
+
+COUNTRY_RULES: Dict[str, CountryRule] = {
+    "263": CountryRule("263", "0", (9,)),  # Zimbabwe
+    "27": CountryRule("27", "0", (9,)),  # South Africa
+}
+
+
+class _CompiledRule:
+    """Matchers for a CountryRule, built once per country"""
+
+    def __init__(self, rule: CountryRule):
+        self.rule = rule
+        self.max_national = max(rule.national_lengths)
+        self.international = re.compile(rf"^{re.escape(rule.country_code)}\d+$")
+
+    def is_valid_national(self, national: str) -> bool:
+        return len(national) in self.rule.national_lengths
+
+
+_COMPILED_RULES: Dict[str, _CompiledRule] = {
+    code: _CompiledRule(rule) for code, rule in COUNTRY_RULES.items()
+}
+
+
+def _compiled_rule(country_code: str) -> _CompiledRule:
+    compiled = _COMPILED_RULES.get(country_code)
+    if compiled is None:
+        # Unknown default countries only get the generic E.164 length check
+        national_lengths = tuple(
+            range(
+                E164_MIN_DIGITS - len(country_code),
+                E164_MAX_DIGITS - len(country_code) + 1,
+            )
+        )
+        compiled = _CompiledRule(CountryRule(country_code, "0", national_lengths))
+        _COMPILED_RULES[country_code] = compiled
+    return compiled
+
+
+class PhoneNumber(NamedTuple):
+    """Result of normalizing a single phone number"""
+
+    raw: Optional[str]
+    e164: Optional[str]
+    valid: bool
+    reason: Optional[str] = None
+
+
+def _validate_international(digits: str) -> Optional[str]:
+    """Return a rejection reason for a full international number, or None"""
 
+    if not E164_MIN_DIGITS <= len(digits) <= E164_MAX_DIGITS:
+        return "invalid_length"
 
-def format_phone_number(phone: str, country_code: str = "263") -> str:
+    for code in COUNTRY_RULES:
+        if digits.startswith(code):
+            if not _COMPILED_RULES[code].is_valid_national(digits[len(code) :]):
+                return "invalid_national_length"
+            break
+
+    return None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalize_phone_number(
+    phone: Optional[str], country_code: str = DEFAULT_COUNTRY_CODE
+) -> PhoneNumber:
+    """
+    Normalize a phone number to E.164 and validate it
+
+    Rules, in order:
+        "+..." or "00..."        -> already international
+        trunk prefix ("0...")    -> local number in the default country
+        default country code     -> already international
+        longer than a national   -> international without the "+"
+        anything else            -> national number without the trunk prefix
+    """
+    if not phone or not phone.strip():
+        return PhoneNumber(phone, None, False, "missing")
+
+    cleaned = phone.strip()
+    digits = _NON_DIGITS.sub("", cleaned)
+
+    if not digits:
+        return PhoneNumber(phone, None, False, "no_digits")
+
+    compiled = _compiled_rule(country_code)
+
+    if cleaned.startswith("+"):
+        international = digits
+    elif digits.startswith("00"):
+        international = digits[2:]
+    elif digits.startswith(compiled.rule.trunk_prefix):
+        international = country_code + digits[len(compiled.rule.trunk_prefix) :]
+    elif compiled.international.match(digits) and compiled.is_valid_national(
+        digits[len(country_code) :]
+    ):
+        international = digits
+    elif len(digits) > compiled.max_national:
+        international = digits
+    else:
+        international = country_code + digits
+
+    reason = _validate_international(international)
+    return PhoneNumber(phone, "+" + international, reason is None, reason)
+
+
+def format_phone_number(phone: str, country_code: str = DEFAULT_COUNTRY_CODE) -> str:
     """
     Format phone number to E.164 format
 
     Args:
         phone: Phone number (any format)
-        country_code: Default country code (default: 27 for South Africa)
+        country_code: Default country code (default: 263 for Zimbabwe)
 
     Returns:
-        Phone number in E.164 format (+27821234567)
+        Phone number in E.164 format (+263771234567)
+
+    Raises:
+        ValueError: the number is missing or not a valid number
 
     Examples:
-        format_phone_number("0821234567") -> "+27821234567"
-        format_phone_number("27821234567") -> "+27821234567"
+        format_phone_number("0771234567") -> "+263771234567"
+        format_phone_number("263771234567") -> "+263771234567"
         format_phone_number("+27821234567") -> "+27821234567"
-        format_phone_number("082 123 4567") -> "+27821234567"
+        format_phone_number("077 123 4567") -> "+263771234567"
     """
     if not phone:
         raise ValueError("Phone number is required")
 
-    # Remove all non-numeric characters
-    phone = re.sub(r"\D", "", phone)
+    result = normalize_phone_number(phone, country_code)
+
+    if not result.valid:
+        raise ValueError(f"Invalid phone number {phone!r}: {result.reason}")
+
+    return result.e164
+
+
+def normalize_phone_numbers(
+    phones: Iterable[Optional[str]], country_code: str = DEFAULT_COUNTRY_CODE
+) -> List[PhoneNumber]:
+    """
+    Normalize and validate a whole column of phone numbers
+
+    Repeated values within the batch are only normalized once; results are
+    returned in input order.
+    """
+    seen: Dict[Optional[str], PhoneNumber] = {}
+    results: List[PhoneNumber] = []
 
-    # Add country code if not present
-    if not phone.startswith(country_code):
-        if phone.startswith("0"):
-            phone = country_code + phone[1:]
-        else:
-            phone = country_code + phone
+    for phone in phones:
+        result = seen.get(phone)
+        if result is None:
+            result = normalize_phone_number(phone, country_code)
+            seen[phone] = result
+        results.append(result)
 
-    return "+" + phone
+    return results
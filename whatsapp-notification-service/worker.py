@@ -4,39 +4,108 @@ Executes workflows and activities
 """
 
 import asyncio
+from pathlib import Path
+from typing import Callable, Optional
 
 import structlog
-from activities import NotificationActivities  # Changed
+from activities import MaintenanceActivities, NotificationActivities  # Changed
 from config import get_settings
+from converter import data_converter
+from database import ensure_stats_table, start_pool_validator
 from services.message_templates import MessageTemplates
-from services.whatsapp_provider import WhatsAppProvider
+from services.template_registry import TemplateRegistry
+from services.providers import create_provider
 from temporalio.client import Client
+from temporalio.exceptions import WorkflowAlreadyStartedError
 from temporalio.worker import Worker
+from utils.logger import setup_logging_from_settings
+from utils.metrics import start_metrics_server
 from workflow import (  # Changed
     AppointmentBookingWorkflow,
     CancellationWorkflow,
     MarketingCampaignWorkflow,
+    NotificationLogMaintenanceWorkflow,
+    ReminderDispatcherWorkflow,
     RescheduleWorkflow,
 )
 
 logger = structlog.get_logger()
 
+SERVICE_ROOT = Path(__file__).resolve().parent
+MAINTENANCE_WORKFLOW_ID = "notification-log-maintenance"
+REMINDER_DISPATCHER_WORKFLOW_ID = "reminder-dispatcher"
 
-async def main():
-    """Main worker function"""
+
+async def ensure_cron_workflow(
+    client: Client, run, workflow_id: str, cron: str, task_queue: str, *args
+) -> None:
+    """Start a cron workflow unless one with the same id is already running"""
+
+    try:
+        await client.start_workflow(
+            run,
+            *args,
+            id=workflow_id,
+            task_queue=task_queue,
+            cron_schedule=cron,
+        )
+        logger.info("Scheduled cron workflow", workflow_id=workflow_id, cron=cron)
+    except WorkflowAlreadyStartedError:
+        # A changed cron only takes effect after terminating the running one
+        logger.debug("Cron workflow already scheduled", workflow_id=workflow_id)
+
+
+async def report_liveness(beat: Callable[[], None], interval_seconds: float) -> None:
+    """Call beat periodically for as long as the event loop stays responsive"""
+
+    while True:
+        beat()
+        await asyncio.sleep(interval_seconds)
+
+
+async def main(
+    heartbeat: Optional[Callable[[], None]] = None, serve_metrics: bool = True
+):
+    """
+    Main worker function
+
+    Under launcher.py, heartbeat reports liveness to the supervisor and
+    metrics are served by the supervisor instead of each process.
+    """
 
     settings = get_settings()
+    setup_logging_from_settings(settings)
+
+    # Referenced here so the task lives as long as the workers
+    liveness = None
+    if heartbeat is not None:
+        liveness = asyncio.create_task(
+            report_liveness(heartbeat, settings.WORKER_HEARTBEAT_INTERVAL_SECONDS)
+        )
 
     # Initialize services
-    whatsapp_provider = WhatsAppProvider(
-        api_key=settings.CHAKRA_API_KEY,
-        api_url=settings.CHAKRA_API_URL,
+    whatsapp_provider = create_provider(settings)
+    logger.info(
+        "WhatsApp provider",
+        provider=settings.WHATSAPP_PROVIDER,
+        senders=[sender.get("name") for sender in settings.WHATSAPP_SENDERS],
+    )
+
+    template_registry = TemplateRegistry(
+        str(SERVICE_ROOT / settings.TEMPLATES_DIR),
+        constants={
+            "business_name": settings.BUSINESS_NAME,
+            "business_phone": settings.BUSINESS_PHONE,
+            "business_address": settings.BUSINESS_ADDRESS,
+        },
+        reload_interval_seconds=settings.TEMPLATE_RELOAD_INTERVAL_SECONDS,
     )
 
     message_templates = MessageTemplates(
         business_name=settings.BUSINESS_NAME,
         business_phone=settings.BUSINESS_PHONE,
         business_address=settings.BUSINESS_ADDRESS,
+        registry=template_registry,
     )
 
     # Initialize activities
@@ -44,11 +113,25 @@ async def main():
         whatsapp_provider=whatsapp_provider,
         message_templates=message_templates,
     )
+    maintenance_activities = MaintenanceActivities(
+        archive_dir=(
+            str(SERVICE_ROOT / settings.NOTIFICATION_LOG_ARCHIVE_DIR)
+            if settings.NOTIFICATION_LOG_ARCHIVE_DIR
+            else None
+        ),
+        retention_months=settings.NOTIFICATION_LOG_RETENTION_MONTHS,
+        months_ahead=settings.NOTIFICATION_LOG_PARTITIONS_AHEAD,
+    )
+
+    await ensure_stats_table()
 
     # Connect to Temporal server
     client = await Client.connect(
         settings.TEMPORAL_HOST,
         namespace=settings.TEMPORAL_NAMESPACE,
+        data_converter=data_converter(
+            settings.TEMPORAL_PAYLOAD_COMPRESSION_THRESHOLD_BYTES
+        ),
     )
 
     logger.info(
@@ -57,40 +140,114 @@ async def main():
         namespace=settings.TEMPORAL_NAMESPACE,
     )
 
-    # Create worker
-    worker = Worker(
-        client,
-        task_queue=settings.TEMPORAL_TASK_QUEUE,  # Use from config
-        workflows=[
-            AppointmentBookingWorkflow,
-            CancellationWorkflow,
-            RescheduleWorkflow,
+    reminder_activities = [
+        activities_instance.send_24h_reminder_message,
+        activities_instance.send_1h_reminder_message,
+        activities_instance.send_aftercare_message,
+        activities_instance.find_due_reminders,
+        activities_instance.send_reminder_batch,
+    ]
+    marketing_activities = [
+        activities_instance.get_eligible_marketing_clients,
+        activities_instance.send_marketing_message,
+        activities_instance.send_marketing_batch,
+        maintenance_activities.ensure_notification_log_partitions,
+        maintenance_activities.archive_notification_log_partitions,
+    ]
+
+    transactional_workflows = [
+        AppointmentBookingWorkflow,
+        CancellationWorkflow,
+        RescheduleWorkflow,
+    ]
+    transactional_activities = [
+        activities_instance.send_confirmation_message,
+        activities_instance.send_cancellation_message,
+        activities_instance.send_reschedule_message,
+        activities_instance.get_appointment_end_time,
+        activities_instance.get_appointment_duration,
+    ]
+
+    # Executions started before the split run reminder and marketing work
+    # on the transactional queue's pre-split name until they drain
+    if settings.WORKER_TRANSACTIONAL_LEGACY_TYPES:
+        transactional_workflows += [
             MarketingCampaignWorkflow,
-        ],
-        activities=[
-            activities_instance.send_confirmation_message,
-            activities_instance.send_24h_reminder_message,
-            activities_instance.send_1h_reminder_message,
-            activities_instance.send_aftercare_message,
-            activities_instance.send_cancellation_message,
-            activities_instance.send_reschedule_message,
-            activities_instance.get_appointment_end_time,
-            activities_instance.get_eligible_marketing_clients,
-            activities_instance.send_marketing_message,
-        ],
-        max_concurrent_activities=10,
-        max_concurrent_workflow_tasks=50,
-    )
+            NotificationLogMaintenanceWorkflow,
+            ReminderDispatcherWorkflow,
+        ]
+        transactional_activities += [*reminder_activities, *marketing_activities]
+
+    registrations = {
+        "transactional": (transactional_workflows, transactional_activities),
+        "reminders": ([ReminderDispatcherWorkflow], reminder_activities),
+        "marketing": (
+            [MarketingCampaignWorkflow, NotificationLogMaintenanceWorkflow],
+            marketing_activities,
+        ),
+    }
+
+    # One worker per polled queue, each with its own slots
+    task_queues = settings.worker_task_queues()
+    workers = []
+    for role, (task_queue, max_activities, max_workflow_tasks) in task_queues.items():
+        workflows, activities = registrations[role]
+        workers.append(
+            Worker(
+                client,
+                task_queue=task_queue,
+                workflows=workflows,
+                activities=activities,
+                max_concurrent_activities=max_activities,
+                max_concurrent_workflow_tasks=max_workflow_tasks,
+            )
+        )
+
+    if "marketing" in task_queues and settings.NOTIFICATION_LOG_MAINTENANCE_CRON:
+        await ensure_cron_workflow(
+            client,
+            NotificationLogMaintenanceWorkflow.run,
+            MAINTENANCE_WORKFLOW_ID,
+            settings.NOTIFICATION_LOG_MAINTENANCE_CRON,
+            settings.TEMPORAL_MARKETING_TASK_QUEUE,
+        )
+
+    if "reminders" in task_queues and settings.REMINDER_SCHEDULING_MODE == "dispatcher":
+        interval = settings.REMINDER_DISPATCH_INTERVAL_MINUTES
+        await ensure_cron_workflow(
+            client,
+            ReminderDispatcherWorkflow.run,
+            REMINDER_DISPATCHER_WORKFLOW_ID,
+            f"*/{interval} * * * *",
+            settings.TEMPORAL_REMINDERS_TASK_QUEUE,
+            interval,
+        )
+
+    if serve_metrics:
+        start_metrics_server(settings.METRICS_PORT)
+    start_pool_validator()
 
     logger.info(
-        "Starting Temporal worker",
-        task_queue=settings.TEMPORAL_TASK_QUEUE,
-        workflows=4,
-        activities=9,
+        "Starting Temporal workers",
+        task_queues={
+            role: {
+                "queue": task_queue,
+                "activities": max_activities,
+                "workflow_tasks": max_workflow_tasks,
+            }
+            for role, (task_queue, max_activities, max_workflow_tasks) in (
+                task_queues.items()
+            )
+        },
+        reminder_mode=settings.REMINDER_SCHEDULING_MODE,
     )
 
-    # Run worker until shutdown
-    await worker.run()
+    # Run workers until shutdown
+    try:
+        await asyncio.gather(*(worker.run() for worker in workers))
+    finally:
+        if liveness is not None:
+            liveness.cancel()
 
 
 if __name__ == "__main__":
@@ -2,6 +2,8 @@
 Temporal Workflows for Beauty Salon WhatsApp Notifications
 """
 
+import asyncio
+import hashlib
 from datetime import datetime, timedelta
 from typing import Optional
 
@@ -24,6 +26,41 @@ class BookingWorkflowInput:
     client_name: str
     treatment_name: str
     staff_name: str
+    # "dispatcher": only confirm here; ReminderDispatcherWorkflow sends the rest
+    reminder_mode: str = "per_booking"
+    # Queue for reminder and aftercare sends; None keeps them on this
+    # workflow's own queue
+    reminders_task_queue: Optional[str] = None
+    # Width of the window each reminder is spread over, centred on its
+    # nominal time (0 sends at exactly 24h / 1h before)
+    reminder_24h_spread_minutes: int = 0
+    reminder_1h_spread_minutes: int = 0
+    # Settings.reminder_offsets(); the defaults are the values executions
+    # started without these fields were built with
+    reminder_24h_hours_before: int = 24
+    reminder_1h_hours_before: int = 1
+    aftercare_hours_after: int = 24
+
+
+def spread_offset(
+    booking_id: UUID, kind: str, lead: timedelta, spread_minutes: int
+) -> timedelta:
+    """
+    Deterministic offset of a booking's send time within its spread window
+
+    The offset comes from a hash of the booking id, so replays and retries
+    agree and bookings at the same slot land evenly across the window. The
+    window is capped at the lead time, so a reminder moves at most half
+    its lead away from the nominal time.
+    """
+
+    if spread_minutes <= 0:
+        return timedelta(0)
+
+    window = min(timedelta(minutes=spread_minutes), lead)
+    digest = hashlib.sha256(f"{booking_id}:{kind}".encode()).digest()
+    fraction = int.from_bytes(digest[:8], "big") / 2**64
+    return (fraction - 0.5) * window
 
 
 @dataclass
@@ -31,10 +68,20 @@ class CancellationInput:
     """Input for cancellation workflow"""
 
     booking_id: UUID
-    client_phone: str
-    client_name: str
-    appointment_datetime: str  # Changed from datetime to str
     cancellation_reason: Optional[str] = None
+    # Unused; the activity loads the booking. Kept for recorded histories.
+    client_phone: str = ""
+    client_name: str = ""
+    appointment_datetime: str = ""
+
+
+@dataclass
+class CancelSignal:
+    """Payload of AppointmentBookingWorkflow.cancel"""
+
+    cancellation_reason: Optional[str] = None
+    # False stops the timeline without telling the client (reschedules)
+    notify: bool = True
 
 
 @dataclass
@@ -62,13 +109,24 @@ class AppointmentBookingWorkflow:
     4. Wait until appointment ends: Completion
     5. Wait 24h after completion: Aftercare message
 
-    Can be cancelled or modified via signals.
+    The appointment duration is read once, by a local activity, when the
+    timeline starts. A reschedule starts a new workflow, which reads it
+    again.
+
+    Can be cancelled or modified via signals. A cancel signal carrying a
+    CancelSignal with notify set has the workflow send the cancellation
+    message itself before it completes.
     """
 
+    # Histories recorded before this patch read the end time at step 4
+    DURATION_AT_START_PATCH = "duration-at-start"
+
     def __init__(self) -> None:
         self._cancelled = False
         self._rescheduled = False
         self._new_appointment_time: Optional[datetime] = None
+        self._duration_minutes: Optional[int] = None
+        self._cancellation: Optional[CancelSignal] = None
 
     @workflow.run
     async def run(self, input: BookingWorkflowInput) -> dict:
@@ -86,9 +144,11 @@ class AppointmentBookingWorkflow:
             appointment_datetime = appointment_datetime.replace(tzinfo=timezone.utc)
 
         # Step 1: Send immediate confirmation
+        # Activities load the booking themselves, so only its id is recorded
+        # in history for each send
         confirmation_result = await workflow.execute_activity(
             "send_confirmation_message",
-            input,
+            {"booking_id": input.booking_id},
             start_to_close_timeout=timedelta(minutes=5),
             retry_policy=RetryPolicy(
                 initial_interval=timedelta(seconds=1),
@@ -102,16 +162,48 @@ class AppointmentBookingWorkflow:
             f"Confirmation sent for booking {input.booking_id}: {confirmation_result}"
         )
 
+        if input.reminder_mode == "dispatcher":
+            return {
+                "status": "confirmed",
+                "booking_id": input.booking_id,
+                "reminders": "dispatcher",
+                "messages_sent": {"confirmation": confirmation_result},
+            }
+
+        if workflow.patched(self.DURATION_AT_START_PATCH):
+            self._duration_minutes = await workflow.execute_local_activity(
+                "get_appointment_duration",
+                str(input.booking_id),
+                start_to_close_timeout=timedelta(seconds=10),
+                retry_policy=RetryPolicy(
+                    initial_interval=timedelta(seconds=1),
+                    maximum_interval=timedelta(seconds=30),
+                    maximum_attempts=5,
+                    backoff_coefficient=2.0,
+                ),
+            )
+
         # Step 2: Wait until 24 hours before appointment
-        time_until_24h_reminder = appointment_datetime - timedelta(hours=24)
+        reminder_24h_lead = timedelta(hours=input.reminder_24h_hours_before)
+        time_until_24h_reminder = (
+            appointment_datetime
+            - reminder_24h_lead
+            + spread_offset(
+                input.booking_id,
+                "reminder_24h",
+                reminder_24h_lead,
+                input.reminder_24h_spread_minutes,
+            )
+        )
 
         if await self._wait_until_with_cancellation_check(time_until_24h_reminder):
-            return {"status": "cancelled", "stage": "before_24h_reminder"}
+            return await self._finish_cancelled(input, "before_24h_reminder")
 
         # Send 24-hour reminder
         reminder_24h_result = await workflow.execute_activity(
             "send_24h_reminder_message",
-            input,
+            {"booking_id": input.booking_id},
+            task_queue=input.reminders_task_queue,
             start_to_close_timeout=timedelta(minutes=5),
             retry_policy=RetryPolicy(
                 initial_interval=timedelta(seconds=1),
@@ -126,15 +218,26 @@ class AppointmentBookingWorkflow:
         )
 
         # Step 3: Wait until 1 hour before appointment
-        time_until_1h_reminder = appointment_datetime - timedelta(hours=1)
+        reminder_1h_lead = timedelta(hours=input.reminder_1h_hours_before)
+        time_until_1h_reminder = (
+            appointment_datetime
+            - reminder_1h_lead
+            + spread_offset(
+                input.booking_id,
+                "reminder_1h",
+                reminder_1h_lead,
+                input.reminder_1h_spread_minutes,
+            )
+        )
 
         if await self._wait_until_with_cancellation_check(time_until_1h_reminder):
-            return {"status": "cancelled", "stage": "before_1h_reminder"}
+            return await self._finish_cancelled(input, "before_1h_reminder")
 
         # Send 1-hour reminder
         reminder_1h_result = await workflow.execute_activity(
             "send_1h_reminder_message",
-            input,
+            {"booking_id": input.booking_id},
+            task_queue=input.reminders_task_queue,
             start_to_close_timeout=timedelta(minutes=5),
             retry_policy=RetryPolicy(
                 initial_interval=timedelta(seconds=1),
@@ -149,26 +252,31 @@ class AppointmentBookingWorkflow:
         )
 
         # Step 4: Wait until appointment ends (appointment time + duration)
-        # Query duration from database
-        appointment_end = await workflow.execute_activity(
-            "get_appointment_end_time",
-            input.booking_id,
-            start_to_close_timeout=timedelta(minutes=2),
-        )
+        if self._duration_minutes is not None:
+            appointment_end = appointment_datetime + timedelta(
+                minutes=self._duration_minutes
+            )
+        else:
+            appointment_end = await workflow.execute_activity(
+                "get_appointment_end_time",
+                input.booking_id,
+                start_to_close_timeout=timedelta(minutes=2),
+            )
 
         if await self._wait_until_with_cancellation_check(appointment_end):
-            return {"status": "cancelled", "stage": "before_aftercare"}
+            return await self._finish_cancelled(input, "before_aftercare")
 
         # Step 5: Wait 24 hours after appointment, then send aftercare
-        aftercare_time = appointment_end + timedelta(hours=24)
+        aftercare_time = appointment_end + timedelta(hours=input.aftercare_hours_after)
 
         if await self._wait_until_with_cancellation_check(aftercare_time):
-            return {"status": "cancelled", "stage": "before_aftercare"}
+            return await self._finish_cancelled(input, "before_aftercare")
 
         # Send aftercare message
         aftercare_result = await workflow.execute_activity(
             "send_aftercare_message",
-            input,
+            {"booking_id": input.booking_id},
+            task_queue=input.reminders_task_queue,
             start_to_close_timeout=timedelta(minutes=5),
             retry_policy=RetryPolicy(
                 initial_interval=timedelta(seconds=1),
@@ -193,6 +301,34 @@ class AppointmentBookingWorkflow:
             },
         }
 
+    async def _finish_cancelled(self, input: BookingWorkflowInput, stage: str) -> dict:
+        """Result of a cancelled timeline, sending the cancellation if asked"""
+
+        result = {"status": "cancelled", "stage": stage}
+
+        # Signals without a payload (reschedules, older callers) stay silent
+        if self._cancellation is not None and self._cancellation.notify:
+            result["cancellation"] = await workflow.execute_activity(
+                "send_cancellation_message",
+                {
+                    "booking_id": input.booking_id,
+                    "cancellation_reason": self._cancellation.cancellation_reason,
+                },
+                start_to_close_timeout=timedelta(minutes=5),
+                retry_policy=RetryPolicy(
+                    initial_interval=timedelta(seconds=1),
+                    maximum_interval=timedelta(minutes=5),
+                    maximum_attempts=5,
+                    backoff_coefficient=2.0,
+                ),
+            )
+            workflow.logger.info(
+                f"Cancellation sent for booking {input.booking_id}: "
+                f"{result['cancellation']}"
+            )
+
+        return result
+
     async def _wait_until_with_cancellation_check(self, target_time) -> bool:
         """
         Wait until target time, checking for cancellation signals periodically.
@@ -231,9 +367,11 @@ class AppointmentBookingWorkflow:
         return False
 
     @workflow.signal
-    async def cancel(self) -> None:
+    async def cancel(self, signal: Optional[CancelSignal] = None) -> None:
         """Signal to cancel the workflow"""
         self._cancelled = True
+        if signal is not None:
+            self._cancellation = signal
         workflow.logger.info("Cancellation signal received")
 
     @workflow.signal
@@ -250,6 +388,7 @@ class AppointmentBookingWorkflow:
         return {
             "cancelled": self._cancelled,
             "rescheduled": self._rescheduled,
+            "duration_minutes": self._duration_minutes,
             "current_time": workflow.now().isoformat(),
         }
 
@@ -267,7 +406,10 @@ class CancellationWorkflow:
 
         result = await workflow.execute_activity(
             "send_cancellation_message",
-            input,
+            {
+                "booking_id": input.booking_id,
+                "cancellation_reason": input.cancellation_reason,
+            },
             start_to_close_timeout=timedelta(minutes=5),
             retry_policy=RetryPolicy(
                 initial_interval=timedelta(seconds=1),
@@ -302,7 +444,7 @@ class RescheduleWorkflow:
         # Step 2: Send reschedule notification
         reschedule_result = await workflow.execute_activity(
             "send_reschedule_message",
-            input,
+            {"booking_id": input.booking_id},
             start_to_close_timeout=timedelta(minutes=5),
             retry_policy=RetryPolicy(
                 initial_interval=timedelta(seconds=1),
@@ -347,29 +489,31 @@ class MarketingCampaignWorkflow:
             f"Found {len(eligible_clients)} eligible clients for campaign {campaign_id}"
         )
 
-        # Step 2: Send messages with rate limiting
+        # Step 2: Send messages a page at a time with rate limiting
+        # Rate limit: 60 messages per minute, one page per minute
+        page_size = 60
         sent_count = 0
         failed_count = 0
+        skipped_count = 0
 
-        for i, client in enumerate(eligible_clients):
-            # Rate limit: 60 messages per minute = 1 per second
-            if i > 0 and i % 60 == 0:
-                # Wait 1 minute after every 60 messages
+        for page_start in range(0, len(eligible_clients), page_size):
+            if page_start > 0:
                 await workflow.wait_condition(
                     lambda: False, timeout=timedelta(minutes=1)
                 )
 
+            page = eligible_clients[page_start : page_start + page_size]
+
             try:
                 result = await workflow.execute_activity(
-                    "send_marketing_message",
+                    "send_marketing_batch",
                     {
-                        "client_id": client["id"],
-                        "phone": client["phone"],
-                        "name": client["name"],
-                        "message_template": message_template,
                         "campaign_id": campaign_id,
+                        "message_template": message_template,
+                        "clients": page,
                     },
-                    start_to_close_timeout=timedelta(minutes=2),
+                    start_to_close_timeout=timedelta(minutes=10),
+                    heartbeat_timeout=timedelta(minutes=2),
                     retry_policy=RetryPolicy(
                         initial_interval=timedelta(seconds=1),
                         maximum_interval=timedelta(minutes=2),
@@ -378,14 +522,15 @@ class MarketingCampaignWorkflow:
                     ),
                 )
 
-                if result.get("success"):
-                    sent_count += 1
-                else:
-                    failed_count += 1
+                sent_count += result["sent"]
+                failed_count += result["failed"]
+                skipped_count += result.get("skipped", 0)
 
             except Exception as e:
-                workflow.logger.error(f"Failed to send to client {client['id']}: {e}")
-                failed_count += 1
+                workflow.logger.error(
+                    f"Failed to send page starting at client {page_start}: {e}"
+                )
+                failed_count += len(page)
 
         return {
             "status": "completed",
@@ -393,4 +538,100 @@ class MarketingCampaignWorkflow:
             "total_clients": len(eligible_clients),
             "sent": sent_count,
             "failed": failed_count,
+            "skipped": skipped_count,
         }
+
+
+@workflow.defn
+class NotificationLogMaintenanceWorkflow:
+    """
+    Daily notification_logs housekeeping, started on a cron schedule.
+
+    Creates the upcoming monthly partitions, then archives and drops the
+    ones past retention.
+    """
+
+    @workflow.run
+    async def run(self) -> dict:
+        created = await workflow.execute_activity(
+            "ensure_notification_log_partitions",
+            start_to_close_timeout=timedelta(minutes=5),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+        )
+
+        archived = await workflow.execute_activity(
+            "archive_notification_log_partitions",
+            start_to_close_timeout=timedelta(hours=2),
+            heartbeat_timeout=timedelta(minutes=5),
+            retry_policy=RetryPolicy(
+                initial_interval=timedelta(minutes=1),
+                maximum_attempts=3,
+            ),
+        )
+
+        return {"created": created, "archived": archived}
+
+
+@workflow.defn
+class ReminderDispatcherWorkflow:
+    """
+    Bucketed alternative to per-booking reminder timers.
+
+    Started on a cron every interval_minutes. Each run finds every booking
+    whose 24h reminder, 1h reminder or aftercare falls in the bucket
+    [run time - interval, run time + interval) and was not sent yet, then
+    sends them in pages. The bucket overlaps the previous run's, so a
+    failed send is picked up once more by the next run.
+    """
+
+    PAGE_SIZE = 50
+
+    @workflow.run
+    async def run(self, interval_minutes: int) -> dict:
+        now = workflow.now().replace(tzinfo=None)
+        interval = timedelta(minutes=interval_minutes)
+
+        due = await workflow.execute_activity(
+            "find_due_reminders",
+            {
+                "window_start": (now - interval).isoformat(),
+                "window_end": (now + interval).isoformat(),
+            },
+            start_to_close_timeout=timedelta(minutes=2),
+            retry_policy=RetryPolicy(maximum_attempts=3),
+        )
+
+        pages = [
+            due[start : start + self.PAGE_SIZE]
+            for start in range(0, len(due), self.PAGE_SIZE)
+        ]
+
+        results = await asyncio.gather(
+            *(
+                workflow.execute_activity(
+                    "send_reminder_batch",
+                    {"items": page},
+                    start_to_close_timeout=timedelta(minutes=10),
+                    heartbeat_timeout=timedelta(minutes=2),
+                    retry_policy=RetryPolicy(
+                        initial_interval=timedelta(seconds=1),
+                        maximum_interval=timedelta(minutes=2),
+                        maximum_attempts=3,
+                        backoff_coefficient=2.0,
+                    ),
+                )
+                for page in pages
+            ),
+            return_exceptions=True,
+        )
+
+        totals = {"due": len(due), "sent": 0, "skipped": 0, "failed": 0}
+        for page, result in zip(pages, results):
+            if isinstance(result, BaseException):
+                workflow.logger.error(f"Reminder page failed: {result}")
+                totals["failed"] += len(page)
+                continue
+            for key in ("sent", "skipped", "failed"):
+                totals[key] += result[key]
+
+        return totals